@@ -9,9 +9,11 @@ import utils
 import constants
 import classCtrl
 import classModule
+import classModuleProxy
 import className
 import classNode
 import classRig
+import network_index
 import libSerialization
 import pymel.core as pymel
 from omtk.libs import libPymel
@@ -42,7 +44,10 @@ def _reload():
     reload(classNode)
     reload(classCtrl)
     reload(classModule)
+    reload(classModuleProxy)
     reload(classRig)
+    network_index.invalidate_network_index()  # The callbacks would otherwise be leaked by the reload.
+    reload(network_index)
 
     import plugin_manager
     reload(plugin_manager)
@@ -58,13 +63,13 @@ def create(*args, **kwargs):
     return cls(*args, **kwargs)
 
 
-def find():
+def find(lazy=False):
     """
+    :param lazy: If True, the rigs modules are only deserialized when accessed. See classModuleProxy.
     :return: All the rigs embedded in the current maya scene.
     """
-    # TODO: Find why when a scene is open for a long time, this function is slower
-    networks = libSerialization.get_networks_from_class('Rig')
-    results = [libSerialization.import_network(network, module='omtk') for network in networks]
+    networks = network_index.get_network_index().get_networks('Rig')
+    results = [classModuleProxy.import_rig_network(network, lazy=lazy) for network in networks]
     results = filter(None, results)  # Prevent un-serializable networks from passing through.
     return results
 
@@ -82,7 +87,7 @@ def build_all(strict=False):
     """
     Build all the rigs embedded in the current maya scene.
     """
-    networks = libSerialization.get_networks_from_class('Rig')
+    networks = network_index.get_network_index().get_networks('Rig')
     for network in networks:
         rigroot = libSerialization.import_network(network)
         if not rigroot:
@@ -93,10 +98,31 @@ def build_all(strict=False):
             libSerialization.export_network(rigroot)
 
 
+@libPython.log_execution_time('rebuild_all')
+def rebuild_all(strict=False, dry_run=False, preserve_skin_weights=False):
+    """
+    Rebuild the modules that changed since they were built in all the rigs embedded in the current maya scene.
+    See Rig.rebuild.
+    :return: The modules that were rebuilt or that would be rebuilt in dry run mode.
+    """
+    results = []
+    networks = network_index.get_network_index().get_networks('Rig')
+    for network in networks:
+        rigroot = libSerialization.import_network(network)
+        if not rigroot:
+            log.warning("Error importing rig network {0}".format(network))
+            continue
+        results.extend(rigroot.rebuild(strict=strict, dry_run=dry_run, preserve_skin_weights=preserve_skin_weights))
+        if not dry_run:
+            pymel.delete(network)
+            libSerialization.export_network(rigroot)
+    return results
+
+
 # @libPython.profiler
 @libPython.log_execution_time('unbuild_all')
 def unbuild_all(strict=False):
-    networks = libSerialization.get_networks_from_class('Rig')
+    networks = network_index.get_network_index().get_networks('Rig')
     for network in networks:
         rigroot = libSerialization.import_network(network)
         if not rigroot:
@@ -110,12 +136,12 @@ def unbuild_all(strict=False):
 
 
 def _get_modules_from_selection(sel=None):
+    rig_networks = set(network_index.get_network_index().get_networks('Rig'))
+
     def get_rig_network_from_module(network):
         for plug in network.message.outputs(plugs=True):
             plug_node = plug.node()
-            if not isinstance(plug_node, pymel.nodetypes.Network):
-                continue
-            if libSerialization.is_network_from_class(plug_node, 'Rig'):
+            if plug_node in rig_networks:
                 return plug_node
         return None
 
@@ -147,8 +173,12 @@ def _get_modules_from_selection(sel=None):
         pymel.warning("Found no rig related to selection.")
         return None, None
 
-    # Deserialize the rig and find the associated networks
-    rig = libSerialization.import_network(rig_network)
+    # Deserialize the rig and find the associated networks.
+    # Only the selected modules will be deserialized, when they are accessed.
+    rig = classModuleProxy.import_rig_network(rig_network, lazy=True)
+    if not rig:
+        pymel.warning("Error importing rig network {0}".format(rig_network))
+        return None, None
     modules = []
     for module in rig.modules:
         if module._network in module_networks:
@@ -169,7 +199,7 @@ def with_preserve_selection():
 
 def build_selected(sel=None):
     with with_preserve_selection():
-        rig, modules = _get_modules_from_selection()
+        rig, modules = _get_modules_from_selection(sel)
         if not rig or not modules:
             return
 
@@ -195,15 +225,13 @@ def build_selected(sel=None):
             module.build()
             rig.post_build_module(module)
 
-        # Re-export network
-        if hasattr(rig, '_network'):
-            pymel.delete(rig._network)
-        libSerialization.export_network(rig)
+        # Re-export network, the modules that were not accessed keep their network.
+        classModuleProxy.export_rig_network(rig)
 
 
 def unbuild_selected(sel=None):
     with with_preserve_selection():
-        rig, modules = _get_modules_from_selection()
+        rig, modules = _get_modules_from_selection(sel)
         if not rig or not modules:
             return
 
@@ -214,10 +242,8 @@ def unbuild_selected(sel=None):
         for module in modules:
             module.unbuild()
 
-        # Re-export network
-        if hasattr(rig, '_network'):
-            pymel.delete(rig._network)
-        libSerialization.export_network(rig)
+        # Re-export network, the modules that were not accessed keep their network.
+        classModuleProxy.export_rig_network(rig)
 
 
 def calibrate_selected(sel=None):
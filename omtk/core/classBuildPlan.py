@@ -0,0 +1,209 @@
+import heapq
+import logging
+import time
+
+import pymel.core as pymel
+
+from omtk.libs import libPymel
+
+log = logging.getLogger('omtk')
+
+
+class BuildPlanNode(object):
+    """
+    A module in a BuildPlan, with the modules it depend on and the result of it's build.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_BUILT = 'built'
+    STATUS_IGNORED = 'ignored'  # The module was already built, is locked or failed validation.
+    STATUS_SKIPPED = 'skipped'  # The module was skipped by the user.
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, module):
+        self.module = module
+        self.dependencies = []  # The nodes that need to be built before this one.
+        self.dependents = []  # The nodes that need this one to be built first.
+        self.sub_modules = list(module.iter_sub_modules())  # Built by the module itself, as a unit.
+        self.status = self.STATUS_PENDING
+        self.duration = None
+        self.error = None
+
+    def __repr__(self):
+        return '<BuildPlanNode {0} {1}>'.format(self.module, self.status)
+
+    def to_dict(self):
+        """
+        :return: A json-compatible representation of the node.
+        """
+        return {
+            'module': self.module.name,
+            'type': self.module.__class__.__name__,
+            'dependencies': [node.module.name for node in self.dependencies],
+            'sub_modules': [module.name for module in self.sub_modules],
+            'status': self.status,
+            'duration': self.duration,
+            'error': self.error,
+        }
+
+
+class BuildPlan(object):
+    """
+    Order the modules of a rig using their dependencies.
+    A module depend on the modules that own it's parent and any of it's parent ancestors,
+    since they are used to parent the module and to resolve it's space-switch targets.
+    It also depend on the modules that own the space-switch targets kept by it's ctrls from their previous builds,
+    see BaseCtrl.get_spaceswitch_targets.
+    The sub-modules (ex: Limb ik, fk and twistbones) are built by their module and are part of it's node.
+
+    ex: Skip an arm and everything that depend on it, then retry it.
+    plan = rig.get_build_plan()
+    plan.skip(module_arm)
+    rig.build(plan=plan)
+    plan.reset(module_arm)
+    rig.build(plan=plan)
+    """
+    def __init__(self, modules):
+        self.nodes = []  # In build order
+        self._nodes_by_module = {}
+
+        nodes = [BuildPlanNode(module) for module in modules]
+        for node in nodes:
+            self._nodes_by_module[node.module] = node
+        self._resolve_dependencies(nodes)
+        self._sort(nodes)
+
+    @staticmethod
+    def _iter_ctrls(node):
+        for module in [node.module] + node.sub_modules:
+            for ctrl in module.iter_ctrls():
+                if ctrl is not None:
+                    yield ctrl
+
+    @staticmethod
+    def _add_dependency(node, dependency):
+        if dependency is not None and dependency is not node and dependency not in node.dependencies:
+            node.dependencies.append(dependency)
+            dependency.dependents.append(node)
+
+    def _resolve_dependencies(self, nodes):
+        # Index the inputs once instead of scanning every module for each ancestors.
+        # Like Rig.get_module_by_input, the first module using an input own it.
+        nodes_by_input = {}
+        for node in nodes:
+            for obj in node.module.input:
+                nodes_by_input.setdefault(obj, node)
+
+        # A space-switch target can also be the ctrl of another module. See Module.get_pin_locations.
+        nodes_by_target = dict(nodes_by_input)
+        for node in nodes:
+            for ctrl in self._iter_ctrls(node):
+                if libPymel.is_valid_PyNode(ctrl.node):
+                    nodes_by_target.setdefault(ctrl.node, node)
+
+        for node in nodes:
+            # The space-switch targets are resolved by walking the parent hierarchy.
+            obj = node.module.parent
+            while obj is not None:
+                self._add_dependency(node, nodes_by_input.get(obj))
+                obj = obj.getParent() if isinstance(obj, pymel.nodetypes.DagNode) else None
+
+            # The targets of the previous builds are kept by the ctrls and re-used.
+            for ctrl in self._iter_ctrls(node):
+                for target in ctrl.targets or []:
+                    if libPymel.is_valid_PyNode(target):
+                        self._add_dependency(node, nodes_by_target.get(target))
+
+    def _sort(self, nodes):
+        """
+        Sort the nodes topologically. Ready nodes are sorted by hierarchy depth, then by their order in the rig.
+        """
+        def _get_depth(module):
+            chain_jnt = module.chain_jnt
+            return libPymel.get_num_parents(chain_jnt.start) if chain_jnt else -1
+
+        keys = dict((node, (_get_depth(node.module), i)) for i, node in enumerate(nodes))
+        num_dependencies = dict((node, len(node.dependencies)) for node in nodes)
+        queue = [(keys[node], node) for node in nodes if not node.dependencies]
+        heapq.heapify(queue)
+
+        while queue:
+            _, node = heapq.heappop(queue)
+            self.nodes.append(node)
+            for dependent in node.dependents:
+                num_dependencies[dependent] -= 1
+                if not num_dependencies[dependent]:
+                    heapq.heappush(queue, (keys[dependent], dependent))
+
+        # Circular dependencies can't be solved, build them last.
+        if len(self.nodes) != len(nodes):
+            remaining = sorted((node for node in nodes if num_dependencies[node]), key=keys.get)
+            log.warning("Circular dependencies between {0}".format(', '.join(str(node.module) for node in remaining)))
+            self.nodes.extend(remaining)
+
+    def get_node(self, module):
+        return self._nodes_by_module[module]
+
+    def get_roots(self):
+        """
+        :return: The nodes that don't depend on any other node.
+        """
+        return [node for node in self.nodes if not node.dependencies]
+
+    def get_subtree(self, module):
+        """
+        :return: The node of the module and every nodes depending on it, in build order.
+        """
+        subtree = set()
+        stack = [self.get_node(module)]
+        while stack:
+            node = stack.pop()
+            if node not in subtree:
+                subtree.add(node)
+                stack.extend(node.dependents)
+        return [node for node in self.nodes if node in subtree]
+
+    def skip(self, module):
+        """
+        Prevent a module and everything that depend on it from being built.
+        """
+        for node in self.get_subtree(module):
+            node.status = BuildPlanNode.STATUS_SKIPPED
+
+    def reset(self, module=None):
+        """
+        Mark a module and everything that depend on it as pending so they are built again by the next execution.
+        :param module: The module to reset. If None, all the modules are reset.
+        """
+        nodes = self.get_subtree(module) if module else self.nodes
+        for node in nodes:
+            node.status = BuildPlanNode.STATUS_PENDING
+            node.duration = None
+            node.error = None
+
+    def execute(self, fn, strict=False, **kwargs):
+        """
+        Call fn on each pending modules, in build order.
+        :param fn: Called with the module and the keyword arguments. Return False if the module was not built.
+        :param strict: If True, any exception will be raised. Otherwise it is stored in the module node.
+        """
+        for node in self.nodes:
+            if node.status != BuildPlanNode.STATUS_PENDING:
+                continue
+
+            st = time.time()
+            try:
+                result = fn(node.module, strict=strict, **kwargs)
+                node.status = BuildPlanNode.STATUS_IGNORED if result is False else BuildPlanNode.STATUS_BUILT
+            except Exception, e:
+                node.status = BuildPlanNode.STATUS_FAILED
+                node.error = '{0}: {1}'.format(type(e).__name__, str(e).strip())
+                if strict:
+                    raise
+            finally:
+                node.duration = time.time() - st
+
+    def to_dict(self):
+        """
+        :return: A json-compatible representation of the plan, in build order.
+        """
+        return [node.to_dict() for node in self.nodes]
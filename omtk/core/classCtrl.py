@@ -7,6 +7,7 @@ from classNode import Node
 from omtk.core import constants
 from omtk.core import classNode
 from omtk.libs import libAttr
+from omtk.libs import libProfiler
 from omtk.libs import libPymel
 from omtk.libs import libRigging
 
@@ -101,6 +102,7 @@ class BaseCtrl(Node):
             return False
         return self.node.exists()  # PyNode
 
+    @libProfiler.profiled('ctrl', category='ctrl')
     def build(self, name=None, fetch_shapes=True, *args, **kwargs):
         """
         Create ctrl setup, also fetch animation and shapes if necessary.
@@ -590,13 +592,14 @@ class InteractiveCtrl(BaseCtrl):
 
         # Resolve u and v coordinates
         # todo: check if we really want to resolve the u and v ourself since it's now connected.
+        engine = module.rig.get_closest_point_engine()
         if obj_mesh is None:
             # We'll scan all available geometries and use the one with the shortest distance.
             meshes = libRigging.get_affected_geometries(ref)
             meshes = list(set(meshes) & set(module.rig.get_meshes()))
-            obj_mesh, _, out_u, out_v = libRigging.get_closest_point_on_shapes(meshes, pos_ref)
+            obj_mesh, _, out_u, out_v = libRigging.get_closest_point_on_shapes(meshes, pos_ref, engine=engine)
         else:
-            _, out_u, out_v = libRigging.get_closest_point_on_shape(obj_mesh, pos_ref)
+            _, out_u, out_v = libRigging.get_closest_point_on_shape(obj_mesh, pos_ref, engine=engine)
 
         if u_coord is None:
             u_coord = out_u
@@ -1,5 +1,8 @@
+import hashlib
+import json
 import logging
 import re
+import types
 
 import pymel.core as pymel
 
@@ -7,6 +10,7 @@ logging.basicConfig()
 from omtk.libs import libPymel
 from omtk.libs import libPython
 from omtk.libs import libAttr
+from omtk.libs import libRigging
 log = logging.getLogger('omtk')
 import functools
 
@@ -275,6 +279,13 @@ class Module(object):
         else:
             self.name = 'RENAMEME'
 
+        # The fingerprint of the module when it was last built. See get_fingerprint.
+        self.fingerprint = None
+
+        # The nodes created by the last build outside of the module groups. See filter_ledger.
+        # Anything left in the scene is deleted when un-building.
+        self.ledger = []
+
 
     def __str__(self):
         return '{0} <{1}>'.format(self.name, self.__class__.__name__)
@@ -291,6 +302,54 @@ class Module(object):
             raise Exception("Can't build module with zero inputs. {0}".format(self))
         return True
 
+    def get_fingerprint(self, precision=4):
+        """
+        Resolve a hash of everything that affect the result of the build.
+        This include the module settings, the name and world matrix of it's inputs and the topology of the
+        geometries they affect. The rig need to be in bind pose for the fingerprint to match the one computed on build.
+        :param precision: The number of decimals to consider when comparing float values.
+        :return: A string that change if the module need to be rebuilt.
+        """
+        def _is_setting(val):
+            if isinstance(val, (list, tuple)):
+                return all(_is_setting(sub_val) for sub_val in val)
+            return val is None or isinstance(val, (basestring, bool, int, long, float))
+
+        def _round(val):
+            if isinstance(val, (list, tuple)):
+                return [_round(sub_val) for sub_val in val]
+            return round(val, precision) if isinstance(val, float) else val
+
+        settings = {}
+        for key, val in self.__dict__.iteritems():
+            if key.startswith('_') or key == 'fingerprint' or not _is_setting(val):
+                continue
+            settings[key] = _round(val)
+
+        inputs = []
+        for obj in self.input:
+            if not libPymel.is_valid_PyNode(obj):
+                inputs.append(None)
+                continue
+            matrix = None
+            if isinstance(obj, pymel.nodetypes.Transform):
+                matrix = _round(pymel.xform(obj, query=True, worldSpace=True, matrix=True))
+            inputs.append([obj.name(), matrix])
+
+        geometries = []
+        for geometry in libRigging.get_affected_geometries(*self.input):
+            geometries.append([geometry.name(), geometry.numVertices(), geometry.numEdges(), geometry.numFaces()])
+        geometries.sort()
+
+        data = {
+            'type': self.__class__.__name__,
+            'settings': settings,
+            'inputs': inputs,
+            'geometries': geometries,
+        }
+        # Use json since the values can come back as unicode or lists after a serialization roundtrip.
+        return hashlib.md5(json.dumps(data, sort_keys=True)).hexdigest()
+
     def build(self, create_grp_anm=True, create_grp_rig=True, connect_global_scale=True, segmentScaleCompensate=None, parent=True):
         """
         Build the module following the provided rig rules.
@@ -369,18 +428,27 @@ class Module(object):
                     libAttr.disconnectAttr(obj.sz)
 
         # Delete the ctrls in reverse hyerarchy order.
+        # Note that the ctrls are still un-built one by one since each ctrl hold it's own shapes and animation.
         ctrls = self.get_ctrls()
         ctrls = filter(libPymel.is_valid_PyNode, ctrls)
         ctrls = reversed(sorted(ctrls, key=libPymel.get_num_parents))
         for ctrl in ctrls:
             ctrl.unbuild()
 
-        if self.grp_anm is not None and libPymel.is_valid_PyNode(self.grp_anm):
-            pymel.delete(self.grp_anm)
-            self.grp_anm = None
-        if self.grp_rig is not None and libPymel.is_valid_PyNode(self.grp_rig):
-            pymel.delete(self.grp_rig)
-            self.grp_rig = None
+        grps = [grp for grp in (self.grp_anm, self.grp_rig) if grp is not None and libPymel.is_valid_PyNode(grp)]
+        if grps:
+            pymel.delete(grps)
+        self.grp_anm = None
+        self.grp_rig = None
+
+        # Delete anything else created by the build in one call.
+        leftovers = self.get_ledger_leftovers()
+        if leftovers:
+            self.debug("Deleting {0} nodes left behind: {1}".format(
+                len(leftovers), ', '.join(node.name() for node in leftovers[:10])
+            ))
+            pymel.delete(leftovers)
+        self.ledger = []
 
         self.globalScale = None
 
@@ -389,6 +457,65 @@ class Module(object):
         if '_cache' in self.__dict__:
             self.__dict__.pop('_cache')
 
+    def _iter_referenced_nodes(self):
+        """
+        Iterate through the nodes referenced by the module, walking the same data libSerialization export.
+        This include the nodes held in lists, tuples or dicts and the nodes held by the ctrls, avars and sub-modules.
+        """
+        visited = set()
+        stack = [self]
+        while stack:
+            val = stack.pop()
+            if isinstance(val, pymel.Attribute):
+                yield val.node()
+            elif isinstance(val, pymel.PyNode):
+                yield val
+            elif isinstance(val, (list, tuple, set)):
+                stack.extend(val)
+            elif isinstance(val, dict):
+                stack.extend(val.itervalues())
+            elif hasattr(val, '__dict__') and not isinstance(val, (type, types.ModuleType, types.FunctionType, types.MethodType)):
+                if id(val) in visited:
+                    continue
+                visited.add(id(val))
+                for key, sub_val in val.__dict__.iteritems():
+                    # The rig reference every modules and the ledger is what we are filtering.
+                    if key in ('rig', 'ledger') or key.startswith('_'):
+                        continue
+                    stack.append(sub_val)
+
+    def filter_ledger(self, nodes):
+        """
+        Resolve the nodes created by the build that need to be remembered to be deleted when un-building.
+        The DAG nodes under the module groups are deleted with them, they are not stored
+        since each stored node add a connection to the module network.
+        :param nodes: The nodes created by the build. See libRigging.NodeLedger.
+        :return: A list of pymel.PyNode instances.
+        """
+        grps = [grp for grp in (self.grp_anm, self.grp_rig) if libPymel.is_valid_PyNode(grp)]
+        if not grps:
+            return list(nodes)
+        prefixes = tuple(grp.longName() + '|' for grp in grps)
+
+        def _is_in_grps(node):
+            if node in grps:
+                return True
+            return isinstance(node, pymel.nodetypes.DagNode) and node.longName().startswith(prefixes)
+
+        return [node for node in nodes if not _is_in_grps(node)]
+
+    def get_ledger_leftovers(self):
+        """
+        Resolve the nodes created by the last build that are still in the scene.
+        The nodes still referenced by the module are ignored since they are kept between builds. (ex: twistbones)
+        :return: A list of pymel.PyNode instances.
+        """
+        ledger = filter(libPymel.is_valid_PyNode, getattr(self, 'ledger', None) or [])
+        if not ledger:
+            return []
+        referenced_nodes = set(self._iter_referenced_nodes())
+        return [node for node in ledger if node not in referenced_nodes]
+
     def get_parent(self, parent):
         """
         This function can be called by a child module that would like to hook itself to this module hierarchy.
@@ -404,6 +531,22 @@ class Module(object):
         if self.grp_anm:
             pymel.parentConstraint(parent, self.grp_anm, maintainOffset=True)
 
+    def iter_sub_modules(self):
+        """
+        Iterate through the modules owned by the module. (ex: The ik and fk systems of a Limb)
+        The sub-modules are built by the module itself.
+        :return: A generator of Module instances.
+        """
+        for key, val in self.__dict__.iteritems():
+            if key == 'rig' or key.startswith('_'):
+                continue
+            if isinstance(val, Module):
+                yield val
+            elif isinstance(val, list):
+                for sub_val in val:
+                    if isinstance(sub_val, Module):
+                        yield sub_val
+
     def iter_ctrls(self):
         """
         Iterate though all the ctrl implemented by the module.
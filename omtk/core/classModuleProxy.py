@@ -0,0 +1,206 @@
+import logging
+
+import libSerialization
+import pymel.core as pymel
+from omtk.libs import libPython
+
+log = logging.getLogger('omtk')
+
+
+class ModuleProxy(object):
+    """
+    Stand-in for a rig module that is deserialized from it's network on first access.
+    The network is available without importing the module, any other attribute access import it.
+    ex:
+    rig = import_rig_network(network, lazy=True)
+    modules = [module for module in rig.modules if module._network in selected_networks]  # Nothing is imported
+    modules[0].build()  # Only the first module network is imported.
+
+    The proxy class is read from the network so isinstance checks don't import the module.
+    Note that libSerialization can't export a proxy, see export_rig_network and resolve_module_proxies.
+    """
+    __slots__ = ('_network', '_rig', '_module', '_cls')
+
+    def __init__(self, network, rig=None):
+        object.__setattr__(self, '_network', network)
+        object.__setattr__(self, '_rig', rig)
+        object.__setattr__(self, '_module', None)
+        object.__setattr__(self, '_cls', None)
+
+    def is_resolved(self):
+        return self._module is not None
+
+    def resolve(self):
+        """
+        :return: The module deserialized from the network. The network is only imported once.
+        """
+        module = self._module
+        if module is None:
+            # The rig is already imported, don't import it again through the module back-reference.
+            fn_skip = lambda network: libSerialization.is_network_from_class(network, 'Rig')
+            module = libSerialization.import_network(self._network, module='omtk', fn_skip=fn_skip)
+            if module is None:
+                raise Exception("Can't import module network {0}".format(self._network))
+            module.rig = self._rig
+            object.__setattr__(self, '_module', module)
+        return module
+
+    @property
+    def __class__(self):
+        if self._module is None:
+            cls = self._cls
+            if cls is None:
+                cls = get_network_class(self._network)
+                object.__setattr__(self, '_cls', cls)
+            if cls is not None:
+                return cls
+        return self.resolve().__class__
+
+    def __getattr__(self, item):
+        return getattr(self.resolve(), item)
+
+    def __setattr__(self, key, value):
+        setattr(self.resolve(), key, value)
+
+    def __delattr__(self, item):
+        delattr(self.resolve(), item)
+
+    def __str__(self):
+        return str(self.resolve())
+
+    def __repr__(self):
+        return '<ModuleProxy {0}>'.format(self._network)
+
+    def __eq__(self, other):
+        if type(other) is ModuleProxy:
+            return self._network == other._network
+        # An unresolved proxy can't be equal to an already imported module.
+        return self._module is not None and self._module == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self._network)
+
+
+def is_module_proxy(val):
+    # Don't use isinstance, it would resolve the proxy.
+    return type(val) is ModuleProxy
+
+
+def get_network_class(network):
+    """
+    :return: The module class a network was serialized from, without deserializing it. None if it can't be found.
+    """
+    from omtk.core.classModule import Module
+    result = None
+    for cls in [Module] + list(libPython.get_sub_classes(Module)):
+        if libSerialization.is_network_from_class(network, cls.__name__):
+            if result is None or issubclass(cls, result):
+                result = cls
+    return result
+
+
+def get_module_input(module):
+    """
+    :return: The input of a module. The input of a ModuleProxy is read from it's network until it is resolved.
+    """
+    if not is_module_proxy(module) or module.is_resolved():
+        return module.input
+    network = module._network
+    if not network.hasAttr('input'):
+        return []
+    nodes = []
+    for attr in network.attr('input'):
+        nodes.extend(attr.inputs())
+    return nodes
+
+
+def get_module_networks(rig_network):
+    """
+    :return: The networks of the modules of a rig network, in order, without deserializing them.
+    """
+    if not rig_network.hasAttr('modules'):
+        return []
+    networks = []
+    for attr in rig_network.attr('modules'):
+        networks.extend(attr.inputs(type='network'))
+    return networks
+
+
+def import_rig_network(network, lazy=True):
+    """
+    Deserialize a rig network.
+    :param network: The rig network.
+    :param lazy: If True, the rig modules are ModuleProxy instances that are deserialized on first access.
+    Otherwise every modules, ctrls and avars are deserialized recursively.
+    :return: The Rig instance or None if the network can't be deserialized.
+    """
+    if not lazy:
+        return libSerialization.import_network(network, module='omtk')
+
+    module_networks = get_module_networks(network)
+    module_networks_set = set(module_networks)
+    fn_skip = lambda net: net in module_networks_set
+    rig = libSerialization.import_network(network, module='omtk', fn_skip=fn_skip)
+    if rig is None:
+        return None
+    rig.modules = [ModuleProxy(module_network, rig=rig) for module_network in module_networks]
+    return rig
+
+
+def resolve_module_proxies(rig):
+    """
+    Replace the ModuleProxy instances of a rig by their module so it can be exported.
+    The modules that fail to be deserialized are removed, like libSerialization would do.
+    """
+    modules = []
+    for module in rig.modules:
+        if is_module_proxy(module):
+            try:
+                module = module.resolve()
+            except Exception, e:
+                log.warning(str(e))
+                continue
+        modules.append(module)
+    rig.modules = modules
+
+
+def export_rig_network(rig):
+    """
+    Export a rig imported using import_rig_network without deserializing it's unresolved ModuleProxy instances.
+    Only the resolved modules are exported, the unresolved modules networks are connected to the new rig network.
+    The previous rig network is deleted.
+    :return: The new rig network.
+    """
+    modules = rig.modules
+    old_network = getattr(rig, '_network', None)
+    if old_network is not None and old_network.exists():
+        pymel.delete(old_network)
+
+    # The unresolved modules are left out of the export, None mark their position.
+    resolved_modules = []
+    for module in modules:
+        if is_module_proxy(module):
+            module = module.resolve() if module.is_resolved() else None
+        resolved_modules.append(module)
+    rig.modules = filter(None, resolved_modules)
+    try:
+        network = libSerialization.export_network(rig)
+    finally:
+        rig.modules = modules
+
+    # Connect the modules networks in their original order.
+    module_networks = [getattr(resolved_module, '_network', None) if resolved_module is not None else module._network
+                       for module, resolved_module in zip(modules, resolved_modules)]
+    module_networks = [module_network for module_network in module_networks
+                       if module_network is not None and module_network.exists()]
+    if not network.hasAttr('modules'):
+        network.addAttr('modules', attributeType='message', multi=True)
+    attr_modules = network.attr('modules')
+    for attr in list(attr_modules):
+        pymel.removeMultiInstance(attr, b=True)
+    for i, module_network in enumerate(module_networks):
+        pymel.connectAttr(module_network.message, attr_modules[i], force=True)
+    return network
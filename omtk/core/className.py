@@ -1,9 +1,146 @@
 from maya import cmds
+from maya import OpenMaya
 import copy
 
 # TODO: Find a way to have different naming for different production.
 # Maybe handle it in the rig directly?
 
+# The active NameRegistry, if any.
+_name_registry = None
+
+
+class NameRegistry(object):
+    """
+    Keep track of the names that are taken and of the next available index of each prefix.
+    This prevent polling cmds.objExists or scanning every objects when resolving a unique name.
+    ex:
+    with className.NameRegistry.from_scene():
+        name = BaseName('l_eye_jnt').get_unique_name('l_eye_jnt')
+    While the registry is active, it is kept in sync with the scene by callbacks on node creation,
+    deletion and renaming and it is used by BaseName.get_unique_name.
+    The names are the leaf names of the nodes. Since multiple DAG nodes can share the same leaf name,
+    the number of nodes using each name is kept so a name is only released when it's last node is.
+    """
+    def __init__(self, names=None):
+        self._taken = {}  # The number of nodes using each name.
+        self._counters = {}
+        for name in names or []:
+            self.reserve(name)
+        self._callbacks = []
+        self._parent = None
+
+    @classmethod
+    def from_scene(cls):
+        """
+        :return: A NameRegistry containing the leaf name of every nodes in the scene.
+        """
+        # Note that ls return the shortest unique path of the DAG nodes, not their leaf name.
+        return cls(name.rsplit('|', 1)[-1] for name in cmds.ls(shortNames=True))
+
+    def __contains__(self, name):
+        return name in self._taken
+
+    def __len__(self):
+        return len(self._taken)
+
+    def reserve(self, name):
+        self._taken[name] = self._taken.get(name, 0) + 1
+
+    def release(self, name):
+        count = self._taken.get(name, 0)
+        if count > 1:
+            self._taken[name] = count - 1
+            return
+        self._taken.pop(name, None)
+
+        # Since a released name can be re-used, rewind the counter of any prefix that could have generated it.
+        # ex: 'arm12' can come from the prefix 'arm' or 'arm1'.
+        for i in range(len(name) - 1, 0, -1):
+            if not name[i].isdigit():
+                break
+            if name[i] == '0':
+                continue
+            prefix = name[:i]
+            index = int(name[i:])
+            if self._counters.get(prefix, 0) > index:
+                self._counters[prefix] = index
+
+    def rename(self, old_name, new_name):
+        self.release(old_name)
+        self.reserve(new_name)
+
+    def get_unique_name(self, name, reserve=False):
+        """
+        Resolve a name that is not taken by appending the lowest available index to it.
+        :param name: The desired name.
+        :param reserve: If True, the resolved name will be reserved.
+        :return: The desired name if it is available, otherwise the name suffixed by an index.
+        """
+        if name in self._taken:
+            i = self._counters.get(name, 1)
+            while name + str(i) in self._taken:
+                i += 1
+            self._counters[name] = i
+            name = name + str(i)
+        if reserve:
+            self.reserve(name)
+        return name
+
+    def __enter__(self):
+        global _name_registry
+        self._parent = _name_registry
+        _name_registry = self
+        self._register_callbacks()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _name_registry
+        self._remove_callbacks()
+        _name_registry = self._parent
+        self._parent = None
+
+    def _register_callbacks(self):
+        self._callbacks.append(OpenMaya.MDGMessage.addNodeAddedCallback(self._on_node_added, 'dependNode'))
+        self._callbacks.append(OpenMaya.MDGMessage.addNodeRemovedCallback(self._on_node_removed, 'dependNode'))
+        self._callbacks.append(OpenMaya.MNodeMessage.addNameChangedCallback(OpenMaya.MObject(), self._on_name_changed))
+
+    def _remove_callbacks(self):
+        for callback in self._callbacks:
+            OpenMaya.MMessage.removeCallback(callback)
+        self._callbacks = []
+
+    def _on_node_added(self, mobject, *args):
+        self.reserve(OpenMaya.MFnDependencyNode(mobject).name())
+
+    def _on_node_removed(self, mobject, *args):
+        self.release(OpenMaya.MFnDependencyNode(mobject).name())
+
+    def _on_name_changed(self, mobject, old_name, *args):
+        self.rename(old_name, OpenMaya.MFnDependencyNode(mobject).name())
+
+
+def get_name_registry():
+    """
+    :return: The active NameRegistry or None.
+    """
+    return _name_registry
+
+
+# Cache of the resolved names and of the side of each tokens, by nomenclature class.
+_resolve_cache = {}
+_side_cache = {}
+_resolve_cache_max_size = 100000
+
+
+def clear_cache():
+    """
+    Clear the resolved names cache.
+    Call this when modifying a nomenclature class attributes (ex: SIDE_L) at runtime.
+    """
+    _resolve_cache.clear()
+    _side_cache.clear()
+
+
 class BaseName(object):
     """
     This class handle the naming of object.
@@ -42,7 +179,12 @@ class BaseName(object):
     >>> name.resolve()
     'l_eye_jnt'
 
+    >>> name.resolve_many('jnt', ('upp', 'jnt'))
+    ['l_eye_jnt', 'l_eye_upp_jnt']
+
     """
+    __slots__ = ('tokens', 'prefix', 'suffix', 'side')
+
     separator = '_'
 
     type_anm = 'anm'
@@ -155,6 +297,9 @@ class BaseName(object):
         self.tokens.insert(0, prefix)
 
     def get_unique_name(self, name):
+        if _name_registry is not None:
+            return _name_registry.get_unique_name(name)
+
         if cmds.objExists(name):
             i = 1
             while cmds.objExists(name + str(i)):
@@ -164,11 +309,21 @@ class BaseName(object):
 
     @classmethod
     def get_side_from_token(cls, token):
+        key = (cls, token)
+        try:
+            return _side_cache[key]
+        except KeyError:
+            pass
+
+        side = None
         token_lower = token.lower()
         if token_lower == cls.SIDE_L.lower():
-            return cls.SIDE_L
-        if token_lower == cls.SIDE_R.lower():
-            return cls.SIDE_R
+            side = cls.SIDE_L
+        elif token_lower == cls.SIDE_R.lower():
+            side = cls.SIDE_R
+
+        _side_cache[key] = side
+        return side
 
     def get_tokens(self):
         """
@@ -176,22 +331,54 @@ class BaseName(object):
         """
         return [token for token in self.tokens if not self.get_side_from_token(token)]
 
-    def resolve(self, *args):
-        tokens = []
+    def _get_cache_key(self):
+        return self.__class__, self.prefix, self.side, tuple(self.tokens), self.suffix
 
-        if self.prefix:
-            tokens.append(self.prefix)
+    def _resolve(self, key, args):
+        """
+        Resolve a name using the result of _get_cache_key. The result is memoized.
+        """
+        key_args = key + (args,)
+        try:
+            return _resolve_cache[key_args]
+        except KeyError:
+            pass
+        except TypeError:  # Unhashable tokens, don't memoize
+            key_args = None
 
-        if self.side:
-            tokens.append(self.side)
+        _, prefix, side, tokens, suffix = key
+        tokens = list(tokens)
+
+        if prefix:
+            tokens.insert(0, prefix)
+
+        if side:
+            tokens.insert(1 if prefix else 0, side)
 
-        tokens.extend(self.tokens)
         tokens.extend(args)
-        if self.suffix:
-            tokens.append(self.suffix)
+        if suffix:
+            tokens.append(suffix)
 
         name = self._join_tokens(tokens)
 
+        if key_args is not None:
+            if len(_resolve_cache) >= _resolve_cache_max_size:
+                _resolve_cache.clear()
+            _resolve_cache[key_args] = name
+        return name
+
+    def resolve_many(self, *args):
+        """
+        Resolve multiple names sharing the same tokens at once.
+        :param args: The extra token(s) of each name. Multiple tokens can be provided using a tuple.
+        :return: A list of resolved names.
+        """
+        key = self._get_cache_key()
+        return [self._resolve(key, arg if isinstance(arg, tuple) else (arg,)) for arg in args]
+
+    def resolve(self, *args):
+        name = self._resolve(self._get_cache_key(), args)
+
         # If we have name conflicts, we WILL want to crash.
         '''
         # Prevent maya from crashing by guarantying that the name is unique.
@@ -3,15 +3,20 @@ import time
 import logging
 from maya import cmds
 import pymel.core as pymel
+import libSerialization
 from omtk.core.classCtrl import BaseCtrl
 from omtk.core.classNode import Node
+from omtk.core import classBuildPlan
 from omtk.core import className
 from omtk.core import classModule
+from omtk.core import classModuleProxy
 from omtk.core import constants
 from omtk.core.utils import decorator_uiexpose
+from omtk.libs import libProfiler
 from omtk.libs import libPymel
 from omtk.libs import libPython
 from omtk.libs import libRigging
+from omtk.libs import libSkinning
 log = logging.getLogger('omtk')
 
 class CtrlRoot(BaseCtrl):
@@ -98,6 +103,141 @@ class RigGrp(Node):
                 super(RigGrp, self).unbuild(*args, **kwargs)
 
 
+class ModuleTransaction(object):
+    """
+    Allow a module build to be rolled back in one step.
+    The module and it's sub-modules are snapshotted using libSerialization before the build, with it's inputs transforms.
+    Since the rollback replace the undo queue, the undo recording is suspended during the build.
+    """
+    ATTR_NAMES = ('tx', 'ty', 'tz', 'rx', 'ry', 'rz', 'sx', 'sy', 'sz')
+
+    def __init__(self, module, ledger):
+        self.module = module
+        self.ledger = ledger
+        self._rig = None
+        self._network = None
+        self._networks = []
+        self._private_states = {}
+        self._ctrls = []
+        self._ctrl_networks = []
+        self._input_values = []
+        self._undo_state = None
+
+    def _iter_modules(self, module):
+        yield module
+        for sub_module in module.iter_sub_modules():
+            for sub_sub_module in self._iter_modules(sub_module):
+                yield sub_sub_module
+
+    def _get_private_state(self, obj):
+        return dict((key, val) for key, val in obj.__dict__.iteritems() if key.startswith('_'))
+
+    def _set_private_state(self, obj, state):
+        for key in [key for key in obj.__dict__ if key.startswith('_')]:
+            del obj.__dict__[key]
+        obj.__dict__.update(state)
+
+    def begin(self):
+        self._undo_state = cmds.undoInfo(query=True, stateWithoutFlush=True)
+        cmds.undoInfo(stateWithoutFlush=False)
+
+        modules = list(self._iter_modules(self.module))
+        self._rig = self.module.rig
+        for module in modules:
+            self._ctrls.extend(ctrl for ctrl in module.get_ctrls() if isinstance(ctrl, BaseCtrl))
+        private_states = [(obj, self._get_private_state(obj)) for obj in modules + self._ctrls]
+
+        # Export the module without the rig, libSerialization would export every other modules.
+        # The exported objects are identified by the network libSerialization bind to them.
+        for module in modules:
+            module.rig = None
+        try:
+            with libRigging.NodeLedger() as ledger:
+                self._network = libSerialization.export_network(self.module)
+            self._networks = ledger.get_nodes()
+            for obj, state in private_states:
+                network = getattr(obj, '_network', None)
+                if network is not None:
+                    self._private_states[network] = state
+            self._ctrl_networks = [(ctrl, getattr(ctrl, '_network', None)) for ctrl in self._ctrls]
+        finally:
+            for obj, state in private_states:
+                self._set_private_state(obj, state)
+            for module in modules:
+                module.rig = self._rig
+
+        for obj in self.module.input:
+            if isinstance(obj, pymel.nodetypes.Transform):
+                for attr_name in self.ATTR_NAMES:
+                    attr = obj.attr(attr_name)
+                    self._input_values.append((attr, attr.get()))
+
+    def _restore_undo_state(self):
+        if self._undo_state is not None:
+            cmds.undoInfo(stateWithoutFlush=self._undo_state)
+            self._undo_state = None
+
+    def _delete_snapshot(self):
+        networks = [network for network in self._networks if libPymel.is_valid_PyNode(network)]
+        if networks:
+            pymel.delete(networks)
+        self._networks = []
+
+    def commit(self):
+        self._delete_snapshot()
+        self._restore_undo_state()
+
+    def rollback(self):
+        try:
+            self._rollback()
+        finally:
+            self._delete_snapshot()
+            self._restore_undo_state()
+
+    def _rollback(self):
+        # The ctrls that existed before the build had their shapes and animation fetched, hold them again.
+        ctrls = [ctrl for ctrl in self._ctrls if libPymel.is_valid_PyNode(ctrl.node)]
+        for ctrl in reversed(sorted(ctrls, key=libPymel.get_num_parents)):
+            try:
+                ctrl.unbuild()
+            except Exception, e:
+                log.warning("Can't hold {0} when rolling back {1}: {2}".format(ctrl, self.module, e))
+
+        # Delete everything created by the build in one call.
+        nodes = self.ledger.get_nodes()
+        if nodes:
+            pymel.delete(nodes)
+
+        for attr, val in self._input_values:
+            if not attr.isLocked() and not attr.isDestination():
+                attr.set(val)
+
+        # Restore the module from the snapshot, the rig is not part of the snapshot.
+        fn_skip = lambda network: libSerialization.is_network_from_class(network, 'Rig')
+        snapshot = libSerialization.import_network(self._network, module='omtk', fn_skip=fn_skip)
+        if snapshot is None:
+            raise IOError("Unexpected error restoring {0} from {1}".format(self.module, self._network))
+        self.module.__dict__.clear()
+        self.module.__dict__.update((key, val) for key, val in snapshot.__dict__.iteritems() if not key.startswith('_'))
+        self.module.__dict__.update(self._private_states.get(self._network, {}))
+
+        # The held shapes in the snapshot were consumed by the build, use the shapes held by the rollback.
+        shapes_by_network = dict((network, ctrl.shapes) for ctrl, network in self._ctrl_networks if network is not None)
+        for module in self._iter_modules(self.module):
+            module.rig = self._rig
+            for ctrl in module.get_ctrls():
+                if isinstance(ctrl, BaseCtrl):
+                    network = getattr(ctrl, '_network', None)
+                    if network in shapes_by_network:
+                        ctrl.shapes = shapes_by_network[network]
+            for obj in [module] + list(module.get_ctrls()):
+                network = getattr(obj, '_network', None)
+                if network in self._private_states:
+                    self._set_private_state(obj, self._private_states[network])
+                elif network is not None and not libPymel.is_valid_PyNode(network):
+                    del obj._network
+
+
 class Rig(object):
     DEFAULT_NAME = 'untitled'
     LEFT_CTRL_COLOR = 13  # Red
@@ -204,19 +344,18 @@ class Rig(object):
     # Main implementation
     #
 
+    @libPython.memoized_instancemethod
+    def _get_module_name_registry(self):
+        """
+        :return: A NameRegistry containing the name of every modules.
+        """
+        return className.NameRegistry(module.name for module in self.modules)
+
     def _is_name_unique(self, name):
-        return not any((True for module in self.modules if module.name == name))
+        return name not in self._get_module_name_registry()
 
     def _get_unique_name(self, name):
-        if self._is_name_unique(name):
-            return name
-
-        str_format = '{0}{1}'
-
-        i = 1
-        while not self._is_name_unique(str_format.format(name, i)):
-            i += 1
-        return str_format.format(name, i)
+        return self._get_module_name_registry().get_unique_name(name)
 
     def add_module(self, inst, *args, **kwargs):
         inst.rig = self
@@ -227,6 +366,7 @@ class Rig(object):
         inst.name = default_name
 
         self.modules.append(inst)
+        self._get_module_name_registry().reserve(inst.name)
 
         self._invalidate_cache_by_module(inst)
 
@@ -236,7 +376,21 @@ class Rig(object):
         self.modules.remove(inst)
         self._invalidate_cache_by_module(inst)
 
+    def rename_module(self, inst, name):
+        """
+        Rename a module while keeping the modules names registry up to date.
+        """
+        self._get_module_name_registry().rename(inst.name, name)
+        inst.name = name
+
     def _invalidate_cache_by_module(self, inst):
+        # The module name might still be used by another module, rebuild the names registry on demand.
+        if inst not in self.modules:
+            try:
+                del self._cache[self._get_module_name_registry.__name__]
+            except (LookupError, AttributeError):
+                pass
+
         # Some cached values might need to be invalidated depending on the module type.
         from omtk.modules.rigFaceJaw import FaceJaw
         if isinstance(inst, FaceJaw):
@@ -325,6 +479,30 @@ class Rig(object):
 
         return meshes
 
+    @libPython.memoized_instancemethod
+    def get_ray_caster(self):
+        """
+        :return: A libRigging.RayCaster shared by all the ray-casts done on the rig meshes during the build.
+        """
+        return libRigging.RayCaster(self.get_meshes())
+
+    def _free_ray_caster(self):
+        """
+        Release the intersection accelerators of the memoized RayCaster, if any, and discard it.
+        """
+        cache = self.__dict__.get('_cache', {})
+        ray_casters = cache.pop(self.get_ray_caster.__name__, {})
+        for ray_caster in ray_casters.values():
+            ray_caster.free()
+
+    @libPython.memoized_instancemethod
+    def get_closest_point_engine(self):
+        """
+        :return: A libRigging.ClosestPointEngine shared by all the closest point queries on the rig meshes during the build.
+        """
+        meshes = [mesh for mesh in self.get_meshes() if isinstance(mesh, pymel.nodetypes.Mesh)]
+        return libRigging.ClosestPointEngine(meshes)
+
     def get_nearest_affected_mesh(self, jnt):
         """
         Return the immediate mesh affected by provided object in the geometry stack.
@@ -344,11 +522,11 @@ class Rig(object):
         """
         Return the farest point on any of the rig registered geometries using provided position and direction.
         """
-        geos = self.get_meshes()
-        if not geos:
+        ray_caster = self.get_ray_caster()
+        if not ray_caster.geometries:
             return None
 
-        result = libRigging.ray_cast_farthest(pos, dir, geos)
+        result = ray_caster.cast_farthest([pos], [dir])[0]
         if not result:
             return None
 
@@ -374,10 +552,12 @@ class Rig(object):
                   create_grp_rig=True, create_grp_geo=True, create_display_layers=True, create_grp_backup=False):
         # Hack: Invalidate any cache before building anything.
         # This ensure we always have fresh data.
+        self._free_ray_caster()
         try:
             del self._cache
         except AttributeError:
             pass
+        libSkinning.invalidate_deformer_index()
 
         # Look for a root joint
         if create_grp_jnt:
@@ -464,7 +644,71 @@ class Rig(object):
                 self.layer_geo = pymel.PyNode(self.nomenclature.layer_geo_name)
             pymel.editDisplayLayerMembers(self.layer_geo, self.grp_geo, noRecurse=True)
 
-    def build(self, skip_validation=False, strict=False, **kwargs):
+    def get_build_plan(self):
+        """
+        :return: A BuildPlan ordering the modules using their dependencies.
+        """
+        return classBuildPlan.BuildPlan(self.modules)
+
+    def _build_module(self, module, skip_validation=False, strict=False, transactional=False, **kwargs):
+        """
+        Build a module. This is called by the BuildPlan in Rig.build.
+        :param transactional: If True, the module is reverted to it's previous state if the build fail.
+        :return: False if the module was not built since it is already built, locked or invalid.
+        """
+        if module.is_built():
+            return False
+
+        if not skip_validation:
+            try:
+                module.validate()
+            except Exception, e:
+                self.warning("Can't build {0}: {1}".format(module, e))
+                if strict:
+                    traceback.print_exc()
+                    raise(e)
+                return False
+
+        if module.locked:
+            return False
+
+        # Record every node created by the module so they can be deleted when un-building.
+        ledger = libRigging.NodeLedger()
+        transaction = ModuleTransaction(module, ledger) if transactional else None
+        try:
+            with libProfiler.span(module.name, category='module', type=module.__class__.__name__):
+                if transaction:
+                    transaction.begin()
+                with ledger:
+                    module.build(self, **kwargs)
+                    with libProfiler.span('post_build_module', category='rig'):
+                        self.post_build_module(module)
+                if transaction:
+                    transaction.commit()
+        except Exception, e:
+            self.error("Error building {0}. Received {1}. {2}".format(module, type(e).__name__, str(e).strip()))
+            traceback.print_exc()
+            if transaction:
+                self.info("Rolling back {0}".format(module))
+                transaction.rollback()
+            raise
+        finally:
+            module.ledger = module.filter_ledger(ledger.get_nodes())
+
+        # Remember the state of the module so rebuild() know if it changed.
+        module.fingerprint = module.get_fingerprint()
+
+        return True
+
+    def build(self, skip_validation=False, strict=False, plan=None, transactional=False, **kwargs):
+        """
+        Build the rig modules.
+        :param skip_validation: If True, the rig and it's modules won't be validated.
+        :param strict: If True, any exception will be raised.
+        :param plan: An optional BuildPlan. See get_build_plan. Use this to skip or retry specific modules.
+        :param transactional: If True, the undo queue is suspended while building the modules
+        and any module that fail to build is reverted to it's previous state.
+        """
         # # Aboard if already built
         # if self.is_built():
         #     self.warning("Can't build {0} because it's already built!".format(self))
@@ -482,62 +726,42 @@ class Rig(object):
 
         sTime = time.time()
 
-        #
-        # Prebuild
-        #
-        self.pre_build()
-
-
-        #
-        # Build
-        #
-        modules = sorted(self.modules, key=(lambda module: libPymel.get_num_parents(module.chain_jnt.start)))
-        for module in modules:
-            if module.is_built():
-                continue
-
-            if not skip_validation:
-                try:
-                    module.validate()
-                except Exception, e:
-                    self.warning("Can't build {0}: {1}".format(module, e))
-                    if strict:
-                        traceback.print_exc()
-                        raise(e)
-                    continue
-
-            if not module.locked:
-                try:
-                    module.build(self, **kwargs)
-                    self.post_build_module(module)
-                except Exception, e:
-                    self.error("Error building {0}. Received {1}. {2}".format(module, type(e).__name__, str(e).strip()))
-                    traceback.print_exc()
-                    if strict:
-                        raise(e)
-            '''
-            try:
-                # Skip any locked module
-                if not module.locked:
-                    print("Building {0}...".format(module))
-                    module.build(self, **kwargs)
-                self.post_build_module(module)
-            except Exception, e:
-                pymel.error(str(e))
-            '''
-            #    logging.error("\n\nAUTORIG BUILD FAIL! (see log)\n")
-            #    traceback.print_stack()
-            #    logging.error(str(e))
-            #    raise e
-
-        # Connect global scale to jnt root
-        if self.grp_anm:
-            if self.grp_jnt:
-                pymel.delete([module for module in self.grp_jnt.getChildren() if isinstance(module, pymel.nodetypes.Constraint)])
-                pymel.parentConstraint(self.grp_anm, self.grp_jnt, maintainOffset=True)
-                pymel.connectAttr(self.grp_anm.globalScale, self.grp_jnt.scaleX, force=True)
-                pymel.connectAttr(self.grp_anm.globalScale, self.grp_jnt.scaleY, force=True)
-                pymel.connectAttr(self.grp_anm.globalScale, self.grp_jnt.scaleZ, force=True)
+        # Resolve unique names using a registry of the scene names instead of polling the scene.
+        # Any node that is not recorded by the pre_build or a module ledger is reported.
+        with className.NameRegistry.from_scene(), libRigging.NodeLedger() as ledger_outside:
+            #
+            # Prebuild
+            #
+            with libProfiler.span('pre_build', category='rig'), libRigging.NodeLedger():
+                self.pre_build()
+
+
+            #
+            # Build
+            #
+            if plan is None:
+                plan = self.get_build_plan()
+            plan.execute(self._build_module, strict=strict, skip_validation=skip_validation, transactional=transactional,
+                         **kwargs)
+
+            # Connect global scale to jnt root
+            if self.grp_anm:
+                if self.grp_jnt:
+                    with libRigging.NodeLedger():
+                        pymel.delete([module for module in self.grp_jnt.getChildren() if isinstance(module, pymel.nodetypes.Constraint)])
+                        pymel.parentConstraint(self.grp_anm, self.grp_jnt, maintainOffset=True)
+                        pymel.connectAttr(self.grp_anm.globalScale, self.grp_jnt.scaleX, force=True)
+                        pymel.connectAttr(self.grp_anm.globalScale, self.grp_jnt.scaleY, force=True)
+                        pymel.connectAttr(self.grp_anm.globalScale, self.grp_jnt.scaleZ, force=True)
+
+        # The meshes are not ray-casted after the build.
+        self._free_ray_caster()
+
+        nodes_outside = ledger_outside.get_nodes(nested=False)
+        if nodes_outside:
+            self.warning("{0} nodes were created outside of a module: {1}".format(
+                len(nodes_outside), ', '.join(node.name() for node in nodes_outside[:10])
+            ))
 
         self.debug("[classRigRoot.Build] took {0} ms".format(time.time() - sTime))
 
@@ -592,9 +816,11 @@ class Rig(object):
         else:
             pymel.warning("Unexpected datatype {0} for {1}".format(type(val), val))
 
-    def _unbuild_modules(self, strict=False, **kwargs):
+    def _unbuild_modules(self, strict=False, modules=None, **kwargs):
         # Unbuild all children
-        for module in self.modules:
+        if modules is None:
+            modules = self.modules
+        for module in modules:
             if not module.is_built():
                 continue
 
@@ -643,13 +869,94 @@ class Rig(object):
 
         return True
 
+    def get_modules_to_rebuild(self, plan=None):
+        """
+        Resolve the modules that are not built or that changed since they were built, with their dependents.
+        :param plan: An optional BuildPlan. See get_build_plan.
+        :return: A list of modules, in build order. The locked modules are never returned.
+        """
+        if plan is None:
+            plan = self.get_build_plan()
+
+        nodes_dirty = set()
+        for node in plan.nodes:
+            module = node.module
+            if module.locked or node in nodes_dirty:
+                continue
+            if not module.is_built() or getattr(module, 'fingerprint', None) != module.get_fingerprint():
+                nodes_dirty.update(plan.get_subtree(module))
+
+        return [node.module for node in plan.nodes if node in nodes_dirty and not node.module.locked]
+
+    def hold_skin_weights(self):
+        """
+        Capture the skin weights of the rig meshes in sparse snapshots.
+        :return: A dict containing a libSkinning.SkinWeightsSnapshot for each skinned mesh.
+        """
+        if not libSkinning.use_numpy:
+            self.warning("Can't hold skin weights, numpy is not available.")
+            return {}
+
+        snapshots = {}
+        for mesh in self.get_meshes():
+            if libSkinning.get_skin_cluster(mesh) is not None:
+                snapshots[mesh] = libSkinning.SkinWeightsSnapshot.from_geometry(mesh)
+        return snapshots
+
+    def restore_skin_weights(self, snapshots):
+        """
+        Apply the snapshots returned by hold_skin_weights.
+        :return: The meshes that were restored.
+        """
+        results = []
+        for mesh, snapshot in snapshots.iteritems():
+            if not libPymel.is_valid_PyNode(mesh):
+                continue
+            try:
+                snapshot.apply(mesh)
+            except Exception, e:
+                self.warning("Can't restore skin weights on {0}: {1}".format(mesh, e))
+                continue
+            results.append(mesh)
+        return results
+
+    def rebuild(self, strict=False, dry_run=False, preserve_skin_weights=False, **kwargs):
+        """
+        Rebuild only the modules that changed since they were built and the modules that depend on them.
+        See Module.get_fingerprint.
+        :param strict: If True, any exception will be raised.
+        :param dry_run: If True, only report the modules that would be rebuilt.
+        :param preserve_skin_weights: If True, the skin weights of the rig meshes are held before un-building
+        and restored after the build. Use this to keep the weights painted since the last build.
+        :param kwargs: Potential parameters to pass to the build method of each module.
+        :return: The modules that were rebuilt or that would be rebuilt in dry run mode.
+        """
+        plan = self.get_build_plan()
+        modules = self.get_modules_to_rebuild(plan=plan)
+
+        if dry_run:
+            for module in modules:
+                self.info("Would rebuild {0}".format(module))
+            return modules
+
+        snapshots = self.hold_skin_weights() if preserve_skin_weights and modules else None
+
+        # Unbuild the children first.
+        self._unbuild_modules(strict=strict, modules=list(reversed(modules)))
+        self.build(strict=strict, plan=plan, **kwargs)
+
+        if snapshots:
+            self.restore_skin_weights(snapshots)
+        return modules
+
     #
     # Utility methods
     #
 
     def get_module_by_input(self, obj):
         for module in self.modules:
-            if obj in module.input:
+            # Don't resolve the ModuleProxy instances, see classModuleProxy.
+            if obj in classModuleProxy.get_module_input(module):
                 return module
 
     def color_module_ctrl(self, module):
@@ -0,0 +1,111 @@
+import logging
+
+import libSerialization
+import pymel.core as pymel
+from maya import OpenMaya
+
+log = logging.getLogger('omtk')
+
+
+class NetworkIndex(object):
+    """
+    Index the libSerialization networks of the scene by class name.
+    The scene is scanned once, then the index is kept current using node added and removed callbacks.
+    The callbacks only record that something changed, the changes are applied the next time the index is queried.
+    This prevent scanning every networks when a rig is built, which create and delete a lot of networks.
+    Use get_network_index() to access the index of the current scene.
+    """
+    def __init__(self):
+        self._networks = pymel.ls(type='network')
+        self._networks_by_class = {}
+        self._added = []
+        self._num_removed = 0
+        self._callbacks = []
+
+    def register_callbacks(self):
+        self._callbacks.append(OpenMaya.MDGMessage.addNodeAddedCallback(self._on_node_added, 'network'))
+        self._callbacks.append(OpenMaya.MDGMessage.addNodeRemovedCallback(self._on_node_removed, 'network'))
+
+    def remove_callbacks(self):
+        for callback in self._callbacks:
+            OpenMaya.MMessage.removeCallback(callback)
+        self._callbacks = []
+
+    def _on_node_added(self, mobject, *args):
+        self._added.append(OpenMaya.MObjectHandle(mobject))
+
+    def _on_node_removed(self, *args):
+        self._num_removed += 1
+
+    def _apply_changes(self):
+        if self._num_removed:
+            self._num_removed = 0
+            fn_exists = lambda network: network.exists()
+            self._networks = filter(fn_exists, self._networks)
+            for class_name, networks in self._networks_by_class.iteritems():
+                self._networks_by_class[class_name] = filter(fn_exists, networks)
+
+        if self._added:
+            # Note that a network could have been added and removed since the last query.
+            added = [pymel.PyNode(handle.object()) for handle in self._added if handle.isValid()]
+            self._added = []
+            known = set(self._networks)
+            added = [network for network in added if network not in known]
+            self._networks.extend(added)
+            for class_name, networks in self._networks_by_class.iteritems():
+                networks.extend(network for network in added
+                                if libSerialization.is_network_from_class(network, class_name))
+
+    def get_networks(self, class_name):
+        """
+        :param class_name: The name of the class to match, see libSerialization.is_network_from_class.
+        :return: The networks of the scene that were serialized from the class or from one of it's sub-classes.
+        """
+        self._apply_changes()
+        networks = self._networks_by_class.get(class_name)
+        if networks is None:
+            networks = self._networks_by_class[class_name] = [
+                network for network in self._networks if libSerialization.is_network_from_class(network, class_name)
+            ]
+        return list(networks)
+
+
+_network_index = None
+_network_index_callbacks = []
+
+
+def get_network_index():
+    """
+    :return: The NetworkIndex of the current scene. It is created on demand and kept until a scene is opened.
+    """
+    global _network_index
+    if _network_index is None:
+        _register_network_index_callbacks()
+        _network_index = NetworkIndex()
+        _network_index.register_callbacks()
+    return _network_index
+
+
+def invalidate_network_index(*args):
+    """
+    Discard the current NetworkIndex and remove it's callbacks.
+    This is automatically called when a scene is opened or created and before the module is reloaded.
+    """
+    global _network_index
+    if _network_index is not None:
+        _network_index.remove_callbacks()
+    _network_index = None
+    _remove_network_index_callbacks()
+
+
+def _register_network_index_callbacks():
+    if _network_index_callbacks:
+        return
+    _network_index_callbacks.append(OpenMaya.MSceneMessage.addCallback(OpenMaya.MSceneMessage.kAfterOpen, invalidate_network_index))
+    _network_index_callbacks.append(OpenMaya.MSceneMessage.addCallback(OpenMaya.MSceneMessage.kAfterNew, invalidate_network_index))
+
+
+def _remove_network_index_callbacks():
+    for callback in _network_index_callbacks:
+        OpenMaya.MMessage.removeCallback(callback)
+    del _network_index_callbacks[:]
@@ -14,6 +14,7 @@ import libQt
 import libPymel
 import libSkeleton
 import libRigging
+import libSkinningMath
 import libSkinning
 import libStringMap
 import libUtils
@@ -24,9 +25,11 @@ def _reload():
     reload(libFormula)
     reload(libPython)
     reload(libQt)
+    reload(libSkinningMath)  # Used by libPymel
     reload(libPymel)
     reload(libSkeleton)
     reload(libRigging)
+    libSkinning.remove_deformer_index_callbacks()
     reload(libSkinning)
     reload(libStringMap)
     reload(libUtils)
\ No newline at end of file
@@ -170,7 +170,14 @@ def _get_bounds_using_raycast(positions, dirs, geometries, parent_tm=None, filte
     min_x = max_x = min_y = max_y = min_z = max_z = None
     parent_tm_inv = parent_tm.inverse()
 
-    # Ray-cast
+    # Ray-cast every directions from every positions at once.
+    with libRigging.RayCaster(geometries) as ray_caster:
+        ray_cast_results = ray_caster.cast_nearest(
+            [pos for pos in positions for dir in dirs],
+            [dir for pos in positions for dir in dirs]
+        )
+    ray_cast_results = iter(ray_cast_results)
+
     for pos in positions:
         #x = pos.x
         #y = pos.y
@@ -195,7 +202,7 @@ def _get_bounds_using_raycast(positions, dirs, geometries, parent_tm=None, filte
             max_z = z_local
 
         for dir in dirs:
-            ray_cast_pos = libRigging.ray_cast_nearest(pos, dir, geometries, debug=False)
+            ray_cast_pos = next(ray_cast_results)
             if ray_cast_pos is None:
                 continue
 
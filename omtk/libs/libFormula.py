@@ -1,17 +1,31 @@
 import logging;
 import math
 import re
+import threading
 
 import pymel.core as pymel
+from maya import OpenMaya
 from maya import cmds
 
+from omtk.deps import pyparsing
+from omtk.libs import libProfiler
+from omtk.libs import libPython
 from omtk.libs import libRigging
+from omtk.libs.libPython import numpy, use_numpy
+
+# concurrent.futures is only part of the standard library since python-3, see the 'futures' backport.
+use_concurrent_futures = libPython.does_module_exist('concurrent')
+if use_concurrent_futures:
+    import concurrent.futures
 
 log = logging.getLogger(__name__);
 log.setLevel(logging.INFO)
 
 
 class Operator(object):
+    # If True, the operands can be swapped without changing the result.
+    commutative = False
+
     @staticmethod
     def can_optimise(*args):
         for arg in args:
@@ -23,16 +37,29 @@ class Operator(object):
     def execute(arg1, arg2):
         raise NotImplementedError
 
+    @staticmethod
+    def evaluate(arg1, arg2):
+        """
+        Compute the values the node created by the operator would output for numpy arrays of input values.
+        """
+        raise NotImplementedError
+
     @staticmethod
     def create(arg1, arg2):
         raise NotImplementedError
 
 
 class OperatorAddition(Operator):
+    commutative = True
+
     @staticmethod
     def execute(arg1, arg2):
         return arg1 + arg2
 
+    @staticmethod
+    def evaluate(arg1, arg2):
+        return numpy.add(arg1, arg2)
+
     @staticmethod
     def create(arg1, arg2):
         return libRigging.create_utility_node('plusMinusAverage', operation=1, input1D=[arg1, arg2]).output1D
@@ -43,16 +70,26 @@ class OperatorSubstraction(Operator):
     def execute(arg1, arg2):
         return arg1 - arg2
 
+    @staticmethod
+    def evaluate(arg1, arg2):
+        return numpy.subtract(arg1, arg2)
+
     @staticmethod
     def create(arg1, arg2):
         return libRigging.create_utility_node('plusMinusAverage', operation=2, input1D=[arg1, arg2]).output1D
 
 
 class OperatorMultiplication(Operator):
+    commutative = True
+
     @staticmethod
     def execute(arg1, arg2):
         return arg1 * arg2;
 
+    @staticmethod
+    def evaluate(arg1, arg2):
+        return numpy.multiply(arg1, arg2)
+
     @staticmethod
     def create(arg1, arg2):
         return libRigging.create_utility_node('multiplyDivide', operation=1, input1X=arg1, input2X=arg2).outputX
@@ -63,10 +100,15 @@ class OperatorDivision(Operator):
     def execute(arg1, arg2):
         return arg1 / arg2;
 
+    @staticmethod
+    def evaluate(arg1, arg2):
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return numpy.true_divide(arg1, arg2)
+
     @staticmethod
     def create(arg1, arg2):
         u = libRigging.create_utility_node('multiplyDivide', input1X=arg1, input2X=arg2)
-        u.operation.set(2)  # HACK: Prevent division by zero by changing the operator at the last second.
+        libRigging.connect_or_set_attr(u.operation, 2)  # HACK: Prevent division by zero by changing the operator at the last second.
         return u.outputX
 
 
@@ -80,6 +122,11 @@ class OperatorPow(Operator):
 
         return math.pow(arg1, arg2)
 
+    @staticmethod
+    def evaluate(arg1, arg2):
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            return numpy.power(arg1, arg2)
+
     @staticmethod
     def create(arg1, arg2):
         return libRigging.create_utility_node('multiplyDivide', operation=3, input1X=arg1, input2X=arg2).outputX
@@ -113,6 +160,17 @@ class OperatorDistance(Operator):
 
         return arg1 * arg2
 
+    @staticmethod
+    def evaluate(arg1, arg2):
+        # Points are provided as (..., 3) arrays and matrices as (..., 4, 4) arrays, '0' is the origin.
+        def _get_position(arg):
+            if arg.ndim >= 2 and arg.shape[-2:] == (4, 4):
+                return arg[..., 3, :3]
+            return arg
+        arg1 = _get_position(arg1)
+        arg2 = _get_position(arg2)
+        return numpy.sqrt(numpy.sum(numpy.square(arg2 - arg1), axis=-1))
+
     @staticmethod
     def create(arg1, arg2):
         arg1, arg2 = OperatorDistance._handle_args(arg1, arg2)
@@ -137,16 +195,28 @@ class OperatorDistance(Operator):
         return libRigging.create_utility_node('distanceBetween', **kwargs).distance
 
 
+def _create_condition(operation, arg1, arg2):
+    """
+    Create a condition node that output 1.0 if the comparison between the two operands is true, 0.0 otherwise.
+    """
+    return libRigging.create_utility_node('condition', operation=operation, firstTerm=arg1, secondTerm=arg2,
+                                          colorIfTrueR=1.0, colorIfFalseR=0.0).outColorR
+
+
 class OperatorEqual(Operator):
     @staticmethod
     def execute(arg1, arg2):
-        log.execute('[equal:execute] {0} * {1}'.format(arg1, arg2))
+        log.debug('[equal:execute] {0} * {1}'.format(arg1, arg2))
         return arg1 == arg2;
 
+    @staticmethod
+    def evaluate(arg1, arg2):
+        return numpy.equal(arg1, arg2).astype(numpy.float64)
+
     @staticmethod
     def create(arg1, arg2):
         log.debug('[equal:create] {0} * {1}'.format(arg1, arg2))
-        return libRigging.create_utility_node('condition', operation=0, colorIfTrue=1.0, colorIfFalse=0.0).outColorR
+        return _create_condition(0, arg1, arg2)
 
 
 class OperatorNotEqual(Operator):
@@ -155,8 +225,12 @@ class OperatorNotEqual(Operator):
         return arg1 != arg2;
 
     @staticmethod
-    def create(*args, **kwargs):
-        return libRigging.create_utility_node('condition', operation=1, colorIfTrue=1.0, colorIfFalse=0.0).outColorR
+    def evaluate(arg1, arg2):
+        return numpy.not_equal(arg1, arg2).astype(numpy.float64)
+
+    @staticmethod
+    def create(arg1, arg2):
+        return _create_condition(1, arg1, arg2)
 
 
 class OperatorGreater(Operator):
@@ -165,8 +239,12 @@ class OperatorGreater(Operator):
         return arg1 > arg2
 
     @staticmethod
-    def create(*args, **kwargs):
-        return libRigging.create_utility_node('condition', operation=2, colorIfTrue=1.0, colorIfFalse=0.0).outColorR
+    def evaluate(arg1, arg2):
+        return numpy.greater(arg1, arg2).astype(numpy.float64)
+
+    @staticmethod
+    def create(arg1, arg2):
+        return _create_condition(2, arg1, arg2)
 
 
 class OperatorGreaterOrEqual(Operator):
@@ -175,8 +253,12 @@ class OperatorGreaterOrEqual(Operator):
         return arg1 >= arg2;
 
     @staticmethod
-    def create(*args, **kwargs):
-        return libRigging.create_utility_node('condition', operation=3, colorIfTrue=1.0, colorIfFalse=0.0).outColorR
+    def evaluate(arg1, arg2):
+        return numpy.greater_equal(arg1, arg2).astype(numpy.float64)
+
+    @staticmethod
+    def create(arg1, arg2):
+        return _create_condition(3, arg1, arg2)
 
 
 class OperatorSmaller(Operator):
@@ -185,8 +267,12 @@ class OperatorSmaller(Operator):
         return arg1 < arg2;
 
     @staticmethod
-    def create(*args, **kwargs):
-        return libRigging.create_utility_node('condition', operation=4, colorIfTrue=1.0, colorIfFalse=0.0).outColorR
+    def evaluate(arg1, arg2):
+        return numpy.less(arg1, arg2).astype(numpy.float64)
+
+    @staticmethod
+    def create(arg1, arg2):
+        return _create_condition(4, arg1, arg2)
 
 
 class OperatorSmallerOrEqual(Operator):
@@ -195,8 +281,12 @@ class OperatorSmallerOrEqual(Operator):
         return arg1 <= arg2;
 
     @staticmethod
-    def create(*args, **kwargs):
-        return libRigging.create_utility_node('condition', operation=5, colorIfTrue=1.0, colorIfFalse=0.0).outColorR
+    def evaluate(arg1, arg2):
+        return numpy.less_equal(arg1, arg2).astype(numpy.float64)
+
+    @staticmethod
+    def create(arg1, arg2):
+        return _create_condition(5, arg1, arg2)
 
 
 # src: http://www.mathcentre.ac.uk/resources/workbooks/mathcentre/rules.pdf
@@ -230,7 +320,45 @@ for operators in _sorted_operators: _all_operators.update(operators)
 _varDelimiters = ['(', ')', '.'] + _all_operators.keys()
 _regex_splitVariables = '|'.join(re.escape(str) for str in _varDelimiters)
 
-_variables = {}
+
+def _build_grammar():
+    """
+    Build the pyparsing grammar that convert parenthesis and operators to nested string lists.
+    src: http://stackoverflow.com/questions/5454322/python-how-to-match-nested-parentheses-with-regex
+    """
+    content = pyparsing.Word(pyparsing.alphanums + '.' + '_')
+    for op in _all_operators.keys(): content |= op  # defined operators
+    return pyparsing.nestedExpr(opener='(', closer=')', content=content)
+
+_grammar = _build_grammar()
+_grammar_lock = threading.Lock()
+
+# Parsed formulas are cached as (ast, variable names) and keyed by the formula text.
+_ast_cache = {}
+
+
+def _get_ast(str):
+    """
+    Tokenize a formula, the result is cached since the same formulas are generally parsed again and again.
+    :return: A 2-sized tuple containing the nested string lists of the formula and the name of the variables used in the formula.
+    Note that the ast is shared and should never be modified.
+    """
+    try:
+        return _ast_cache[str]
+    except KeyError:
+        pass
+
+    # Identify variables
+    vars = (var.strip() for var in re.split(_regex_splitVariables, str))
+    vars = [var for var in vars if not var.isdigit()]
+    vars = filter(lambda x: x, vars)
+
+    with _grammar_lock:  # pyparsing is not guaranteed to be thread-safe
+        res = _grammar.parseString('({0})'.format(str))  # wrap all string in parenthesis, or it won't work
+    ast = res.asList()[0]
+
+    result = _ast_cache[str] = (ast, vars)
+    return result
 
 
 def basic_cast(str):
@@ -267,16 +395,23 @@ def rlen(L):
     return i
 
 
-def optimise_replaceVariables(args):
-    global _variables
-    fnIsVariable = lambda x: isinstance(x, basestring) and x in _variables
+def optimise_replaceVariables(args, variables):
+    """
+    Replace the variables by their value. Any value that is not a constant is replaced by a Symbol.
+    """
+    fnIsVariable = lambda x: isinstance(x, basestring) and x in variables
 
     out = []
     for arg in args:
         if fnIsVariable(arg):
-            arg = basic_cast(_variables[arg])
+            value = variables[arg]
+            if not isinstance(value, Symbol):
+                value = basic_cast(value)
+                if not isinstance(value, (int, float, long)):
+                    value = Symbol(arg)
+            arg = value
         elif isinstance(arg, list):
-            arg = optimise_replaceVariables(arg)
+            arg = optimise_replaceVariables(arg, variables)
         else:
             arg = basic_cast(arg)
         out.append(arg)
@@ -317,26 +452,35 @@ def _optimise_formula_remove_prefix(args):
 
 # Generic method to optimize a formula via a suite of operators
 # For now only 'sandwitched' operators are supported
-def _optimise_formula_with_operators(args, fnName, fnFilterName=None):
+def _optimise_formula_with_operators(args, fnName, fnFilterName=None, node_cache=None, packer=None):
     if len(args) < 3:
         raise Exception("A minimum of 3 arguments are necessary! Got: {0}".format(args))
-    fnRecursive_call = lambda x: _optimise_formula_with_operators(x, fnName, fnFilterName=fnFilterName) if isinstance(x,
-                                                                                                                      list) else x
+    fnRecursive_call = lambda x: _optimise_formula_with_operators(x, fnName, fnFilterName=fnFilterName,
+                                                                  node_cache=node_cache,
+                                                                  packer=packer) if isinstance(x, list) else x
+    # Resolve nested formulas first. Note that they only need to be resolved once and not for each operators,
+    # otherwise the cost would grow exponentially with the formula depth.
+    for i in range(0, len(args), 2):
+        args[i] = fnRecursive_call(args[i])
     for operators in _sorted_operators:
-        args[0] = fnRecursive_call(args[0])
         i = 1
         imax = len(args)
         while i < imax - 1:
             preArg = args[i - 1]
             perArg = args[i]
-            posArg = args[i + 1] = fnRecursive_call(args[i + 1])
+            posArg = args[i + 1]
             # Ensure we're working with operators
             if not isinstance(perArg, basestring):
                 raise IOError("Invalid operator '{0}', expected a string".format(perArg))
             cls = operators.get(perArg, None)
             if cls and (not fnFilterName or getattr(cls, fnFilterName)(preArg, posArg)):
-                fn = getattr(cls, fnName)
-                result = fn(preArg, posArg)
+                if node_cache is not None:
+                    result = node_cache.create(cls, preArg, posArg, packer=packer)
+                elif fnName == 'create':
+                    result = _create_operator(cls, preArg, posArg, packer=packer)
+                else:
+                    fn = getattr(cls, fnName)
+                    result = fn(preArg, posArg)
                 # Inject result in args
                 args[i - 1] = result
                 del args[i]
@@ -354,23 +498,377 @@ def _optimise_cleanConstants(args):
     return _optimise_formula_with_operators(args, 'execute', 'can_optimise')
 
 
-def _create_nodes(args):
-    return _optimise_formula_with_operators(args, 'create')
+def _create_nodes(args, node_cache=None, packer=None):
+    return _optimise_formula_with_operators(args, 'create', node_cache=node_cache, packer=packer)
+
+
+def _create_operator(cls, arg1, arg2, packer=None):
+    if packer is not None:
+        return packer.create(cls, arg1, arg2)
+    return cls.create(arg1, arg2)
+
+
+class ChannelPacker(object):
+    """
+    Opt-in emission mode that pack independent scalar operations of the same type in the X, Y and Z channels
+    of the same multiplyDivide or plusMinusAverage node instead of creating one node for each operations.
+    The same packer can be shared by multiple formulas.
+    ex:
+    packer = libFormula.ChannelPacker()
+    libFormula.parse_many([...], packer=packer)
+    ParserContext(variables, packer=packer).parse(...)
+    """
+    # The node type and the operation of each operator that support packing.
+    _packable_operators = {
+        OperatorAddition: ('plusMinusAverage', 1),
+        OperatorSubstraction: ('plusMinusAverage', 2),
+        OperatorMultiplication: ('multiplyDivide', 1),
+        OperatorDivision: ('multiplyDivide', 2),
+        OperatorPow: ('multiplyDivide', 3),
+    }
+    _channels = ('X', 'Y', 'Z')
+
+    def __init__(self):
+        self._nodes = {}  # The packed nodes with free channels and the number of used channels by (node type, operation).
+        self._inputs = {}  # The name of the input nodes of each node created by the packer.
+        self._history = {}  # The name of the history nodes of any other node, resolved once per formula.
+        self.num_nodes_saved = 0
+
+    def invalidate_history(self):
+        """
+        Forget the history of the nodes that were not created by the packer since it can have changed since the
+        last formula. Called before emitting each formula.
+        """
+        self._history = {}
+
+    def _get_history(self, node_name):
+        try:
+            return self._history[node_name]
+        except KeyError:
+            pass
+        # The history is queried by name, the nodes need to be in the scene.
+        node_batch = libRigging.get_node_batch()
+        if node_batch is not None:
+            node_batch.flush()
+        result = self._history[node_name] = set(cmds.listHistory(node_name) or [])
+        return result
+
+    def _get_upstream_nodes(self, args):
+        """
+        :return: The name of all the nodes that the provided operands depend on.
+        The nodes created by the packer are resolved from the connections it made, so the scene history is only
+        queried once per formula for the other nodes.
+        """
+        stack = [(arg.node().__melobject__(), True) for arg in args if isinstance(arg, pymel.Attribute)]
+        result = set()
+        while stack:
+            node_name, need_history = stack.pop()
+            if node_name in result:
+                continue
+            result.add(node_name)
+
+            inputs = self._inputs.get(node_name, None)
+            if inputs is not None:
+                stack.extend((input_name, True) for input_name in inputs)
+            elif need_history:
+                # The history already contain all the upstream nodes, only the packer nodes need to be expanded.
+                stack.extend((input_name, False) for input_name in self._get_history(node_name))
+        return result
+
+    def _record_inputs(self, result, args):
+        if not isinstance(result, pymel.Attribute):
+            return
+        inputs = self._inputs.setdefault(result.node().__melobject__(), set())
+        inputs.update(arg.node().__melobject__() for arg in args if isinstance(arg, pymel.Attribute))
+
+    @staticmethod
+    def _connect_channel(node_type, node, channel, arg1, arg2):
+        """
+        :return: The output attribute of the channel.
+        """
+        if node_type == 'multiplyDivide':
+            libRigging.connect_or_set_attr(node.attr('input1' + channel), arg1)
+            libRigging.connect_or_set_attr(node.attr('input2' + channel), arg2)
+            return node.attr('output' + channel)
+
+        channel = channel.lower()
+        libRigging.connect_or_set_attr(node.input3D[0].attr('input3D' + channel), arg1)
+        libRigging.connect_or_set_attr(node.input3D[1].attr('input3D' + channel), arg2)
+        return node.attr('output3D' + channel)
+
+    def create(self, cls, arg1, arg2):
+        try:
+            node_type, operation = self._packable_operators[cls]
+        except KeyError:
+            result = cls.create(arg1, arg2)
+            self._record_inputs(result, (arg1, arg2))
+            return result
+
+        # Find a node with a free channel. Since the operation is shared by all the channels,
+        # the node also need to be independent from the operands or we would create a cycle.
+        nodes = self._nodes.setdefault((node_type, operation), [])
+        upstream_nodes = self._get_upstream_nodes((arg1, arg2)) if nodes else None
+        for i, (node, num_used) in enumerate(nodes):
+            if not node.exists() or node.__melobject__() in upstream_nodes:
+                continue
+            result = self._connect_channel(node_type, node, self._channels[num_used], arg1, arg2)
+            self._record_inputs(result, (arg1, arg2))
+            num_used += 1
+            if num_used < len(self._channels):
+                nodes[i] = (node, num_used)
+            else:
+                del nodes[i]
+            self.num_nodes_saved += 1
+            return result
+
+        # HACK: Prevent division by zero by changing the operator after the connections (see OperatorDivision).
+        node = libRigging.create_utility_node(node_type)
+        result = self._connect_channel(node_type, node, self._channels[0], arg1, arg2)
+        libRigging.connect_or_set_attr(node.operation, operation)
+        self._record_inputs(result, (arg1, arg2))
+        nodes.append((node, 1))
+        return result
+
+
+class NodeCache(object):
+    """
+    Re-use the output of an operator when it is created again with the same operands.
+    This prevent identical sub-expressions from creating duplicated nodes.
+    """
+    def __init__(self):
+        self._outputs = {}  # The (output, operand1, operand2) by key.
+        self.num_nodes_saved = 0
+
+    @staticmethod
+    def _get_operand_key(arg):
+        # Attributes and nodes are identified by their MObject since their names can change, the values by themselves.
+        if isinstance(arg, pymel.Attribute):
+            plug = arg.__apimplug__()
+            return OpenMaya.MObjectHandle(plug.node()).hashCode(), plug.partialName(False, True, True, False, True, True)
+        if isinstance(arg, pymel.PyNode):
+            return OpenMaya.MObjectHandle(arg.__apimobject__()).hashCode(), None
+        return arg
+
+    def _get_key(self, cls, arg1, arg2):
+        key1 = self._get_operand_key(arg1)
+        key2 = self._get_operand_key(arg2)
+        if cls.commutative:
+            key1, key2 = sorted((key1, key2))
+        return cls, key1, key2
+
+    @staticmethod
+    def _is_operand_valid(arg):
+        # A deleted node hash code can be re-used by a new node.
+        if isinstance(arg, pymel.PyNode):
+            return arg.exists()
+        return True
+
+    def create(self, cls, arg1, arg2, packer=None):
+        key = self._get_key(cls, arg1, arg2)
+        try:
+            cached = self._outputs.get(key, None)
+        except TypeError:  # uncacheable. a pymel.datatypes.Matrix, for instance.
+            return _create_operator(cls, arg1, arg2, packer=packer)
+
+        if cached is not None:
+            result, cached_arg1, cached_arg2 = cached
+            if result.exists() and self._is_operand_valid(cached_arg1) and self._is_operand_valid(cached_arg2):
+                log.debug("Re-using {0} for {1}({2}, {3})".format(result, cls.__name__, arg1, arg2))
+                self.num_nodes_saved += 1
+                return result
+
+        result = _create_operator(cls, arg1, arg2, packer=packer)
+        self._outputs[key] = (result, arg1, arg2)
+        return result
+
+
+class Symbol(object):
+    """
+    A variable that is not a constant. It is only replaced by it's value when the nodes are created.
+    This allow the optimisation stages to run without access to the variables values (ex: in another thread).
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+class ParserContext(object):
+    """
+    Hold the state of a parse: the variables bindings, the optional NodeCache and the optional ChannelPacker.
+    The parse is done in two stages:
+    - optimise(): Tokenize the formula, replace the constants and remove the '-' prefix and the constants operations.
+      This stage is pure python and can run concurrently in a thread.
+    - emit(): Bind the remaining variables and create the nodes. This need to run in the Maya main thread.
+    """
+    def __init__(self, variables=None, node_cache=None, packer=None, batch=False):
+        """
+        :param variables: A dict containing the value of each variable.
+        :param node_cache: An optional NodeCache to re-use identical sub-expressions.
+        :param packer: An optional ChannelPacker to pack independent operations in the same nodes.
+        :param batch: If True, the nodes of each formula are created in a single libRigging.NodeBatch.
+        """
+        # hack: add mathematical constants in variables
+        self.variables = {
+            'e': math.e,
+            'pi': math.pi
+        }
+        if variables:
+            self.variables.update(variables)
+        self.node_cache = node_cache
+        self.packer = packer
+        self.batch = batch
+
+    def get_portable_variables(self):
+        """
+        :return: The variables where any non-constant value is replaced by a Symbol.
+        Theses can be sent to another thread since they don't hold any pymel object.
+        """
+        result = {}
+        for name, value in self.variables.iteritems():
+            if not isinstance(value, Symbol):
+                value = basic_cast(value)
+                if not isinstance(value, (int, float, long)):
+                    value = Symbol(name)
+            result[name] = value
+        return result
+
+    def optimise(self, str):
+        """
+        :return: The nested lists of arguments, or the value, the formula resolve to before creating the nodes.
+        """
+        log.debug("--------------------")
+        log.debug("PARSING: {0}".format(str))
+
+        if not isinstance(str, basestring):
+            log.debug("Formula provided is not a string! Skipped")
+            return str
+
+        # step 1: identify variables (and convert parenthesis and operators to nested string lists)
+        args, vars = _get_ast(str)
+
+        # step 2: ensure all variables are defined
+        # todo: validate vars types
+        variables = {}
+        for var in vars:
+            if not var in self.variables:
+                raise KeyError("Variable '{0}' is not defined".format(var))
+            variables[var] = self.variables[var]
+            # log.debug('\t{0} = {1}'.format(var, self.variables[var]))
+
+        num_args = len(args)
+        if num_args == 0:
+            raise IOError("Expected at least 1 argument!")
+
+        # Replace constants by their real value, other variables are replaced by a Symbol.
+        # Note that this create new lists so the cached ast is not modified by the next steps.
+        args = optimise_replaceVariables(args, variables)
+        if not isinstance(args, list): return args
+        log.debug("\tWithout variables ({0} calls) : {1}".format(rlen(args), args))
+
+        # Hack: Convert '-' prefix before a variable to a multiply operator
+        # ex: x*-3 -> x * (3 * -1)
+        args = _optimise_formula_remove_prefix(args)
+        if not isinstance(args, list): return args
+        log.debug("\tWithout '-' prefix ({0} calls): {1}".format(rlen(args), args))
+
+        # Calculate out the constants
+        args = _optimise_cleanConstants(args)
+        if not isinstance(args, list): return args
+        log.debug("\tWithout constants ({0} calls) : {1}".format(rlen(args), args))
+
+        return args
+
+    def _bind(self, arg):
+        if isinstance(arg, list):
+            return [self._bind(sub_arg) for sub_arg in arg]
+        if isinstance(arg, Symbol):
+            return self.variables[arg.name]
+        return arg
+
+    @libProfiler.profiled('formula', category='formula')
+    def emit(self, args):
+        """
+        Create the nodes from the result of optimise().
+        :return: The resulting attribute or value.
+        """
+        args = self._bind(args)
+        if not isinstance(args, list):
+            return args
+        if self.packer is not None:
+            self.packer.invalidate_history()
+        if not self.batch:
+            return _create_nodes(args, node_cache=self.node_cache, packer=self.packer)
+        # All the nodes of the formula are created in a single MDGModifier.
+        with libRigging.NodeBatch():
+            return _create_nodes(args, node_cache=self.node_cache, packer=self.packer)
+
+    def parse(self, str):
+        return self.emit(self.optimise(str))
+
+
+def _optimise_formula(str, variables):
+    """
+    Entry point to run the optimisation stage in a thread pool.
+    """
+    return ParserContext(variables).optimise(str)
 
 
 def parse(str, **inkwargs):
-    log.debug("--------------------")
-    log.debug("PARSING: {0}".format(str))
+    return ParserContext(inkwargs).parse(str)
+
+
+def parse_many(formulas, executor=None, packer=None, batch=False, **inkwargs):
+    """
+    Parse multiple formulas using the same variables.
+    :param formulas: The formulas to parse.
+    :param executor: An optional concurrent.futures.ThreadPoolExecutor used to run the optimisation stage
+    concurrently. The nodes are always created in the current thread.
+    Note that process pools are not supported since libFormula can't be imported outside of Maya.
+    :param packer: An optional ChannelPacker shared by all the formulas.
+    :param batch: If True, the nodes are created using a libRigging.NodeBatch. See ParserContext.
+    :param inkwargs: The value of each variable.
+    :return: The result of each formulas.
+    """
+    context = ParserContext(inkwargs, packer=packer, batch=batch)
+    if executor is None:
+        return [context.parse(formula) for formula in formulas]
+
+    if use_concurrent_futures and isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+        raise IOError("Unexpected executor. Expected a thread pool, got {0}".format(type(executor)))
+
+    # Only the constants are sent to the executor, the other variables are bound when the nodes are created.
+    variables = context.get_portable_variables()
+    futures = [
+        executor.submit(_optimise_formula, formula, variables) if isinstance(formula, basestring) else None
+        for formula in formulas
+    ]
+    return [
+        context.emit(future.result()) if future is not None else formula
+        for formula, future in zip(formulas, futures)
+    ]
+
+
+def evaluate(str, **inkwargs):
+    """
+    Evaluate a formula numerically instead of creating nodes.
+    This use the same operators priority as parse() and can be used to preview a formula over a lot of samples
+    without building anything or to validate the nodes created by parse().
+    ex: evaluate("1 / (e^(x^2))", x=numpy.linspace(-1.0, 1.0, 10000))
+    :param str: The formula to evaluate.
+    :param inkwargs: The value of each variable, any numpy compatible value (ex: a float, a list or a numpy array).
+    The samples are broadcasted together using the numpy rules. Points are provided as (..., 3) arrays and
+    matrices as (..., 4, 4) arrays.
+    :return: A numpy array containing the result for each samples.
+    """
+    if not use_numpy:
+        raise Exception("Cannot evaluate formula, numpy is not available.")
 
     if not isinstance(str, basestring):
-        log.debug("Formula provided is not a string! Skipped")
-        return str
+        return numpy.asarray(str, dtype=numpy.float64)
 
-    # step 1: identify variables
-    vars = (var.strip() for var in re.split(_regex_splitVariables, str))
-    vars = [var for var in vars if not var.isdigit()]
-    vars = filter(lambda x: x, vars)
-    # print 'found vars:', vars
+    args, vars = _get_ast(str)
 
     # hack: add mathematical constants in variables
     kwargs = {
@@ -379,53 +877,37 @@ def parse(str, **inkwargs):
     }
     kwargs.update(inkwargs)
 
-    # step 2: ensure all variables are defined
-    # todo: validate vars types
-    global _variables
-    _variables = {}
+    values = {}
     for var in vars:
         if not var in kwargs:
             raise KeyError("Variable '{0}' is not defined".format(var))
-        _variables[var] = kwargs[var]
-        # log.debug('\t{0} = {1}'.format(var, kwargs[var]))
-    # print 'defined variables are:', dicVariables
-
-    # Convert parenthesis and operators to nested string lists
-    # src: http://stackoverflow.com/questions/5454322/python-how-to-match-nested-parentheses-with-regex
-    from omtk.deps import pyparsing  # make sure you have this installed
-    content = pyparsing.Word(pyparsing.alphanums + '.' + '_')
-    for op in _all_operators.keys(): content |= op  # defined operators
-    nestedExpr = pyparsing.nestedExpr(opener='(', closer=')', content=content)
-    res = nestedExpr.parseString('({0})'.format(str))  # wrap all string in parenthesis, or it won't work
-    args = res.asList()[0]
-
-    num_args = len(args)
-    if num_args == 0:
-        raise IOError("Expected at least 1 argument!")
-
-    # Replace variables by their real value
-    # We're only iterating on every operators (ex: range(1,4,2)
-    args = optimise_replaceVariables(args)
-    if not isinstance(args, list): return args
-    log.debug("\tWithout variables ({0} calls) : {1}".format(rlen(args), args))
-
-    # Hack: Convert '-' prefix before a variable to a multiply operator
-    # ex: x*-3 -> x * (3 * -1)
-    args = _optimise_formula_remove_prefix(args)
-    if not isinstance(args, list): return args
-    log.debug("\tWithout '-' prefix ({0} calls): {1}".format(rlen(args), args))
-
-    # Calculate out the constants
-    args = _optimise_cleanConstants(args)
-    if not isinstance(args, list): return args
-    log.debug("\tWithout constants ({0} calls) : {1}".format(rlen(args), args))
-
-    # Create nodes
-    # log.debug("Creating nodes...")
-    return _create_nodes(args)
-    # log.debug("ALL DONE!")
-
-    return None
+        values[var] = numpy.asarray(kwargs[var], dtype=numpy.float64)
+
+    def _resolve(args):
+        # Only cast the constants, the variables are resolved after the '-' prefix are handled since
+        # the arrays cannot be compared with the operators.
+        return [_resolve(arg) if isinstance(arg, list) else (arg if arg in values else basic_cast(arg)) for arg in args]
+
+    def _bind(arg):
+        if isinstance(arg, list):
+            return [_bind(sub_arg) for sub_arg in arg]
+        if isinstance(arg, basestring):
+            return values.get(arg, arg)  # operators are kept as is
+        return numpy.asarray(arg, dtype=numpy.float64)
+
+    def _unwrap(args):
+        while isinstance(args, list) and len(args) == 1:
+            args = args[0]
+        return args
+
+    args = _unwrap(_resolve(args))
+    if not isinstance(args, list):
+        return _bind(args)
+    args = _unwrap(_optimise_formula_remove_prefix(args))
+    args = _bind(args)
+    if not isinstance(args, list):
+        return args
+    return _optimise_formula_with_operators(args, 'evaluate')
 
 
 def parseToVar(name, formula, vars):
@@ -439,15 +921,26 @@ def parseToVar(name, formula, vars):
 #
 # todo: Fix regression of automatic node renaming
 class Formula(object):
+    """
+    Define multiple variables from formulas that can reference each others.
+    Identical sub-expressions are only created once across all the variables.
+    """
     def __init__(self, **kwargs):
+        self.__dict__['_node_cache'] = NodeCache()
         self.__dict__.update(kwargs)
 
     def add_variable(self, name, formula, **kwargs):
         kwargs.update(self.__dict__)
-        value = parse(formula, **kwargs)
+        value = ParserContext(kwargs, node_cache=self._node_cache).parse(formula)
         self.__dict__[name] = value
         return value
 
+    def get_num_nodes_saved(self):
+        """
+        :return: The number of nodes that were not created since an identical sub-expression already existed.
+        """
+        return self._node_cache.num_nodes_saved
+
     def __setattr__(self, key, value):
         self.add_variable(key, value)
         # parseToVar(key, value, self.__dict__)
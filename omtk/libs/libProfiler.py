@@ -0,0 +1,257 @@
+"""
+Hierarchical profiling of a rig build.
+
+ex:
+with libProfiler.Profiler() as profiler:
+    rig.build()
+profiler.export_chrome_trace('build.json')  # Open in chrome://tracing
+profiler.print_summary()
+
+The code to profile is wrapped in spans. A span cost nothing when no Profiler is active.
+with libProfiler.span('my_step', category='module'):
+    ...
+"""
+import functools
+import gc
+import json
+import logging
+import timeit
+
+from maya import OpenMaya
+
+log = logging.getLogger('omtk')
+
+# The active Profiler, if any.
+_profiler = None
+
+
+class Span(object):
+    """
+    A profiled section of code. The values are inclusive of the children spans.
+    """
+    __slots__ = ('name', 'category', 'args', 'parent', 'children', 'start', 'end', 'num_nodes', 'num_objects')
+
+    def __init__(self, name, category, args=None, parent=None):
+        self.name = name
+        self.category = category
+        self.args = args or {}
+        self.parent = parent
+        self.children = []
+        self.start = None
+        self.end = None
+        self.num_nodes = None
+        self.num_objects = None
+
+    def __repr__(self):
+        return '<Span {0} {1:.3f}s>'.format(self.name, self.duration)
+
+    @property
+    def duration(self):
+        return (self.end - self.start) if self.end is not None else 0.0
+
+    @property
+    def self_duration(self):
+        """
+        :return: The duration of the span, excluding it's children.
+        """
+        return self.duration - sum(child.duration for child in self.children)
+
+    def iter_descendants(self):
+        for child in self.children:
+            yield child
+            for descendant in child.iter_descendants():
+                yield descendant
+
+
+class Profiler(object):
+    """
+    Record the nested spans executed while the profiler is active.
+    For each span the wall time and the number of DG nodes created is recorded.
+    :param track_objects: If True, the number of python objects tracked by the garbage collector that were
+    created and not released by each span is also recorded. This is a lot slower, only use it when needed.
+    """
+    def __init__(self, track_objects=False):
+        self.track_objects = track_objects
+        self.root = Span('root', 'root')
+        self._current = self.root
+        self._num_nodes = 0
+        self._callbacks = []
+        self._parent = None
+
+    def __enter__(self):
+        global _profiler
+        self._parent = _profiler
+        _profiler = self
+        self._callbacks.append(OpenMaya.MDGMessage.addNodeAddedCallback(self._on_node_added, 'dependNode'))
+        self._start_span(self.root)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _profiler
+        self._end_span(self.root)
+        for callback in self._callbacks:
+            OpenMaya.MMessage.removeCallback(callback)
+        self._callbacks = []
+        _profiler = self._parent
+        self._parent = None
+
+    def _on_node_added(self, *args):
+        self._num_nodes += 1
+
+    def _get_num_objects(self):
+        if not self.track_objects:
+            return None
+        return len(gc.get_objects())
+
+    def _start_span(self, span):
+        span.num_nodes = self._num_nodes
+        span.num_objects = self._get_num_objects()
+        span.start = timeit.default_timer()
+
+    def _end_span(self, span):
+        span.end = timeit.default_timer()
+        span.num_nodes = self._num_nodes - span.num_nodes
+        if span.num_objects is not None:
+            span.num_objects = self._get_num_objects() - span.num_objects
+
+    def enter_span(self, name, category, args=None):
+        span = Span(name, category, args=args, parent=self._current)
+        self._current.children.append(span)
+        self._current = span
+        self._start_span(span)
+        return span
+
+    def exit_span(self, span):
+        self._end_span(span)
+        self._current = span.parent
+
+    def iter_spans(self):
+        return self.root.iter_descendants()
+
+    #
+    # Export
+    #
+
+    def to_chrome_trace(self):
+        """
+        :return: The spans in the chrome trace event format. See chrome://tracing.
+        """
+        events = []
+        for span in self.iter_spans():
+            args = dict(span.args)
+            args['nodes'] = span.num_nodes
+            if span.num_objects is not None:
+                args['objects'] = span.num_objects
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': (span.start - self.root.start) * 1000000.0,
+                'dur': span.duration * 1000000.0,
+                'pid': 1,
+                'tid': 1,
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path):
+        with open(path, 'w') as fp:
+            json.dump(self.to_chrome_trace(), fp)
+
+    def get_summary(self, category='module'):
+        """
+        Aggregate the spans by name for a specific category.
+        :return: A list of dict sorted by duration, the slowest first.
+        The duration, nodes and objects are inclusive. The count of each sub-category is also provided.
+        """
+        rows = {}
+        for span in self.iter_spans():
+            if span.category != category:
+                continue
+            row = rows.get(span.name)
+            if row is None:
+                row = rows[span.name] = {
+                    'name': span.name,
+                    'calls': 0,
+                    'duration': 0.0,
+                    'self_duration': 0.0,
+                    'nodes': 0,
+                    'objects': None,
+                    'children': {},
+                }
+            row['calls'] += 1
+            row['duration'] += span.duration
+            row['self_duration'] += span.self_duration
+            row['nodes'] += span.num_nodes
+            if span.num_objects is not None:
+                row['objects'] = (row['objects'] or 0) + span.num_objects
+            for descendant in span.iter_descendants():
+                row['children'][descendant.category] = row['children'].get(descendant.category, 0) + 1
+        return sorted(rows.values(), key=lambda row: row['duration'], reverse=True)
+
+    def print_summary(self, category='module'):
+        rows = self.get_summary(category=category)
+        print('{0:<40} {1:>6} {2:>10} {3:>10} {4:>8} {5:>12}  {6}'.format(
+            category, 'calls', 'total (s)', 'self (s)', 'nodes', 'objects', 'children'
+        ))
+        for row in rows:
+            print('{name:<40} {calls:>6} {duration:>10.3f} {self_duration:>10.3f} {nodes:>8} {objects:>12}  {children}'.format(
+                children=', '.join('{0}: {1}'.format(key, val) for key, val in sorted(row['children'].iteritems())),
+                objects='' if row['objects'] is None else row['objects'],
+                **dict((key, val) for key, val in row.iteritems() if key not in ('children', 'objects'))
+            ))
+        print('{0:<40} {1:>6} {2:>10.3f}'.format('total', '', self.root.duration))
+
+
+def get_profiler():
+    """
+    :return: The active Profiler or None.
+    """
+    return _profiler
+
+
+class span(object):
+    """
+    Profile a section of code in the active Profiler, if any.
+    with libProfiler.span('create_ctrls', category='ctrl'):
+        ...
+    """
+    __slots__ = ('name', 'category', 'args', '_span', '_profiler')
+
+    def __init__(self, name, category='omtk', **kwargs):
+        self.name = name
+        self.category = category
+        self.args = kwargs
+        self._span = None
+        self._profiler = None
+
+    def __enter__(self):
+        if _profiler is not None:
+            # The span is closed by the profiler that opened it, even if another profiler is activated meanwhile.
+            self._profiler = _profiler
+            self._span = _profiler.enter_span(self.name, self.category, args=self.args)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._span is not None:
+            self._profiler.exit_span(self._span)
+        self._span = None
+        self._profiler = None
+
+
+def profiled(name=None, category='omtk'):
+    """
+    Decorator that profile each call of a function in the active Profiler, if any.
+    :param name: The name of the span. By default the function name is used.
+    """
+    def deco(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            with span(span_name, category=category):
+                return func(*args, **kwargs)
+        return run
+    return deco
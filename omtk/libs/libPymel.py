@@ -2,6 +2,8 @@ import logging
 
 import pymel.core as pymel
 from maya import OpenMaya
+from omtk.libs import libSkinningMath
+from omtk.libs.libPython import use_numpy
 
 
 #
@@ -294,6 +296,10 @@ class Segment(object):
 
 
 class SegmentCollection(object):
+    # Damn float imprecision
+    BOUND_MIN = libSkinningMath.BOUND_MIN
+    BOUND_MAX = libSkinningMath.BOUND_MAX
+
     def __init__(self, segments=None):
         if segments is None:
             segments = []
@@ -302,24 +308,37 @@ class SegmentCollection(object):
         self.knots = [segment.pos_s for segment in self.segments]
         self.knots.append(self.segments[-1].pos_e)
 
+        # The segments math is done by libSkinningMath using tuples.
+        self._knot_positions = [(knot.x, knot.y, knot.z) for knot in self.knots]
+
+    def get_knot_positions(self):
+        """
+        :return: The position of each knots as (x, y, z) tuples.
+        """
+        return list(self._knot_positions)
+
+    def _closest_segment_index(self, pos):
+        return libSkinningMath.closest_segment_index(self._knot_positions, (pos.x, pos.y, pos.z))
+
     def closest_segment(self, pos):
-        bound_min = -0.000000000001  # Damn float imprecision
-        bound_max = 1.0000000000001  # Damn float imprecision
-        num_segments = len(self.segments)
-        for i, segment in enumerate(self.segments):
-            distance_normalized = segment.closest_point_normalized_distance(pos)
-            if bound_min <= distance_normalized <= bound_max:
-                return segment, distance_normalized
-            elif i == 0 and distance_normalized < bound_min:  # Handle out-of-bound
-                return segment, 0.0
-            elif i == (num_segments-1) and distance_normalized > bound_max:  # Handle out-of-bound
-                return segment, 1.0
-        raise Exception("Can't resolve segment for {0}".format(pos))
+        index, ratio = self._closest_segment_index(pos)
+        return self.segments[index], ratio
 
     def closest_segment_index(self, pos):
-        closest_segment, ratio = self.closest_segment(pos)
-        index = self.segments.index(closest_segment)
-        return index, ratio
+        return self._closest_segment_index(pos)
+
+    def closest_segments(self, points, epsilon=0.001):
+        """
+        Bulk equivalent of closest_segment_index.
+        :param points: A (N,3) array of positions.
+        :param epsilon: Segments shorter than this are considered degenerated and always return a ratio of zero.
+        :return: A 2-sized tuple containing the segment indices and the ratios on the segments, as arrays of size N.
+        If numpy is not available, two lists are returned instead.
+        """
+        if not use_numpy:
+            results = [libSkinningMath.closest_segment_index(self._knot_positions, pos, epsilon=epsilon) for pos in points]
+            return [index for index, _ in results], [ratio for _, ratio in results]
+        return libSkinningMath.closest_segments(self._knot_positions, points, epsilon=epsilon)
 
     def get_knot_weights(self, dropoff=1.0, normalize=True):
         num_knots = len(self.knots)
@@ -1,4 +1,5 @@
 import imp
+import importlib
 import logging
 import threading
 import time
@@ -16,6 +17,21 @@ def does_module_exist(module_name):
         return False
 
 
+def import_optional_module(module_name):
+    """
+    Import a module that is not available in every Maya versions.
+    :return: The module or None if it can't be found.
+    """
+    if not does_module_exist(module_name.split('.')[0]):
+        return None
+    return importlib.import_module(module_name)
+
+
+# numpy is not shipped with every Maya version, the vectorized code fallback to pure-python if it is missing.
+numpy = import_optional_module('numpy')
+use_numpy = numpy is not None
+
+
 # src: http://code.activestate.com/recipes/66472/
 def frange(start, end=None, inc=None):
     "A range function, that does accept float increments..."
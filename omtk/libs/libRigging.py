@@ -1,14 +1,19 @@
+import collections
 import logging
 import logging as log
 import math
 
 import pymel.core as pymel
+from pymel.internal import factories as pymel_factories
 from maya import OpenMaya
 from maya import cmds
 from maya import mel
 
 import libPython
+from omtk.libs.libPython import numpy, use_numpy
+from omtk.libs import libProfiler
 from omtk.libs import libPymel
+from omtk.libs import libSkinning
 
 '''
 This method facilitate the creation of utility nodes by connecting/settings automaticly attributes.
@@ -21,6 +26,254 @@ def is_basic_type(_val):
     return type(_val) in __aBasicTypes
 
 
+# The active NodeBatch, if any.
+_node_batch = None
+
+# Set to False to create the nodes immediately even inside a NodeBatch. Used to benchmark the batches.
+use_node_batch = True
+
+
+class _NodeBatchUndoItem(object):
+    """
+    Register an executed MDGModifier in the Maya undo queue using the pymel api undo queue.
+    """
+    def __init__(self, modifier):
+        self.modifier = modifier
+        self.is_done = True
+        self.is_discarded = False
+
+    def undoIt(self):
+        if self.is_done:
+            self.modifier.undoIt()
+            self.is_done = False
+
+    def redoIt(self):
+        # A batch reverted by NodeBatch.undo is never redone.
+        if not self.is_done and not self.is_discarded:
+            self.modifier.doIt()
+            self.is_done = True
+
+
+class NodeBatch(object):
+    """
+    Collect the nodes creation, attributes values and connections done by create_utility_node and
+    connect_or_set_attr and execute them in a single MDGModifier.doIt() when leaving the context.
+    ex:
+    with libRigging.NodeBatch():
+        u = libRigging.create_utility_node('multiplyDivide', input1X=attr_src, input2X=2.0)
+    Note that the nodes are only added to the scene when the batch is executed. Anything that need to query
+    the scene (ex: Attribute.get(), pymel.connectAttr or any maya.cmds function using the node name) need to
+    call flush() first.
+    Each execution is registered in the Maya undo queue so the batch can be undone like any maya.cmds call.
+    If an exception occur in the context, the batch is reverted.
+    """
+    def __init__(self):
+        self._modifier = OpenMaya.MDGModifier()
+        self._connections = collections.OrderedDict()  # The pending (source, destination) plugs by destination.
+        self._num_pending = 0
+        self._undo_items = []
+        self._parent = None
+        self._is_active = False
+        self.num_operations = 0
+
+    def __enter__(self):
+        global _node_batch
+        if not use_node_batch:
+            return self
+        # Nested batches are merged in the outermost batch.
+        self._parent = _node_batch
+        if self._parent is None:
+            _node_batch = self
+            self._is_active = True
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _node_batch
+        if not self._is_active:
+            return
+        _node_batch = None
+        self._is_active = False
+        if exc_type is None:
+            self.flush()
+        else:
+            self._modifier = OpenMaya.MDGModifier()
+            self._connections.clear()
+            self._num_pending = 0
+            self.undo()
+
+    def flush(self):
+        """
+        Execute the pending operations.
+        """
+        if self._parent is not None:
+            return self._parent.flush()
+        if not self._num_pending:
+            return
+        for plug_src, plug_dst in self._connections.itervalues():
+            # Same behavior as pymel.connectAttr(force=True)
+            existing_plugs = OpenMaya.MPlugArray()
+            plug_dst.connectedTo(existing_plugs, True, False)
+            for i in range(existing_plugs.length()):
+                self._modifier.disconnect(existing_plugs[i], plug_dst)
+            self._modifier.connect(plug_src, plug_dst)
+        self._connections.clear()
+        self._modifier.doIt()
+        undo_item = _NodeBatchUndoItem(self._modifier)
+        pymel_factories.apiUndo.append(undo_item)
+        self._undo_items.append(undo_item)
+        self._modifier = OpenMaya.MDGModifier()
+        self._num_pending = 0
+
+    def undo(self):
+        """
+        Revert the executed operations.
+        """
+        for undo_item in reversed(self._undo_items):
+            undo_item.undoIt()
+            undo_item.is_discarded = True
+        self._undo_items = []
+
+    def _push(self):
+        self._num_pending += 1
+        self.num_operations += 1
+
+    def create_node(self, node_type, name=None):
+        mobject = self._modifier.createNode(node_type)
+        if name:
+            self._modifier.renameNode(mobject, name)
+        self._push()
+        return pymel.PyNode(mobject)
+
+    def connect(self, attr_src, attr_dst):
+        plug_src = attr_src.__apimplug__()
+        plug_dst = attr_dst.__apimplug__()
+        # Same behavior as pymel.connectAttr, an array source is connected using it's first element. ex: worldMatrix
+        if plug_src.isArray():
+            plug_src = plug_src.elementByLogicalIndex(0)
+        # The connections are only resolved when flushing since the destination
+        # can be connected again before the batch is executed.
+        self._connections[plug_dst.name()] = (plug_src, plug_dst)
+        self._push()
+
+    def set(self, attr, value):
+        plug = attr.__apimplug__()
+        if self._set_plug_value(plug, value):
+            self._push()
+            return
+
+        # Unsupported value, execute everything and fallback to pymel.
+        self.flush()
+        attr.set(value)
+
+    def _set_plug_value(self, plug, value):
+        """
+        Queue a new plug value.
+        :return: False if the value type is not supported.
+        """
+        if isinstance(value, pymel.datatypes.Matrix):
+            mmatrix = OpenMaya.MMatrix()
+            OpenMaya.MScriptUtil.createMatrixFromList([value[i][j] for i in range(4) for j in range(4)], mmatrix)
+            self._modifier.newPlugValue(plug, OpenMaya.MFnMatrixData().create(mmatrix))
+            return True
+
+        if isinstance(value, (pymel.datatypes.Vector, pymel.datatypes.Point)):
+            if not plug.isCompound() or plug.numChildren() != 3:
+                return False
+            return all(self._set_plug_value(plug.child(i), val) for i, val in enumerate((value.x, value.y, value.z)))
+
+        if not isinstance(value, (int, float, bool)):
+            return False
+
+        attr_obj = plug.attribute()
+        if attr_obj.hasFn(OpenMaya.MFn.kEnumAttribute):
+            self._modifier.newPlugValueInt(plug, int(value))
+        elif attr_obj.hasFn(OpenMaya.MFn.kNumericAttribute):
+            unit_type = OpenMaya.MFnNumericAttribute(attr_obj).unitType()
+            if unit_type == OpenMaya.MFnNumericData.kBoolean:
+                self._modifier.newPlugValueBool(plug, bool(value))
+            elif unit_type in (OpenMaya.MFnNumericData.kByte, OpenMaya.MFnNumericData.kChar,
+                               OpenMaya.MFnNumericData.kShort, OpenMaya.MFnNumericData.kInt):
+                self._modifier.newPlugValueInt(plug, int(value))
+            elif unit_type == OpenMaya.MFnNumericData.kFloat:
+                self._modifier.newPlugValueFloat(plug, float(value))
+            elif unit_type == OpenMaya.MFnNumericData.kDouble:
+                self._modifier.newPlugValueDouble(plug, float(value))
+            else:
+                return False
+        elif attr_obj.hasFn(OpenMaya.MFn.kUnitAttribute):
+            # Values are provided in ui units like pymel.
+            unit_type = OpenMaya.MFnUnitAttribute(attr_obj).unitType()
+            if unit_type == OpenMaya.MFnUnitAttribute.kDistance:
+                self._modifier.newPlugValueMDistance(plug, OpenMaya.MDistance(value, OpenMaya.MDistance.uiUnit()))
+            elif unit_type == OpenMaya.MFnUnitAttribute.kAngle:
+                self._modifier.newPlugValueMAngle(plug, OpenMaya.MAngle(value, OpenMaya.MAngle.uiUnit()))
+            elif unit_type == OpenMaya.MFnUnitAttribute.kTime:
+                self._modifier.newPlugValueMTime(plug, OpenMaya.MTime(value, OpenMaya.MTime.uiUnit()))
+            else:
+                return False
+        else:
+            return False
+        return True
+
+
+# The active NodeLedgers, the innermost last.
+_node_ledgers = []
+_node_ledger_callback = None
+
+
+class NodeLedger(object):
+    """
+    Record every node created while the ledger is active.
+    ex:
+    with libRigging.NodeLedger() as ledger:
+        module.build()
+    nodes = ledger.get_nodes()
+    A node is recorded by every active ledger, use get_nodes(nested=False) to ignore the nodes of nested ledgers.
+    """
+    def __init__(self):
+        self._handles = []
+
+    def __enter__(self):
+        global _node_ledger_callback
+        if _node_ledger_callback is None:
+            _node_ledger_callback = OpenMaya.MDGMessage.addNodeAddedCallback(_on_node_ledger_node_added, 'dependNode')
+        _node_ledgers.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _node_ledger_callback
+        _node_ledgers.remove(self)
+        if not _node_ledgers:
+            OpenMaya.MMessage.removeCallback(_node_ledger_callback)
+            _node_ledger_callback = None
+
+    def __len__(self):
+        return len(self._handles)
+
+    def get_nodes(self, nested=True):
+        """
+        :param nested: If False, the nodes also recorded by a nested ledger are ignored.
+        :return: The recorded nodes that still exist.
+        """
+        return [pymel.PyNode(handle.object()) for handle, is_nested in self._handles
+                if handle.isValid() and (nested or not is_nested)]
+
+
+def _on_node_ledger_node_added(mobject, *args):
+    if _node_ledgers:
+        handle = OpenMaya.MObjectHandle(mobject)
+        for ledger in _node_ledgers[:-1]:
+            ledger._handles.append((handle, True))
+        _node_ledgers[-1]._handles.append((handle, False))
+
+
+def get_node_batch():
+    """
+    :return: The active NodeBatch or None.
+    """
+    return _node_batch
+
+
 def connect_or_set_attr(_attr, _val):
     if isinstance(_val, list) or isinstance(_val, tuple):
 
@@ -41,9 +294,15 @@ def connect_or_set_attr(_attr, _val):
         '''
     else:
         if isinstance(_val, pymel.Attribute):
-            pymel.connectAttr(_val, _attr, force=True)
+            if _node_batch is not None:
+                _node_batch.connect(_val, _attr)
+            else:
+                pymel.connectAttr(_val, _attr, force=True)
         elif is_basic_type(_val):
-            _attr.set(_val)
+            if _node_batch is not None:
+                _node_batch.set(_attr, _val)
+            else:
+                _attr.set(_val)
         else:
             logging.error(
                 '[ConnectOrSetAttr] Invalid value for attribute {0} of type {1} and value {2}'.format(_attr.name(),
@@ -53,7 +312,10 @@ def connect_or_set_attr(_attr, _val):
 
 
 def create_utility_node(_sClass, name=None, *args, **kwargs):
-    uNode = pymel.createNode(_sClass, name=name) if name else pymel.createNode(_sClass)
+    if _node_batch is not None:
+        uNode = _node_batch.create_node(_sClass, name=name)
+    else:
+        uNode = pymel.createNode(_sClass, name=name) if name else pymel.createNode(_sClass)
     for sAttrName, pAttrValue in kwargs.items():
         if not uNode.hasAttr(sAttrName):
             raise Exception(
@@ -419,17 +681,13 @@ def get_affected_geometries(*objs):
     :return: The geometries affected by the object.
     """
     geometries = set()
+    deformer_index = libSkinning.get_deformer_index()
 
     for obj in objs:
         if isinstance(obj, pymel.nodetypes.Joint):
             # Collect all geometries affected by the joint.
-            skinClusters = set()
-            for hist in obj.listHistory(future=True):
-                if isinstance(hist, pymel.nodetypes.SkinCluster):
-                    skinClusters.add(hist)
-
-            for skinCluster in skinClusters:
-                for geometry in skinCluster.getOutputGeometry():
+            for skinCluster in deformer_index.get_skin_clusters(obj):
+                for geometry in deformer_index.get_output_geometries(skinCluster):
                     if isinstance(geometry, pymel.nodetypes.Mesh):  # Only Mesh are supported for now
                         geometries.add(geometry)
 
@@ -485,14 +743,7 @@ def get_recommended_ctrl_size(obj, geometries=None, default_value=1.0, weight_x=
         # Collect all geometries affected by the joint.
         # todo: maybe filter only affected geometries?
         if geometries is None:
-            skinClusters = set()
-            for hist in obj.listHistory(future=True):
-                if isinstance(hist, pymel.nodetypes.SkinCluster):
-                    skinClusters.add(hist)
-            geometries = set()
-            for skinCluster in skinClusters:
-                geometries.update(skinCluster.getOutputGeometry())
-            geometries = filter(lambda x: isinstance(x, pymel.nodetypes.Mesh), geometries)  # Ensure we only deal with meshes
+            geometries = get_affected_geometries(obj)
 
         # Create a number of raycast for each geometry. Use the longuest distance.
         # Note that we are not using the negative Y axis, this give bettern result for example on shoulders.
@@ -514,15 +765,12 @@ def get_recommended_ctrl_size(obj, geometries=None, default_value=1.0, weight_x=
         if weight_neg_z:
             dirs.append(OpenMaya.MVector(-ref_tm.a20, -ref_tm.a21, -ref_tm.a22))  # Z Axis
 
+        # Use the nearest hit of each geometry, the longuest distance win.
         length = 0
-        results = OpenMaya.MPointArray()
-        for geometry in geometries:
-            mfn_geo = geometry.__apimfn__()
-            for dir in dirs:
-                if mfn_geo.intersect(pos, dir, results, 1.0e-10, OpenMaya.MSpace.kWorld):
-                    cur_length = min((results[0].distanceTo(pos) for i in range(results.length())))
-                    if cur_length > length:
-                        length = cur_length
+        with RayCaster(geometries, tolerance=1.0e-10) as ray_caster:
+            hit_distances = ray_caster.intersect([pos], dirs)[2]
+        if len(hit_distances):
+            length = float(max(hit_distances))
         if not length:
             length = obj.radius.get()
         return length
@@ -532,39 +780,206 @@ def get_recommended_ctrl_size(obj, geometries=None, default_value=1.0, weight_x=
     )
     return default_value
 
+class RayCaster(object):
+    """
+    Fire multiple rays against the same geometries.
+    The MFnMesh of each geometry is only resolved once and the intersections are done using
+    Maya intersection accelerator (MMeshIsectAccelParams) which is built on the first ray and cached by Maya.
+    Note that the accelerator is invalidated by Maya when the mesh change.
+    The accelerators are kept in memory until free() is called, the RayCaster can be used as a context manager.
+    ex:
+    with libRigging.RayCaster(geometries) as ray_caster:
+        points = ray_caster.cast_nearest(origins, directions)
+    """
+    def __init__(self, geometries, tolerance=1.0e-5, max_distance=1.0e+8):
+        """
+        :param geometries: The geometries to intersect.
+        :param tolerance: The intersection tolerance, see ray_cast.
+        :param max_distance: The maximum distance a ray can travel.
+        """
+        self.tolerance = tolerance
+        self.max_distance = max_distance
+        self._geometries = []
+        self._mfns = []
+        self._accel_params = []
+
+        for geometry in geometries:
+            # Resolve the MFnMesh, note that in some case (ex: a mesh with zero vertices), pymel will return a MFnDagNode.
+            # If this happen we'll want to ignore the mesh.
+            mfn_geo = geometry.__apimfn__()
+            if not isinstance(mfn_geo, OpenMaya.MFnMesh):
+                pymel.warning("Can't proceed with raycast, mesh is invalid: {0}".format(geometry.__melobject__()))
+                continue
+            self._geometries.append(geometry)
+            self._mfns.append(mfn_geo)
+            self._accel_params.append(mfn_geo.autoUniformGridParams())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.free()
+
+    @property
+    def geometries(self):
+        return self._geometries
+
+    def free(self):
+        """
+        Release the intersection accelerators cached by Maya.
+        """
+        for geometry, mfn_geo in zip(self._geometries, self._mfns):
+            if geometry.exists():
+                mfn_geo.freeCachedIntersectionAccelerator()
+
+    def _get_rays(self, origins, directions):
+        """
+        Convert the provided rays to the types expected by MFnMesh.
+        If only one origin or direction is provided, it will be used for all the rays.
+        :return: A list of (OpenMaya.MFloatPoint, OpenMaya.MFloatVector) rays.
+        """
+        origins = list(origins)
+        directions = list(directions)
+        if len(origins) == 1:
+            origins = origins * len(directions)
+        elif len(directions) == 1:
+            directions = directions * len(origins)
+        if len(origins) != len(directions):
+            raise Exception("Expected the same number of origins and directions, got {0} and {1}.".format(
+                len(origins), len(directions)
+            ))
+
+        # The directions are normalized so the hit ray parameter match the hit distance.
+        return [
+            (OpenMaya.MFloatPoint(origin.x, origin.y, origin.z),
+             OpenMaya.MFloatVector(direction.x, direction.y, direction.z).normal())
+            for origin, direction in zip(origins, directions)
+        ]
+
+    @libProfiler.profiled('raycast', category='raycast')
+    def intersect(self, origins, directions, all_hits=False):
+        """
+        :param origins: A list of ray origins, any type with a x, y and z attribute is supported.
+        :param directions: A list of ray directions, any type with a x, y and z attribute is supported.
+        :param all_hits: If True, every intersections are returned. Otherwise only the nearest intersection of each geometry is returned.
+        :return: A 5-sized tuple containing the number of rays and four flat arrays with an entry per hit:
+        the index of the ray, the distance, the (x, y, z) position and the index of the geometry (see geometries).
+        The arrays are numpy.ndarray if numpy is available, otherwise lists. The positions array is of shape (N,3).
+        """
+        rays = self._get_rays(origins, directions)
+        space = OpenMaya.MSpace.kWorld
+        util = OpenMaya.MScriptUtil()
+        ptr_hit_param = util.asFloatPtr()
+        buffer_hit_point = OpenMaya.MFloatPoint()
+        buffer_hit_points = OpenMaya.MFloatPointArray()
+        buffer_hit_params = OpenMaya.MFloatArray()
+
+        hit_rays = []
+        hit_distances = []
+        hit_positions = []
+        hit_geometries = []
+        for ray_index, (origin, direction) in enumerate(rays):
+            if not direction.length():
+                continue
+            for geometry_index, (mfn_geo, accel_params) in enumerate(zip(self._mfns, self._accel_params)):
+                if all_hits:
+                    if mfn_geo.allIntersections(
+                            origin, direction, None, None, False, space, self.max_distance, False, accel_params,
+                            False, buffer_hit_points, buffer_hit_params, None, None, None, None, self.tolerance
+                    ):
+                        for i in range(buffer_hit_points.length()):
+                            hit_point = buffer_hit_points[i]
+                            hit_rays.append(ray_index)
+                            hit_distances.append(buffer_hit_params[i])
+                            hit_positions.append((hit_point.x, hit_point.y, hit_point.z))
+                            hit_geometries.append(geometry_index)
+                else:
+                    if mfn_geo.closestIntersection(
+                            origin, direction, None, None, False, space, self.max_distance, False, accel_params,
+                            buffer_hit_point, ptr_hit_param, None, None, None, None, self.tolerance
+                    ):
+                        hit_rays.append(ray_index)
+                        hit_distances.append(OpenMaya.MScriptUtil.getFloat(ptr_hit_param))
+                        hit_positions.append((buffer_hit_point.x, buffer_hit_point.y, buffer_hit_point.z))
+                        hit_geometries.append(geometry_index)
+
+        if use_numpy:
+            return (
+                len(rays),
+                numpy.array(hit_rays, dtype=numpy.int64),
+                numpy.array(hit_distances, dtype=numpy.float64),
+                numpy.array(hit_positions, dtype=numpy.float64).reshape(-1, 3),
+                numpy.array(hit_geometries, dtype=numpy.int64),
+            )
+        return len(rays), hit_rays, hit_distances, hit_positions, hit_geometries
+
+    def cast(self, origins, directions):
+        """
+        :return: A list containing, for each ray, the pymel.datatypes.Point of all intersections.
+        """
+        num_rays, hit_rays, _, hit_positions, _ = self.intersect(origins, directions, all_hits=True)
+        if use_numpy:
+            hit_rays = hit_rays.tolist()
+            hit_positions = hit_positions.tolist()
+
+        results = [[] for _ in range(num_rays)]
+        for ray_index, position in zip(hit_rays, hit_positions):
+            results[ray_index].append(pymel.datatypes.Point(*position))
+        return results
+
+    def _cast_extremum(self, origins, directions, all_hits, farthest):
+        """
+        Resolve the nearest or farthest hit of each ray.
+        :return: A list containing, for each ray, the hit position as a pymel.datatypes.Point or None.
+        """
+        num_rays, hit_rays, hit_distances, hit_positions, _ = self.intersect(origins, directions, all_hits=all_hits)
+        results = [None] * num_rays
+
+        if use_numpy:
+            if not len(hit_rays):
+                return results
+            # Sort the hits by ray, then by distance, and keep the first hit of each ray.
+            order = numpy.lexsort((-hit_distances if farthest else hit_distances, hit_rays))
+            ray_indices, first_indices = numpy.unique(hit_rays[order], return_index=True)
+            for ray_index, position in zip(ray_indices.tolist(), hit_positions[order[first_indices]].tolist()):
+                results[ray_index] = pymel.datatypes.Point(*position)
+            return results
+
+        distances = [None] * num_rays
+        for ray_index, distance, position in zip(hit_rays, hit_distances, hit_positions):
+            best_distance = distances[ray_index]
+            if best_distance is None or (distance > best_distance if farthest else distance < best_distance):
+                distances[ray_index] = distance
+                results[ray_index] = position
+        return [pymel.datatypes.Point(*position) if position else None for position in results]
+
+    def cast_nearest(self, origins, directions):
+        """
+        :return: A list containing, for each ray, the nearest intersection as a pymel.datatypes.Point or None.
+        """
+        return self._cast_extremum(origins, directions, all_hits=False, farthest=False)
+
+    def cast_farthest(self, origins, directions):
+        """
+        :return: A list containing, for each ray, the farthest intersection as a pymel.datatypes.Point or None.
+        """
+        return self._cast_extremum(origins, directions, all_hits=True, farthest=True)
+
+
 def ray_cast(pos, dir, geometries, debug=False, tolerance=1.0e-5):
     """
     Simple pymel wrapper for the MFnGeometry intersect method.
     Note: Default tolerance is 1.0e-5. With the default MFnMesh.intersect valut of 1.0e10, sometime
     the raycase might misfire. Still doesn't know why.
+    Note: To fire multiple rays on the same geometries, use a RayCaster instead.
     :param pos: Any OpenMaya.MPoint compatible type (ex: pymel.datatypes.Point)
     :param dir: Any OpenMaya.MVector compatible type (ex: pymel.datatypes.Vector)
     :param geometries: The geometries to intersect.
     :param debug: If True, spaceLocators will be created at intersection points.
     :return: pymel.datatypes.Point list containing the intersection points.
     """
-    # Cast pos to OpenMaya.MPoint if necessary.
-    if type(pos) != OpenMaya.MPoint:
-        pos = OpenMaya.MPoint(pos.x, pos.y, pos.z)
-
-    # Cast dir to OpenMaya.MVector if necessary.
-    if type(dir) != OpenMaya.MVector:
-        dir = OpenMaya.MVector(dir.x, dir.y, dir.z)
-
-    results = []
-
-    buffer_results = OpenMaya.MPointArray()
-    for geometry in geometries:
-        # Resolve the MFnMesh, note that in some case (ex: a mesh with zero vertices), pymel will return a MFnDagNode.
-        # If this happen we'll want to ignore the mesh.
-        mfn_geo = geometry.__apimfn__()
-        if not isinstance(mfn_geo, OpenMaya.MFnMesh):
-            pymel.warning("Can't proceed with raycast, mesh is invalid: {0}".format(geometry.__melobject__()))
-            continue
-
-        mfn_geo.intersect(pos, dir, buffer_results, tolerance, OpenMaya.MSpace.kWorld)
-        for i in range(buffer_results.length()):
-            results.append(pymel.datatypes.Point(buffer_results[i]))
+    with RayCaster(geometries, tolerance=tolerance) as ray_caster:
+        results = ray_caster.cast([pos], [dir])[0]
 
     if debug:
         for result in results:
@@ -573,15 +988,19 @@ def ray_cast(pos, dir, geometries, debug=False, tolerance=1.0e-5):
 
     return results
 
-def ray_cast_nearest(pos, *args, **kwargs):
-    results = ray_cast(pos, *args, **kwargs)
-    results = sorted(results, key=lambda x: libPymel.distance_between_vectors(pos, x))
-    return next(iter(results), None)
+def ray_cast_nearest(pos, dir, geometries, debug=False, tolerance=1.0e-5):
+    with RayCaster(geometries, tolerance=tolerance) as ray_caster:
+        result = ray_caster.cast_nearest([pos], [dir])[0]
+    if debug and result is not None:
+        pymel.spaceLocator().setTranslation(result)
+    return result
 
-def ray_cast_farthest(pos, *args, **kwargs):
-    results = ray_cast(pos, *args, **kwargs)
-    results = sorted(results, key=lambda x: libPymel.distance_between_vectors(pos, x))
-    return next(iter(reversed(results)), None)
+def ray_cast_farthest(pos, dir, geometries, debug=False, tolerance=1.0e-5):
+    with RayCaster(geometries, tolerance=tolerance) as ray_caster:
+        result = ray_caster.cast_farthest([pos], [dir])[0]
+    if debug and result is not None:
+        pymel.spaceLocator().setTranslation(result)
+    return result
 
 # TODO: Benchmark performances
 def snap(obj_dst, obj_src):
@@ -884,7 +1303,7 @@ def get_nearest_affected_mesh(jnt, key=None):
     """
     Return the immediate mesh affected by provided object in the geometry stack.
     """
-    affected_meshes = [hist for hist in jnt.listHistory(future=True) if _filter_shape(hist, key)]
+    affected_meshes = [mesh for mesh in libSkinning.get_deformer_index().get_affected_meshes(jnt) if _filter_shape(mesh, key)]
 
     return next(iter(affected_meshes), None)
 
@@ -893,7 +1312,7 @@ def get_farest_affected_mesh(jnt, key=None):
     Return the last mesh affected by provided object in the geometry stack.
     Usefull to identify which mesh to use in the 'doritos' setup.
     """
-    affected_meshes = [hist for hist in jnt.listHistory(future=True) if _filter_shape(hist, key)]
+    affected_meshes = [mesh for mesh in libSkinning.get_deformer_index().get_affected_meshes(jnt) if _filter_shape(mesh, key)]
 
     return next(iter(reversed(affected_meshes)), None)
 
@@ -904,42 +1323,216 @@ def get_multi_attr_available_slot(attr_multi):
         i += 1
     return attr_multi[i]
 
-def get_closest_point_on_mesh(mesh, pos):
+class ClosestPointEngine(object):
+    """
+    Resolve the closest point, and it's uv coordinates, on multiple meshes without creating any node.
+    The meshes world-space octree (MMeshIntersector) is built once and each triangle points and uvs are
+    cached the first time they are needed so multiple positions can be queried at a low cost.
+    The closest points are also cached by position, querying the positions in advance in a single call
+    make any later query on the same positions free.
+    Note that the cache is not updated if the meshes are modified.
+    """
+    def __init__(self, meshes):
+        """
+        :param meshes: A list of pymel.nodetypes.Mesh or pymel.nodetypes.Transform to analyze.
+        """
+        self._meshes = []
+        self._matrices = []
+        self._intersectors = []
+        self._iterators = []
+        self._triangles = []  # A {(face_index, triangle_index): (points, uvs)} cache for each mesh.
+        self._closest_points = {}  # A {(x, y, z): [closest point on each mesh]} cache.
+
+        for mesh in meshes:
+            if isinstance(mesh, pymel.nodetypes.Transform):
+                mesh = mesh.getShape()
+
+            if not isinstance(mesh, pymel.nodetypes.Mesh):
+                raise IOError("Unexpected datatype. Expected Mesh, got {0}".format(type(mesh)))
+
+            dagpath = mesh.__apimdagpath__()
+            matrix = dagpath.inclusiveMatrix()
+            intersector = OpenMaya.MMeshIntersector()
+            intersector.create(dagpath.node(), matrix)
+
+            self._meshes.append(mesh)
+            self._matrices.append(matrix)
+            self._intersectors.append(intersector)
+            self._iterators.append(OpenMaya.MItMeshPolygon(dagpath))
+            self._triangles.append({})
+
+    @property
+    def meshes(self):
+        return self._meshes
+
+    def _get_triangle(self, mesh_index, face_index, triangle_index):
+        """
+        :return: The world-space points and the uvs of a mesh triangle.
+        """
+        cache = self._triangles[mesh_index]
+        key = (face_index, triangle_index)
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+
+        it_poly = self._iterators[mesh_index]
+        util = OpenMaya.MScriptUtil()
+        it_poly.setIndex(face_index, util.asIntPtr())
+
+        points = OpenMaya.MPointArray()
+        vertices = OpenMaya.MIntArray()
+        it_poly.getTriangle(triangle_index, points, vertices, OpenMaya.MSpace.kWorld)
+
+        # Convert the triangle vertices to face-relative vertices to access the uvs.
+        face_vertices = OpenMaya.MIntArray()
+        it_poly.getVertices(face_vertices)
+        face_vertices = list(face_vertices)
+
+        uvs = []
+        if it_poly.hasUVs():
+            util_uv = OpenMaya.MScriptUtil()
+            util_uv.createFromList([0.0, 0.0], 2)
+            ptr_uv = util_uv.asFloat2Ptr()
+            for i in range(vertices.length()):
+                it_poly.getUV(face_vertices.index(vertices[i]), ptr_uv)
+                uvs.append((
+                    OpenMaya.MScriptUtil.getFloat2ArrayItem(ptr_uv, 0, 0),
+                    OpenMaya.MScriptUtil.getFloat2ArrayItem(ptr_uv, 0, 1)
+                ))
+
+        result = cache[key] = ([OpenMaya.MPoint(points[i]) for i in range(points.length())], uvs)
+        return result
+
+    def _get_uv(self, mesh_index, face_index, triangle_index, pos):
+        """
+        Interpolate the triangle uvs using the barycentric coordinates of a world-space position.
+        """
+        points, uvs = self._get_triangle(mesh_index, face_index, triangle_index)
+        if not uvs:
+            return 0.0, 0.0
+
+        p0, p1, p2 = points
+        v0 = p1 - p0
+        v1 = p2 - p0
+        v2 = pos - p0
+        d00 = v0 * v0
+        d01 = v0 * v1
+        d11 = v1 * v1
+        d20 = v2 * v0
+        d21 = v2 * v1
+        denom = d00 * d11 - d01 * d01
+        if not denom:  # degenerated triangle
+            return uvs[0]
+        w1 = (d11 * d20 - d01 * d21) / denom
+        w2 = (d00 * d21 - d01 * d20) / denom
+        w0 = 1.0 - w1 - w2
+
+        u = w0 * uvs[0][0] + w1 * uvs[1][0] + w2 * uvs[2][0]
+        v = w0 * uvs[0][1] + w1 * uvs[1][1] + w2 * uvs[2][1]
+        return u, v
+
+    def _get_closest_point_by_mesh(self, pos):
+        """
+        :return: The (distance, closest_pos, face_index, triangle_index) of a world-space position on each mesh.
+        The result is cached so the same position can be queried again on any subset of the meshes.
+        """
+        key = (pos.x, pos.y, pos.z)
+        try:
+            return self._closest_points[key]
+        except KeyError:
+            pass
+
+        pos = OpenMaya.MPoint(*key)
+        buffer_point_on_mesh = OpenMaya.MPointOnMesh()
+        results = []
+        for intersector, matrix in zip(self._intersectors, self._matrices):
+            intersector.getClosestPoint(pos, buffer_point_on_mesh)
+            # Note that MPointOnMesh is always in object space.
+            closest_pos = buffer_point_on_mesh.getPoint()
+            closest_pos = OpenMaya.MPoint(closest_pos.x, closest_pos.y, closest_pos.z) * matrix
+            results.append((
+                closest_pos.distanceTo(pos),
+                closest_pos,
+                buffer_point_on_mesh.faceIndex(),
+                buffer_point_on_mesh.triangleIndex()
+            ))
+        self._closest_points[key] = results
+        return results
+
+    def get_mesh_indices(self, meshes):
+        """
+        :param meshes: A list of pymel.nodetypes.Mesh or pymel.nodetypes.Transform.
+        :return: The index of each mesh in ClosestPointEngine.meshes or None if any mesh is not handled by the engine.
+        """
+        indices = []
+        for mesh in meshes:
+            if isinstance(mesh, pymel.nodetypes.Transform):
+                mesh = mesh.getShape()
+            if mesh not in self._meshes:
+                return None
+            indices.append(self._meshes.index(mesh))
+        return indices
+
+    def get_closest_points(self, positions, mesh_indices=None):
+        """
+        :param positions: A list of world-space positions, any type with a x, y and z attribute is supported.
+        :param mesh_indices: If provided, only the meshes at these indices in ClosestPointEngine.meshes are used.
+        See ClosestPointEngine.get_mesh_indices.
+        :return: A list containing, for each position, a 4-sized tuple containing:
+        - The index of the closest mesh in ClosestPointEngine.meshes.
+        - A pymel.datatypes.Vector representing the closest world-space position on this mesh.
+        - The u coordinate of the resulting position.
+        - The v coordinate of the resulting position.
+        If there's no mesh, a 4-sized tuple containing all None values is returned.
+        """
+        if mesh_indices is None:
+            mesh_indices = range(len(self._meshes))
+
+        results = []
+        for pos in positions:
+            closest_points = self._get_closest_point_by_mesh(pos)
+
+            best_distance = None
+            best = None
+            for mesh_index in mesh_indices:
+                distance, closest_pos, face_index, triangle_index = closest_points[mesh_index]
+                if best_distance is None or distance < best_distance:
+                    best_distance = distance
+                    best = (mesh_index, closest_pos, face_index, triangle_index)
+
+            if best is None:
+                results.append((None, None, None, None))
+                continue
+
+            mesh_index, closest_pos, face_index, triangle_index = best
+            u, v = self._get_uv(mesh_index, face_index, triangle_index, closest_pos)
+            results.append((
+                mesh_index,
+                pymel.datatypes.Vector(closest_pos.x, closest_pos.y, closest_pos.z),
+                u,
+                v
+            ))
+        return results
+
+
+def get_closest_point_on_mesh(mesh, pos, engine=None):
     """
     Return informations about the closest intersection between a point and a mesh polygons.
+    Note: To query multiple positions, use a ClosestPointEngine instead.
     :param mesh: A pymel.nodetypes.Mesh to analyze.
     :param pos: A pymel.datatypes.Vector world-space position.
+    :param engine: An optional ClosestPointEngine to re-use. Used only if it handle the mesh.
     :return: A 3-sized tuple containing:
     - A pymel.datatypes.Vector representing the closest intersection between the mesh and the provided position.
     - The u coordinate of the resulting position.
     - The v coordinate of the resulting position.
     If nothing is found, a 3-sized tuple containing all None values are returned.
     """
-    if isinstance(mesh, pymel.nodetypes.Transform):
-        mesh = mesh.getShape()
-
-    if not isinstance(mesh, pymel.nodetypes.Mesh):
-        raise IOError("Unexpected datatype. Expected Mesh, got {0}".format(type(mesh)))
-
-    # closestPointOnMesh ignores polymesh transforms
-    util_transformGeometry = create_utility_node('transformGeometry',
-                                                 inputGeometry=mesh.outMesh,
-                                                 transform=mesh.worldMatrix
-                                                 )
-
-    # TODO: maybe support multiple uv sets?
-    util_cpom = create_utility_node('closestPointOnMesh',
-        inPosition=pos,
-        inMesh=util_transformGeometry.outputGeometry
-    )
-
-    pos = util_cpom.position.get()
-    u = util_cpom.parameterU.get()
-    v = util_cpom.parameterV.get()
-
-    pymel.delete(util_transformGeometry)
-    pymel.delete(util_cpom)
-
+    mesh_indices = engine.get_mesh_indices([mesh]) if engine else None
+    if mesh_indices is None:
+        engine = ClosestPointEngine([mesh])
+    _, pos, u, v = engine.get_closest_points([pos], mesh_indices=mesh_indices)[0]
     return pos, u, v
 
 def get_closest_point_on_surface(nurbsSurface, pos):
@@ -969,22 +1562,23 @@ def get_closest_point_on_surface(nurbsSurface, pos):
 
     return pos, u, v
 
-def get_closest_point_on_shape(shape, pos):
+def get_closest_point_on_shape(shape, pos, engine=None):
     if isinstance(shape, pymel.nodetypes.Transform):
         shape = shape.getShape()
 
     if isinstance(shape, pymel.nodetypes.Mesh):
-        return get_closest_point_on_mesh(shape, pos)
+        return get_closest_point_on_mesh(shape, pos, engine=engine)
     elif isinstance(shape, pymel.nodetypes.NurbsSurface):
         return get_closest_point_on_surface(shape, pos)
     else:
         raise IOError("Unexpected datatype. Expected Mesh or NurbsSurface, got {0}".format(type(shape)))
 
-def get_closest_point_on_shapes(meshes, pos):
+def get_closest_point_on_shapes(meshes, pos, engine=None):
     """
     Return informations about the closest intersection between a point and multiple mesh polygons.
     :param mesh: A pymel.nodetypes.Mesh to analyze.
     :param pos: A pymel.datatypes.Vector world-space position.
+    :param engine: An optional ClosestPointEngine to re-use. Used only if it handle all the polygon meshes.
     :return: A 4-sized tuple containing:
     - A pymel.nodetypes.Mesh instance representing the closest mesh.
     - A pymel.datatypes.Vector representing the closest intersection between the mesh and the provided position.
@@ -994,7 +1588,26 @@ def get_closest_point_on_shapes(meshes, pos):
     """
     shortest_delta = None
     return_val = (None, None, None, None)
+
+    # Meshes are resolved together without creating any node.
+    def _is_mesh(obj):
+        if isinstance(obj, pymel.nodetypes.Transform):
+            obj = obj.getShape()
+        return isinstance(obj, pymel.nodetypes.Mesh)
+
+    polymeshes = [mesh for mesh in meshes if _is_mesh(mesh)]
+    if polymeshes:
+        mesh_indices = engine.get_mesh_indices(polymeshes) if engine else None
+        if mesh_indices is None:
+            engine = ClosestPointEngine(polymeshes)
+            mesh_indices = range(len(polymeshes))
+        mesh_index, closest_pos, closest_u, closest_v = engine.get_closest_points([pos], mesh_indices=mesh_indices)[0]
+        shortest_delta = libPymel.distance_between_vectors(pos, closest_pos)
+        return_val = (polymeshes[mesh_indices.index(mesh_index)], closest_pos, closest_u, closest_v)
+
     for mesh in meshes:
+        if _is_mesh(mesh):
+            continue
         closest_pos, closest_u, closest_v = get_closest_point_on_shape(mesh, pos)
         delta = libPymel.distance_between_vectors(pos, closest_pos)
         if shortest_delta is None or delta < shortest_delta:
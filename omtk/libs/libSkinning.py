@@ -1,16 +1,152 @@
+import collections
+import time
+
 import pymel.core as pymel
 from maya import OpenMaya
+from omtk.libs import libProfiler
 from omtk.libs import libPymel
+from omtk.libs import libPython
+from omtk.libs import libSkinningMath
+from omtk.libs.libPython import numpy, use_numpy
+from omtk.libs.libSkinningMath import interp_linear, interp_cubic
 
 def get_skin_cluster(obj):
     if isinstance(obj, pymel.nodetypes.SkinCluster):
         return obj
+    if isinstance(obj, pymel.nodetypes.Mesh):
+        return get_deformer_index().get_skin_cluster(obj)
     for hist in pymel.listHistory(obj):
         if isinstance(hist, pymel.nodetypes.SkinCluster):
             return hist
     return None
 
+#
+# Deformer index
+#
+
+class DeformerIndex(object):
+    """
+    Index the relationship between the influences, the skinClusters and the meshes of the scene.
+    The skinClusters are indexed in one pass on creation, the meshes deformer stacks are indexed on demand.
+    This prevent calling listHistory for each joint when building a rig.
+    Use get_deformer_index() to access the current index.
+    """
+    def __init__(self):
+        self._skin_clusters_by_influence = collections.defaultdict(list)
+        self._output_geometries_by_skin_cluster = {}
+        self._deformers_by_mesh = {}
+        self._affected_meshes_by_influence = {}
+
+        for skin_cluster in pymel.ls(type='skinCluster'):
+            for influence in skin_cluster.influenceObjects():
+                self._skin_clusters_by_influence[influence].append(skin_cluster)
+            self._output_geometries_by_skin_cluster[skin_cluster] = skin_cluster.getOutputGeometry()
+
+    def get_skin_clusters(self, influence):
+        """
+        :return: The skinClusters using the provided influence.
+        """
+        return list(self._skin_clusters_by_influence.get(influence, []))
+
+    def get_output_geometries(self, skin_cluster):
+        """
+        :return: The geometries directly deformed by the skinCluster. See pymel.nodetypes.SkinCluster.getOutputGeometry.
+        """
+        return list(self._output_geometries_by_skin_cluster.get(skin_cluster, []))
+
+    def get_affected_meshes(self, influence):
+        """
+        :return: All the meshes in the future history of the influence, in the order of the geometry stack.
+        Since this depend on the connections of the scene, the result is only kept until a connection change.
+        """
+        try:
+            return list(self._affected_meshes_by_influence[influence])
+        except KeyError:
+            meshes = self._affected_meshes_by_influence[influence] = [
+                hist for hist in pymel.listHistory(influence, future=True) if isinstance(hist, pymel.nodetypes.Mesh)
+            ]
+            return list(meshes)
+
+    def get_deformers(self, mesh):
+        """
+        :return: The deformer stack of the mesh, the nearest deformer first.
+        """
+        try:
+            return self._deformers_by_mesh[mesh]
+        except KeyError:
+            deformers = self._deformers_by_mesh[mesh] = pymel.listHistory(mesh, type='geometryFilter')
+            return deformers
+
+    def get_skin_cluster(self, mesh):
+        """
+        :return: The nearest skinCluster in the mesh deformer stack.
+        """
+        return next((deformer for deformer in self.get_deformers(mesh)
+                     if isinstance(deformer, pymel.nodetypes.SkinCluster)), None)
+
+    def _on_connection_changed(self, plug_src, plug_dst):
+        self._affected_meshes_by_influence.clear()
+
+
+_deformer_index = None
+_deformer_index_callbacks = []
+
+
+def get_deformer_index():
+    """
+    :return: The DeformerIndex of the current scene. It is created on demand and kept until invalidated.
+    """
+    global _deformer_index
+    if _deformer_index is None:
+        _register_deformer_index_callbacks()
+        _deformer_index = DeformerIndex()
+    return _deformer_index
+
+
+def invalidate_deformer_index(*args):
+    """
+    Discard the current DeformerIndex.
+    This is automatically called when a scene is opened, when a deformer or a mesh is created or deleted
+    and when a skinCluster connections change.
+    """
+    global _deformer_index
+    _deformer_index = None
+
+
+def _on_connection_changed(plug_src, plug_dst, *args):
+    if _deformer_index is None:
+        return
+    # A skinCluster influences or geometries changed, the whole index is outdated.
+    if plug_dst.node().hasFn(OpenMaya.MFn.kSkinClusterFilter):
+        invalidate_deformer_index()
+    else:
+        _deformer_index._on_connection_changed(plug_src, plug_dst)
+
+
+def _register_deformer_index_callbacks():
+    if _deformer_index_callbacks:
+        return
+    _deformer_index_callbacks.append(OpenMaya.MSceneMessage.addCallback(OpenMaya.MSceneMessage.kAfterOpen, invalidate_deformer_index))
+    _deformer_index_callbacks.append(OpenMaya.MSceneMessage.addCallback(OpenMaya.MSceneMessage.kAfterNew, invalidate_deformer_index))
+    # Note that the geometryFilter type also match it's sub-types (skinCluster, blendShape, cluster, etc).
+    for node_type in ('geometryFilter', 'mesh'):
+        _deformer_index_callbacks.append(OpenMaya.MDGMessage.addNodeAddedCallback(invalidate_deformer_index, node_type))
+        _deformer_index_callbacks.append(OpenMaya.MDGMessage.addNodeRemovedCallback(invalidate_deformer_index, node_type))
+    _deformer_index_callbacks.append(OpenMaya.MDGMessage.addConnectionCallback(_on_connection_changed))
+
+
+def remove_deformer_index_callbacks():
+    """
+    Remove the callbacks keeping the DeformerIndex up to date and discard it.
+    This need to be called before reloading the module, otherwise the callbacks would leak.
+    """
+    for callback in _deformer_index_callbacks:
+        OpenMaya.MMessage.removeCallback(callback)
+    del _deformer_index_callbacks[:]
+    invalidate_deformer_index()
+
 #@decorators.profiler
+@libProfiler.profiled(category='skinning')
 def transfer_weights(obj, sources, target, add_missing_influences=False):
     """
     Transfer skin weights from multiples joints to a specific joint.
@@ -40,6 +176,7 @@ def transfer_weights(obj, sources, target, add_missing_influences=False):
         print("Can't find target {0} in skinCluster {1}".format(target.name(), skinCluster.name()))
         skinCluster.addInfluence(target, weight=0)
         influence_jnts.append(target)
+        invalidate_deformer_index()
 
     # Hack: Remove influences not present in skinCluster
     sources = filter(lambda jnt: jnt in influence_jnts, sources)
@@ -48,13 +185,6 @@ def transfer_weights(obj, sources, target, add_missing_influences=False):
         print "Abording transfering on {0}, nothing to transfer".format(obj.name())
         return
 
-    num_jnts = len(influence_jnts)
-    jnt_src_indices = [influence_jnts.index(source) for source in sources]
-    jnt_dst_index = influence_jnts.index(target)
-    influences = OpenMaya.MIntArray()
-    for i in range(len(influence_jnts)):
-        influences.append(i)
-
     # Ensure no provided joints are locked
     for source in sources:
         if source.lockInfluenceWeights.get():
@@ -62,6 +192,18 @@ def transfer_weights(obj, sources, target, add_missing_influences=False):
     if target.lockInfluenceWeights.get():
         target.lockInfluenceWeights.set(False)
 
+    # Store the affected joints only.
+    # The target is always the last column of the weights table.
+    jnt_src_indices = [influence_jnts.index(source) for source in sources]
+    jnt_dst_index = influence_jnts.index(target)
+    mint_influences = OpenMaya.MIntArray()
+    for jnt_src_index in jnt_src_indices:
+        if jnt_src_index != jnt_dst_index:
+            mint_influences.append(jnt_src_index)
+    mint_influences.append(jnt_dst_index)
+    num_jnts = mint_influences.length()
+    src_indices = range(num_jnts - 1)
+    dst_index = num_jnts - 1
 
     # Get weights
     old_weights = OpenMaya.MDoubleArray()
@@ -77,27 +219,85 @@ def transfer_weights(obj, sources, target, add_missing_influences=False):
 
     geometryDagPath = obj.__apimdagpath__()
     component = pymel.api.toComponentMObject(geometryDagPath)
-    mfnSkinCluster.getWeights(geometryDagPath, component, influences, old_weights)
+    mfnSkinCluster.getWeights(geometryDagPath, component, mint_influences, old_weights)
 
     # Compute new weights
-    new_weights = OpenMaya.MDoubleArray()
-    new_weights.copy(old_weights)
-    num_vertices = len(obj.vtx)
+    if use_numpy:
+        weights = _mdoublearray_to_numpy(old_weights).reshape(-1, num_jnts)
+        _transfer_weights_numpy(weights, src_indices, dst_index)
+        new_weights = _numpy_to_mdoublearray(weights)
+    else:
+        new_weights = OpenMaya.MDoubleArray()
+        new_weights.copy(old_weights)
+        num_vertices = old_weights.length() / num_jnts
+        _transfer_weights_python(new_weights, num_vertices, num_jnts, src_indices, dst_index)
+
+    mfnSkinCluster.setWeights(geometryDagPath, component, mint_influences, new_weights, old_weights)
+
+
+def _transfer_weights_python(weights, num_vertices, num_jnts, src_indices, dst_index):
+    """
+    Move the weights of the sources columns into the target column of a flat weights table.
+    :param weights: A flat, vertex-major, weights table (ex: OpenMaya.MDoubleArray). Modified in place.
+    :param num_vertices: The number of vertices (rows) in the weights table.
+    :param num_jnts: The number of influences (columns) in the weights table.
+    :param src_indices: The columns to transfer from.
+    :param dst_index: The column to transfer to.
+    """
     for v in range(num_vertices):
         total_weight = 0
         # Remove source weights
-        for source_index in jnt_src_indices:
+        for source_index in src_indices:
             i = source_index + (v * num_jnts)
-            w = new_weights[i]
+            w = weights[i]
             if w:
-                new_weights[i] = 0
+                weights[i] = 0
                 total_weight += w
         # Apply target weights if necessary
         if total_weight:
-            i = jnt_dst_index + (v * num_jnts)
-            new_weights[i] += total_weight
+            i = dst_index + (v * num_jnts)
+            weights[i] += total_weight
 
-    mfnSkinCluster.setWeights(geometryDagPath, component, influences, new_weights, old_weights)
+
+def _transfer_weights_numpy(weights, src_indices, dst_index):
+    """
+    Vectorized equivalent of _transfer_weights_python.
+    :param weights: A (num_vertices, num_jnts) numpy.ndarray. Modified in place.
+    :param src_indices: The columns to transfer from.
+    :param dst_index: The column to transfer to.
+    """
+    total_weights = weights[:, src_indices].sum(axis=1)
+    weights[:, src_indices] = 0.0
+    weights[:, dst_index] += total_weights
+
+
+def _mdoublearray_to_numpy(mdoublearray):
+    """
+    :return: A flat numpy.ndarray copy of the provided OpenMaya.MDoubleArray.
+    """
+    return numpy.fromiter(mdoublearray, dtype=numpy.float64, count=mdoublearray.length())
+
+
+def _numpy_to_mdoublearray(array):
+    """
+    :return: A OpenMaya.MDoubleArray copy of the provided numpy.ndarray, created in one call.
+    """
+    values = array.ravel().tolist()
+    num_values = len(values)
+    util = OpenMaya.MScriptUtil()
+    util.createFromList(values, num_values)
+    return OpenMaya.MDoubleArray(util.asDoublePtr(), num_values)
+
+
+def _get_influence_weights(mfnSkinCluster, geometryDagPath, component, influence_index):
+    """
+    :return: A flat numpy.ndarray containing the weights of a single influence for each vertex of the component.
+    """
+    mint_influences = OpenMaya.MIntArray()
+    mint_influences.append(influence_index)
+    weights = OpenMaya.MDoubleArray()
+    mfnSkinCluster.getWeights(geometryDagPath, component, mint_influences, weights)
+    return _mdoublearray_to_numpy(weights)
 
 def transfer_weights_replace(source, target):
     """
@@ -158,66 +358,84 @@ def transfer_weights_replace(source, target):
                 pass
     '''
 
-def interp_linear(r, s, e):
-    return (e - s) * r + s
-
-def interp_cubic(x):
+def _get_points_weights(positions, knot_positions, knot_weights, executor=None):
     """
-    src: http://stackoverflow.com/questions/1146281/cubic-curve-smooth-interpolation-in-c-sharp
+    :param positions: A list of (x, y, z) tuples or a (N,3) numpy.ndarray.
+    :param executor: An optional process pool, see compute_weights_from_knots_parallel.
+    :return: A (N,num_knots) numpy.ndarray. If numpy is not available, a list of lists is returned.
     """
-    return (x * x) * (3.0 - (2.0 * x))
+    if executor is not None:
+        return compute_weights_from_knots_parallel(positions, knot_positions, knot_weights, executor)
+    return libSkinningMath.get_points_weights_from_knots((positions, knot_positions, knot_weights))
 
-def _get_point_weights_from_segments_weights(segments, segments_weights, pos):
-    knot_index, ratio = segments.closest_segment_index(pos)
-    knot_index_next = knot_index + 1 # TODO: Handle out of bound
-    point_weights_inn = segments_weights[knot_index]
-    point_weights_out = segments_weights[knot_index_next]
-    point_weights = [(weight_out - weight_inn)*interp_cubic(ratio) + weight_inn for weight_inn, weight_out in zip(point_weights_inn, point_weights_out)]
-    return point_weights
 
-#@libPython.profiler
-def transfer_weights_from_segments(obj, source, targets, dropoff=1.0, force_straight_line=False):
+def _get_sparse_component(mfnSkinCluster, geometryDagPath, component, influence_indices):
     """
-    Automatically assign skin weights from source to destinations using the vertices position.
+    Resolve a component containing only the vertices with a non-zero weight on any of the provided influences.
+    This allow us to only read and write the weights that will effectively change.
+    :return: A OpenMaya.MObject component, the provided component if the geometry is not a mesh or None if
+    no vertices are affected by the influences.
     """
-    # Resolve the world position of the targets
-    dst_positions = []
-    for target in targets:
-        dst_positions.append(target.getTranslation(space='world'))
+    if not geometryDagPath.hasFn(OpenMaya.MFn.kMesh):
+        return component
 
-    # Resolve skinCluster
-    skinCluster = get_skin_cluster(obj)
-    if skinCluster is None:
-        raise Exception("Can't find skinCluster on {0}".format(obj.__melobject__()))
+    mint_influences = OpenMaya.MIntArray()
+    for influence_index in influence_indices:
+        mint_influences.append(influence_index)
+    chunk_size = mint_influences.length()
 
-    # Resolve source indices
-    influence_objects = skinCluster.influenceObjects()
-    try:
-        jnt_src_index = influence_objects.index(source)
-    except ValueError:
-        pymel.warning("Can't transfer weights from segments in {0}, source {1} is missing from skinCluster.".format(
-            obj.__melobject__(),
-            source.__melobject__()
-        ))
-        return False
+    weights = OpenMaya.MDoubleArray()
+    mfnSkinCluster.getWeights(geometryDagPath, component, mint_influences, weights)
 
-    # Resolve targets indices
-    targets = [target for target in targets if target in influence_objects]
-    if not targets:
-        pymel.warning("Can't transfer weights from segments in {0}, no targets found in skinCluster.".format(
-            obj.__melobject__()
-        ))
-        return False
-    jnt_dst_indexes = [influence_objects.index(target) for target in targets]
+    if use_numpy:
+        weights = _mdoublearray_to_numpy(weights).reshape(-1, chunk_size)
+        vert_indices = numpy.flatnonzero(weights.any(axis=1)).tolist()
+    else:
+        vert_indices = []
+        num_vertices = weights.length() / chunk_size
+        for vert_index in range(num_vertices):
+            memory_location = vert_index * chunk_size
+            if any(weights[i] for i in range(memory_location, memory_location + chunk_size)):
+                vert_indices.append(vert_index)
+
+    if not vert_indices:
+        return None
+
+    return _get_vertices_component(vert_indices)
+
+
+def _get_vertices_component(vert_indices):
+    """
+    :param vert_indices: The indices of the vertices.
+    :return: A mesh vertex component MObject containing the provided vertices.
+    """
+    mint_indices = OpenMaya.MIntArray()
+    for vert_index in vert_indices:
+        mint_indices.append(int(vert_index))
+    mfn_component = OpenMaya.MFnSingleIndexedComponent()
+    component = mfn_component.create(OpenMaya.MFn.kMeshVertComponent)
+    mfn_component.addElements(mint_indices)
+    return component
+
+
+def _get_geometry_positions(geometryDagPath, component):
+    """
+    :return: The world-space position of each vtx/cvs in the component as (x, y, z) tuples. See libSkinningMath.
+    """
+    positions = []
+    it_geometry = OpenMaya.MItGeometry(geometryDagPath, component)
+    while not it_geometry.isDone():
+        pos = it_geometry.position(OpenMaya.MSpace.kWorld)
+        positions.append((pos.x, pos.y, pos.z))
+        it_geometry.next()
+    return positions
 
-    # Store the affected joints only
-    # This allow us to reference the index to navigate in the weights table.
-    mint_influences = OpenMaya.MIntArray()
-    mint_influences.append(jnt_src_index)
-    for dst_index in jnt_dst_indexes:
-        mint_influences.append(dst_index)
-    chunk_size = mint_influences.length()
 
+def _get_segments_from_targets(targets, force_straight_line=False):
+    """
+    :return: A libPymel.SegmentCollection going through each targets.
+    :param force_straight_line: If True, the knots will be aligned between the first and last target.
+    """
     # Resolve the positions to use for computing the segments.
     knot_positions = []
     for target in targets:
@@ -253,54 +471,190 @@ def transfer_weights_from_segments(obj, source, targets, dropoff=1.0, force_stra
             pos = (pos_e - pos_s) * ratio + pos_s
             knot_positions.append(pos)
 
-    segments = libPymel.SegmentCollection.from_positions(knot_positions)
+    return libPymel.SegmentCollection.from_positions(knot_positions)
+
+
+#@libPython.profiler
+@libProfiler.profiled(category='skinning')
+def transfer_weights_from_segments(obj, source, targets, dropoff=1.0, force_straight_line=False, sparse=True,
+                                   executor=None):
+    """
+    Automatically assign skin weights from source to destinations using the vertices position.
+    :param sparse: If True, only the vertices influenced by the source will be read and written.
+    :param executor: An optional process pool used to compute the weights. See compute_weights_from_knots_parallel.
+    """
+    results = transfer_weights_from_segments_batch(
+        [obj], source, targets, dropoff=dropoff, force_straight_line=force_straight_line, sparse=sparse,
+        executor=executor
+    )
+    if results[obj] is None:
+        return False
+
+
+def transfer_weights_from_segments_batch(objs, source, targets, dropoff=1.0, force_straight_line=False, sparse=True,
+                                         executor=None):
+    """
+    Same as transfer_weights_from_segments but for multiple geometries.
+    The segments and knot weights are computed once and shared by all the geometries using the same targets.
+    :param executor: An optional process pool used to compute the weights. See compute_weights_from_knots_parallel.
+    :return: A dict containing for each geometry a 2-sized tuple (number of vertices processed, seconds taken)
+    or None if the weights could not be transferred.
+    """
+    results = {}
+    cache_segments = {}  # The segments only depend on the targets present in the skinCluster.
+    for obj in objs:
+        st = time.time()
+
+        # Resolve skinCluster
+        skinCluster = get_skin_cluster(obj)
+        if skinCluster is None:
+            raise Exception("Can't find skinCluster on {0}".format(obj.__melobject__()))
+
+        # Resolve source indices
+        influence_objects = skinCluster.influenceObjects()
+        try:
+            jnt_src_index = influence_objects.index(source)
+        except ValueError:
+            pymel.warning("Can't transfer weights from segments in {0}, source {1} is missing from skinCluster.".format(
+                obj.__melobject__(),
+                source.__melobject__()
+            ))
+            results[obj] = None
+            continue
+
+        # Resolve targets indices
+        obj_targets = tuple(target for target in targets if target in influence_objects)
+        if not obj_targets:
+            pymel.warning("Can't transfer weights from segments in {0}, no targets found in skinCluster.".format(
+                obj.__melobject__()
+            ))
+            results[obj] = None
+            continue
+        jnt_dst_indexes = [influence_objects.index(target) for target in obj_targets]
+
+        try:
+            segments, knot_weights = cache_segments[obj_targets]
+        except KeyError:
+            segments = _get_segments_from_targets(obj_targets, force_straight_line=force_straight_line)
+            knot_weights = segments.get_knot_weights(dropoff=dropoff)
+            cache_segments[obj_targets] = segments, knot_weights
+
+        num_vertices = _transfer_weights_from_segments(
+            obj, skinCluster, jnt_src_index, jnt_dst_indexes, segments, knot_weights, sparse=sparse, executor=executor
+        )
+        results[obj] = (num_vertices, time.time() - st)
+
+    return results
+
+
+def _transfer_weights_from_segments(obj, skinCluster, jnt_src_index, jnt_dst_indexes, segments, knot_weights, sparse=True,
+                                    executor=None):
+    """
+    :return: The number of vertices processed.
+    """
+    # Store the affected joints only
+    # This allow us to reference the index to navigate in the weights table.
+    mint_influences = OpenMaya.MIntArray()
+    mint_influences.append(jnt_src_index)
+    for dst_index in jnt_dst_indexes:
+        mint_influences.append(dst_index)
+    chunk_size = mint_influences.length()
 
-    # Get weights
-    old_weights = OpenMaya.MDoubleArray()
     mfnSkinCluster = skinCluster.__apimfn__()
     geometryDagPath = obj.__apimdagpath__()
     component = pymel.api.toComponentMObject(geometryDagPath)
+
+    # Only the vertices influenced by the source will change, ignore the others.
+    if sparse:
+        component = _get_sparse_component(mfnSkinCluster, geometryDagPath, component, [jnt_src_index])
+        if component is None:
+            return 0
+
+    # Get weights
+    old_weights = OpenMaya.MDoubleArray()
     mfnSkinCluster.getWeights(geometryDagPath, component, mint_influences, old_weights)
 
     # Compute new weights
-    new_weights = OpenMaya.MDoubleArray()
-    new_weights.copy(old_weights)
+    positions = _get_geometry_positions(geometryDagPath, component)
+    knot_positions = segments.get_knot_positions()
+
+    if use_numpy:
+        weights = _mdoublearray_to_numpy(old_weights).reshape(-1, chunk_size)
+        _transfer_weights_from_segments_numpy(weights, positions, knot_positions, knot_weights, executor=executor)
+        new_weights = _numpy_to_mdoublearray(weights)
+    else:
+        new_weights = OpenMaya.MDoubleArray()
+        new_weights.copy(old_weights)
+        _transfer_weights_from_segments_python(new_weights, positions, knot_positions, knot_weights, chunk_size,
+                                               executor=executor)
 
-    knot_weights = segments.get_knot_weights(dropoff=dropoff)
+    mfnSkinCluster.setWeights(geometryDagPath, component, mint_influences, new_weights, old_weights)
 
-    it_geometry= OpenMaya.MItGeometry(geometryDagPath)
-    vert_index = 0
-    while not it_geometry.isDone():
+    return len(positions)
+
+
+def _transfer_weights_from_segments_python(weights, positions, knot_positions, knot_weights, chunk_size,
+                                           executor=None):
+    """
+    Distribute the source weights (first column) to the targets (other columns) of a flat weights table.
+    :param weights: A flat, vertex-major, weights table (ex: OpenMaya.MDoubleArray). Modified in place.
+    :param positions: The position of each vertex in the weights table as (x, y, z) tuples.
+    """
+    num_targets = chunk_size - 1
+    vert_indices = [vert_index for vert_index in range(len(positions)) if weights[chunk_size * vert_index]]
+    if not vert_indices:
+        return
+    points_weights = _get_points_weights([positions[vert_index] for vert_index in vert_indices], knot_positions,
+                                         knot_weights, executor=executor)
+
+    for vert_index, point_weights in zip(vert_indices, points_weights):
         memory_location = (chunk_size * vert_index)
-        source_weight = old_weights[memory_location]
-        if source_weight:
-            # Get the current weights already assigned to the target weight
-            target_memory_location = memory_location + 1
-            cur_target_weights = [old_weights[i] for i in range(target_memory_location, target_memory_location + len(targets))]
-            # Resolve weight using the vtx/cv position
-            pos = OpenMaya.MVector(it_geometry.position(OpenMaya.MSpace.kWorld))  # MVector allow us to use .length()
-            weights = _get_point_weights_from_segments_weights(segments, knot_weights, pos)
-
-            # Ensure the total of the new weights match the source weights + current target weight
-            total_weights = 0.0
-            for weight in weights:
-                total_weights += weight
-            ratio = source_weight / total_weights
-            weights = [(weight * ratio) + cur_target_weights[i] for i, weight in enumerate(weights)]
+        source_weight = weights[memory_location]
 
-            # Write weights
-            for i, weight in enumerate(weights):
-                index = (vert_index * chunk_size) + i + 1
-                new_weights[index] = weight
-            new_weights[vert_index * chunk_size] = 0.0  # Remove original weight
+        # Get the current weights already assigned to the target weight
+        target_memory_location = memory_location + 1
+        cur_target_weights = [weights[i] for i in range(target_memory_location, target_memory_location + num_targets)]
 
-        it_geometry.next()
-        vert_index += 1
+        # Ensure the total of the new weights match the source weights + current target weight
+        total_weights = 0.0
+        for weight in point_weights:
+            total_weights += weight
+        ratio = source_weight / total_weights
+        point_weights = [(weight * ratio) + cur_target_weights[i] for i, weight in enumerate(point_weights)]
 
-    mfnSkinCluster.setWeights(geometryDagPath, component, mint_influences, new_weights, old_weights)
+        # Write weights
+        for i, weight in enumerate(point_weights):
+            weights[target_memory_location + i] = weight
+        weights[memory_location] = 0.0  # Remove original weight
 
 
-def assign_weights_from_segments(shape, jnts, dropoff=1.5):
+def _transfer_weights_from_segments_numpy(weights, positions, knot_positions, knot_weights, executor=None):
+    """
+    Vectorized equivalent of _transfer_weights_from_segments_python.
+    :param weights: A (num_vertices, chunk_size) numpy.ndarray. Modified in place.
+    :param positions: The position of each vertex in the weights table as (x, y, z) tuples.
+    """
+    source_weights = weights[:, 0]
+    mask = source_weights != 0
+    if not mask.any():
+        return
+
+    positions = numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 3)[mask]
+    point_weights = _get_points_weights(positions, knot_positions, knot_weights, executor=executor)
+
+    # Ensure the total of the new weights match the source weights + current target weight
+    ratios = source_weights[mask] / point_weights.sum(axis=1)
+    weights[mask, 1:] += point_weights * ratios[:, numpy.newaxis]
+    weights[mask, 0] = 0.0  # Remove original weight
+
+
+@libProfiler.profiled(category='skinning')
+def assign_weights_from_segments(shape, jnts, dropoff=1.5, sparse=False, executor=None):
+    """
+    Re-skin a geometry from scratch using the provided joints and the vertices position.
+    :param sparse: If True, only the vertices already influenced by the provided joints will be re-skinned.
+    :param executor: An optional process pool used to compute the weights. See compute_weights_from_knots_parallel.
+    """
     # Resolve skinCluster
     skinCluster = get_skin_cluster(shape)
     if skinCluster is None:
@@ -316,39 +670,324 @@ def assign_weights_from_segments(shape, jnts, dropoff=1.5):
     for i in range(chunk_size):
         mint_influences.append(i)
 
-    # Resolve old weights (for undos)
-    old_weights = OpenMaya.MDoubleArray()
     mfnSkinCluster = skinCluster.__apimfn__()
     geometryDagPath = shape.__apimdagpath__()
     component = pymel.api.toComponentMObject(geometryDagPath)
+
+    if sparse:
+        component = _get_sparse_component(mfnSkinCluster, geometryDagPath, component, jnt_indices)
+        if component is None:
+            return
+
+    # Resolve old weights (for undos)
+    old_weights = OpenMaya.MDoubleArray()
     mfnSkinCluster.getWeights(geometryDagPath, component, mint_influences, old_weights)
 
     # Resolve new weights
     # Note that we start with zero weight since we are re-skinning from scratch.
     segments = libPymel.SegmentCollection.from_transforms(jnts)
     knot_weights = segments.get_knot_weights(dropoff=dropoff)
+    positions = _get_geometry_positions(geometryDagPath, component)
 
-    new_weights = OpenMaya.MDoubleArray(old_weights.length(), 0)
+    points_weights = _get_points_weights(positions, segments.get_knot_positions(), knot_weights, executor=executor)
 
-    # Iterate through all vtx/cvs
-    it_geometry= OpenMaya.MItGeometry(geometryDagPath)
-    vert_index = 0
-    while not it_geometry.isDone():
-        # Resolve weight using the vtx/cv position
-        memory_location = (chunk_size * vert_index) + jnt_indices[0]
-        pos = OpenMaya.MVector(it_geometry.position(OpenMaya.MSpace.kWorld))  # MVector allow us to use .length()
-        weights = _get_point_weights_from_segments_weights(segments, knot_weights, pos)
+    if use_numpy:
+        weights = numpy.zeros((len(positions), chunk_size))
+        weights[:, jnt_indices] = points_weights
+        new_weights = _numpy_to_mdoublearray(weights)
+    else:
+        new_weights = OpenMaya.MDoubleArray(old_weights.length(), 0)
+        for vert_index, weights in enumerate(points_weights):
+            # Write weights
+            memory_location = (chunk_size * vert_index)
+            for jnt_index, weight in zip(jnt_indices, weights):
+                new_weights[memory_location + jnt_index] = weight
 
-        # Write weights
-        for weight in weights:
-            new_weights[memory_location] = weight
-            memory_location += 1
+    mfnSkinCluster.setWeights(geometryDagPath, component, mint_influences, new_weights, old_weights)
 
-        it_geometry.next()
-        vert_index += 1
+#
+# Parallel weights computation
+#
 
+def compute_weights_from_knots_parallel(positions, knot_positions, knot_weights, executor, chunk_size=10000):
+    """
+    Compute the weights of each positions by splitting them in chunks that are dispatched to a process pool.
+    Only the result need to be written back by the caller, see assign_weights_from_segments.
+
+    The pool is never created implicitly since forking the Maya session would copy the whole application
+    in each worker. The workers need to be started with a standalone interpreter that can import
+    omtk.libs.libSkinningMath, ex: mayapy.
+    >>> multiprocessing.set_executable(os.path.join(os.environ['MAYA_LOCATION'], 'bin', 'mayapy'))
+    >>> with concurrent.futures.ProcessPoolExecutor(max_workers=32) as executor:
+    >>>     libSkinning.assign_weights_from_segments(mesh, jnts, executor=executor)
+
+    :param positions: A list of (x, y, z) tuples or a (N,3) numpy.ndarray.
+    :param knot_positions: A list of (x, y, z) tuples.
+    :param knot_weights: The weights of each knots. See libPymel.SegmentCollection.get_knot_weights.
+    :param executor: A concurrent.futures executor.
+    :return: A (num_positions, num_knots) numpy.ndarray. If numpy is not available, a list of lists is returned.
+    """
+    chunks = [
+        (positions[i:i + chunk_size], knot_positions, knot_weights)
+        for i in range(0, len(positions), chunk_size)
+    ]
+    chunks_weights = executor.map(libSkinningMath.get_points_weights_from_knots, chunks)
+
+    if not use_numpy:
+        results = []
+        for chunk_weights in chunks_weights:
+            results.extend(chunk_weights)
+        return results
+
+    results = numpy.zeros((len(positions), len(knot_weights)), dtype=numpy.float64)
+    i = 0
+    for chunk_weights in chunks_weights:
+        results[i:i + len(chunk_weights)] = chunk_weights
+        i += len(chunk_weights)
+    return results
+
+#
+# Sparse skin weights snapshot
+#
+
+class SkinWeightsSnapshot(object):
+    """
+    A compact copy of a geometry skin weights stored in the CSR (compressed sparse row) format.
+    Only the non-zero weights are stored, each row being a vertex. Influences are referenced by name
+    so a snapshot can be applied on a skinCluster even if it's influences order changed (ex: after a rebuild).
+    Require numpy.
+
+    >>> snapshot = SkinWeightsSnapshot.from_geometry(mesh)
+    >>> snapshot.save('/tmp/body_weights.npz')
+    >>> SkinWeightsSnapshot.load('/tmp/body_weights.npz').apply(mesh)
+    """
+    def __init__(self, influences=None, indptr=None, indices=None, weights=None):
+        """
+        :param influences: The name of each influences referenced by indices.
+        :param indptr: An array of size num_vertices+1, the entries of vertex i are stored in [indptr[i]:indptr[i+1]].
+        :param indices: An array containing the influence index of each entry.
+        :param weights: An array containing the weight of each entry.
+        """
+        if not use_numpy:
+            raise Exception("Can't create skin weights snapshot, numpy is not available.")
+        self.influences = list(influences) if influences else []
+        self.indptr = numpy.asarray(indptr if indptr is not None else [0], dtype=numpy.int64)
+        self.indices = numpy.asarray(indices if indices is not None else [], dtype=numpy.int32)
+        self.weights = numpy.asarray(weights if weights is not None else [], dtype=numpy.float64)
+
+    @property
+    def num_vertices(self):
+        return len(self.indptr) - 1
+
+    @property
+    def nbytes(self):
+        """
+        :return: The memory used by the snapshot arrays.
+        """
+        return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes
+
+    def __str__(self):
+        return '<{0} {1} vertices, {2} influences, {3} weights>'.format(
+            self.__class__.__name__, self.num_vertices, len(self.influences), len(self.weights)
+        )
+
+    @classmethod
+    def _from_entries(cls, influences, num_vertices, rows, cols, weights):
+        """
+        :param rows: An array containing the vertex index of each entry.
+        :param cols: An array containing the influence index of each entry.
+        :param weights: An array containing the weight of each entry.
+        The entries can be provided in any order.
+        """
+        rows = numpy.asarray(rows, dtype=numpy.int64)
+        order = numpy.lexsort((cols, rows))
+        indptr = numpy.zeros(num_vertices + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(rows, minlength=num_vertices), out=indptr[1:])
+        return cls(influences=influences, indptr=indptr, indices=numpy.asarray(cols)[order],
+                   weights=numpy.asarray(weights)[order])
+
+    @classmethod
+    def from_dense(cls, influences, weights, epsilon=0.0):
+        """
+        :param influences: The name of each influences.
+        :param weights: A (num_vertices, num_influences) array.
+        :param epsilon: Weights smaller or equal to this value won't be stored.
+        """
+        weights = numpy.asarray(weights, dtype=numpy.float64)
+        rows, cols = numpy.nonzero(numpy.abs(weights) > epsilon)
+        return cls._from_entries(influences, len(weights), rows, cols, weights[rows, cols])
+
+    def to_dense(self, influences=None):
+        """
+        :param influences: The name of the influences (columns) to return. Default to the snapshot influences.
+        Influences unknown to the snapshot will have zero weights.
+        :return: A (num_vertices, num_influences) array.
+        """
+        if influences is None:
+            influences = self.influences
+        column_by_name = dict((name, i) for i, name in enumerate(influences))
+        # Map each snapshot influence to it's destination column, -1 if missing.
+        columns = numpy.array([column_by_name.get(name, -1) for name in self.influences], dtype=numpy.int64)
+
+        result = numpy.zeros((self.num_vertices, len(influences)), dtype=numpy.float64)
+        rows = numpy.repeat(numpy.arange(self.num_vertices), numpy.diff(self.indptr))
+        cols = columns[self.indices] if len(columns) else self.indices
+        mask = cols >= 0
+        result[rows[mask], cols[mask]] = self.weights[mask]
+        return result
+
+    @classmethod
+    def from_geometry(cls, obj, epsilon=0.0):
+        """
+        Capture the skin weights of a geometry.
+        :param obj: The skinned geometry or the skinCluster.
+        """
+        skinCluster = get_skin_cluster(obj)
+        if skinCluster is None:
+            raise Exception("Can't find skinCluster on {0}".format(obj.__melobject__()))
+
+        # Hack: If for any reasons a skinCluster was provided, use the first shape.
+        if isinstance(obj, pymel.nodetypes.SkinCluster):
+            obj = next(iter(obj.getOutputGeometry()), None)
+            if obj is None:
+                raise Exception("Can't capture weights. No geometry found affected by {0}.".format(skinCluster))
+
+        mfnSkinCluster = skinCluster.__apimfn__()
+        geometryDagPath = obj.__apimdagpath__()
+        component = pymel.api.toComponentMObject(geometryDagPath)
+        num_vertices = OpenMaya.MItGeometry(geometryDagPath).count()
+
+        # Capture the weights one influence at the time so the dense weights table is never allocated.
+        influence_objects = skinCluster.influenceObjects()
+        rows = [numpy.zeros(0, dtype=numpy.int64)]
+        cols = [numpy.zeros(0, dtype=numpy.int32)]
+        weights = [numpy.zeros(0, dtype=numpy.float64)]
+        for influence_index in range(len(influence_objects)):
+            influence_weights = _get_influence_weights(mfnSkinCluster, geometryDagPath, component, influence_index)
+            vert_indices = numpy.flatnonzero(numpy.abs(influence_weights) > epsilon)
+            rows.append(vert_indices)
+            cols.append(numpy.repeat(numpy.int32(influence_index), len(vert_indices)))
+            weights.append(influence_weights[vert_indices])
+
+        influences = [influence.name() for influence in influence_objects]
+        return cls._from_entries(influences, num_vertices, numpy.concatenate(rows), numpy.concatenate(cols),
+                                 numpy.concatenate(weights))
+
+    def apply(self, obj):
+        """
+        Restore the skin weights on a geometry. Only the vertices with stored weights are written.
+        An exception is raised if the geometry vertices don't match the snapshot or if an influence with stored
+        weights is missing from the skinCluster.
+        :param obj: The skinned geometry or the skinCluster.
+        """
+        skinCluster = get_skin_cluster(obj)
+        if skinCluster is None:
+            raise Exception("Can't find skinCluster on {0}".format(obj.__melobject__()))
+
+        # Hack: If for any reasons a skinCluster was provided, use the first shape.
+        if isinstance(obj, pymel.nodetypes.SkinCluster):
+            obj = next(iter(obj.getOutputGeometry()), None)
+            if obj is None:
+                raise Exception("Can't apply weights. No geometry found affected by {0}.".format(skinCluster))
+
+        mfnSkinCluster = skinCluster.__apimfn__()
+        geometryDagPath = obj.__apimdagpath__()
+
+        # Validate the snapshot match the geometry, otherwise we would write the weights on the wrong vertices.
+        num_vertices = OpenMaya.MItGeometry(geometryDagPath).count()
+        if num_vertices != self.num_vertices:
+            raise Exception("Can't apply weights on {0}, expected {1} vertices, got {2}.".format(
+                obj, self.num_vertices, num_vertices
+            ))
+        influence_objects = skinCluster.influenceObjects()
+        influences = [influence.name() for influence in influence_objects]
+        missing = set(self.influences[index] for index in numpy.unique(self.indices)) - set(influences)
+        if missing:
+            raise Exception("Can't apply weights on {0}, influences are missing from {1}: {2}".format(
+                obj, skinCluster, ', '.join(sorted(missing))
+            ))
+
+        # Resolve the vertices to write
+        vert_indices = numpy.flatnonzero(numpy.diff(self.indptr))
+        if not len(vert_indices):
+            return
+        component = _get_vertices_component(vert_indices)
+
+        # Resolve, for each vertex to write, the influences that currently have weights. They need to be zeroed.
+        # The weights are read one influence at the time so the dense weights table is never allocated.
+        rows = [numpy.repeat(numpy.arange(self.num_vertices), numpy.diff(self.indptr))]
+        column_by_name = dict((name, i) for i, name in enumerate(influences))
+        columns = numpy.array([column_by_name.get(name, -1) for name in self.influences], dtype=numpy.int64)
+        cols = [columns[self.indices]]
+        for influence_index in range(len(influences)):
+            influence_weights = _get_influence_weights(mfnSkinCluster, geometryDagPath, component, influence_index)
+            rows.append(vert_indices[numpy.flatnonzero(influence_weights)])
+            cols.append(numpy.repeat(influence_index, len(rows[-1])))
+        rows = numpy.concatenate(rows)
+        cols = numpy.concatenate(cols)
+        values = numpy.concatenate((self.weights, numpy.zeros(len(rows) - len(self.weights))))
+
+        # Remove the duplicated entries, the stored weights come first and are kept.
+        entries = rows * len(influences) + cols
+        _, first_indices = numpy.unique(entries, return_index=True)
+        written = self._from_entries(influences, self.num_vertices, rows[first_indices], cols[first_indices],
+                                     values[first_indices])
+
+        # Group the vertices by influences set, each group is written using only it's influences.
+        vert_indices_by_influences = collections.OrderedDict()
+        indptr = written.indptr.tolist()
+        indices = written.indices.tolist()
+        for vert_index in vert_indices.tolist():
+            key = tuple(indices[indptr[vert_index]:indptr[vert_index + 1]])
+            vert_indices_by_influences.setdefault(key, []).append(vert_index)
+
+        for influence_indices, group_vert_indices in vert_indices_by_influences.iteritems():
+            mint_influences = OpenMaya.MIntArray()
+            for influence_index in influence_indices:
+                mint_influences.append(influence_index)
+            # Every vertex of the group have the same number of entries, stored vertex-major.
+            starts = written.indptr[group_vert_indices]
+            positions = starts[:, numpy.newaxis] + numpy.arange(len(influence_indices))
+            new_weights = _numpy_to_mdoublearray(written.weights[positions])
+            old_weights = OpenMaya.MDoubleArray()
+            mfnSkinCluster.setWeights(geometryDagPath, _get_vertices_component(group_vert_indices), mint_influences,
+                                      new_weights, old_weights)
+
+    @staticmethod
+    def _get_path(path):
+        # numpy.savez append the .npz extension if it is missing, do the same when loading.
+        return path if path.endswith('.npz') else path + '.npz'
+
+    def save(self, path):
+        """
+        Save the snapshot on disk using the numpy .npz format.
+        The .npz extension is added to the path if it is missing.
+        """
+        numpy.savez(
+            self._get_path(path),
+            influences=numpy.array(self.influences),
+            indptr=self.indptr,
+            indices=self.indices,
+            weights=self.weights
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a snapshot previously saved on disk.
+        The arrays are read in memory at once so the file is not kept open.
+        """
+        data = numpy.load(cls._get_path(path))
+        try:
+            return cls(
+                influences=data['influences'].tolist(),
+                indptr=data['indptr'],
+                indices=data['indices'],
+                weights=data['weights']
+            )
+        finally:
+            data.close()
 
-    mfnSkinCluster.setWeights(geometryDagPath, component, mint_influences, new_weights, old_weights)
 
 #TODO : Reset the bind pose at the same time to prevent any problem
 def reset_skin_cluster(skinCluster):
@@ -0,0 +1,128 @@
+"""
+Skin weights math that don't depend on Maya, working on (x, y, z) tuples or numpy arrays.
+This is the only implementation of the segments weights, it is used by libPymel.SegmentCollection, libSkinning
+and the worker processes of libSkinning.compute_weights_from_knots_parallel.
+"""
+from omtk.libs.libPython import numpy, use_numpy
+
+# Tolerance used to accept a point at the limit of a segment.
+BOUND_MIN = -0.000000000001
+BOUND_MAX = 1.0000000000001
+
+
+def interp_linear(r, s, e):
+    return (e - s) * r + s
+
+
+def interp_cubic(x):
+    """
+    src: http://stackoverflow.com/questions/1146281/cubic-curve-smooth-interpolation-in-c-sharp
+    """
+    return (x * x) * (3.0 - (2.0 * x))
+
+
+def closest_segment_index(knot_positions, pos, epsilon=0.001):
+    """
+    Resolve the segment of a chain of knots to use for a position.
+    :param knot_positions: A list of (x, y, z) tuples.
+    :param pos: A (x, y, z) tuple.
+    :param epsilon: Segments shorter than this are considered degenerated and always return a ratio of zero.
+    :return: A 2-sized tuple containing the index of the segment and the ratio on the segment.
+    """
+    px, py, pz = pos
+    num_segments = len(knot_positions) - 1
+    for knot_index in range(num_segments):
+        ax, ay, az = knot_positions[knot_index]
+        bx, by, bz = knot_positions[knot_index + 1]
+        abx, aby, abz = bx - ax, by - ay, bz - az
+        length_sq = abx * abx + aby * aby + abz * abz
+        if length_sq > epsilon * epsilon:
+            ratio = ((px - ax) * abx + (py - ay) * aby + (pz - az) * abz) / length_sq
+        else:
+            ratio = 0.0
+
+        if BOUND_MIN <= ratio <= BOUND_MAX:
+            return knot_index, ratio
+        elif knot_index == 0 and ratio < BOUND_MIN:  # Handle out-of-bound
+            return knot_index, 0.0
+        elif knot_index == (num_segments-1) and ratio > BOUND_MAX:  # Handle out-of-bound
+            return knot_index, 1.0
+    raise Exception("Can't resolve segment for {0}".format(pos))
+
+
+def closest_segments(knot_positions, positions, epsilon=0.001):
+    """
+    Vectorized equivalent of closest_segment_index. Require numpy.
+    :param knot_positions: A list of (x, y, z) tuples.
+    :param positions: A (N,3) array of positions.
+    :return: A 2-sized tuple containing the segment indices and the ratios on the segments, as arrays of size N.
+    """
+    knot_positions = numpy.asarray(knot_positions, dtype=numpy.float64)
+    positions = numpy.asarray(positions, dtype=numpy.float64).reshape(-1, 3)
+    starts = knot_positions[:-1]
+    directions = knot_positions[1:] - starts
+    lengths_sq = (directions * directions).sum(axis=1)
+    num_segments = len(starts)
+
+    # Compute the normalized distance of each point on each segments. (N,S)
+    a_to_p = positions[:, numpy.newaxis, :] - starts[numpy.newaxis, :, :]
+    dots = (a_to_p * directions[numpy.newaxis, :, :]).sum(axis=2)
+    is_valid_length = lengths_sq > (epsilon * epsilon)
+    safe_lengths_sq = numpy.where(is_valid_length, lengths_sq, 1.0)
+    ratios = numpy.where(is_valid_length, dots / safe_lengths_sq, 0.0)
+
+    # Find the first matching segment, the first and last segment also accept out-of-bound points.
+    is_match = (ratios >= BOUND_MIN) & (ratios <= BOUND_MAX)
+    is_match[:, 0] |= ratios[:, 0] < BOUND_MIN
+    is_match[:, num_segments-1] |= ratios[:, num_segments-1] > BOUND_MAX
+    has_match = is_match.any(axis=1)
+    if not has_match.all():
+        pos = positions[numpy.argmin(has_match)]
+        raise Exception("Can't resolve segment for {0}".format(pos))
+
+    indices = is_match.argmax(axis=1)
+    ratios = ratios[numpy.arange(len(positions)), indices]
+    ratios = numpy.where((indices == 0) & (ratios < BOUND_MIN), 0.0, ratios)
+    ratios = numpy.where((indices == num_segments-1) & (ratios > BOUND_MAX), 1.0, ratios)
+    return indices, ratios
+
+
+def get_point_weights_from_knots(knot_positions, knot_weights, pos):
+    """
+    Resolve the weights of a position from the weights of the knots of a segment chain.
+    :param knot_positions: A list of (x, y, z) tuples.
+    :param knot_weights: The weights of each knots. See libPymel.SegmentCollection.get_knot_weights.
+    :param pos: A (x, y, z) tuple.
+    :return: A list containing the weight of each knot.
+    """
+    knot_index, ratio = closest_segment_index(knot_positions, pos)
+    ratio = interp_cubic(ratio)
+    point_weights_inn = knot_weights[knot_index]
+    point_weights_out = knot_weights[knot_index + 1]
+    return [(weight_out - weight_inn)*ratio + weight_inn for weight_inn, weight_out in zip(point_weights_inn, point_weights_out)]
+
+
+def get_points_weights_from_knots_numpy(knot_positions, knot_weights, positions):
+    """
+    Vectorized equivalent of get_point_weights_from_knots. Require numpy.
+    :param positions: A (N,3) array of positions.
+    :return: A (N,num_knots) numpy.ndarray of weights.
+    """
+    knot_indices, ratios = closest_segments(knot_positions, positions)
+    knot_weights = numpy.asarray(knot_weights, dtype=numpy.float64)
+    point_weights_inn = knot_weights[knot_indices]
+    point_weights_out = knot_weights[knot_indices + 1]
+    ratios = interp_cubic(ratios)[:, numpy.newaxis]
+    return (point_weights_out - point_weights_inn) * ratios + point_weights_inn
+
+
+def get_points_weights_from_knots(args):
+    """
+    Compute the weights of a chunk of positions. Executed in a worker process.
+    :param args: A 3-sized tuple containing the positions, the knot positions and the knot weights.
+    :return: A (N,num_knots) numpy.ndarray. If numpy is not available, a list containing a list of weights for each position.
+    """
+    positions, knot_positions, knot_weights = args
+    if use_numpy:
+        return get_points_weights_from_knots_numpy(knot_positions, knot_weights, positions)
+    return [get_point_weights_from_knots(knot_positions, knot_weights, pos) for pos in positions]
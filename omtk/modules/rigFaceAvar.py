@@ -738,38 +738,40 @@ class AvarFollicle(AvarSimple):
         #
         # Extract the delta of the influence follicle and it's initial pose follicle
         #
-        attr_localTM = libRigging.create_utility_node('multMatrix', matrixIn=[
-            influence.worldMatrix,
-            obj_offset.worldInverseMatrix
-        ]).matrixSum
-
-        # Since we are extracting the delta between the influence and the bindpose matrix, the rotation of the surface
-        # is not taken in consideration wich make things less intuitive for the rigger.
-        # So we'll add an adjustement matrix so the rotation of the surface is taken in consideration.
-        util_decomposeTM_bindPose = libRigging.create_utility_node('decomposeMatrix',
-                                                                   inputMatrix=obj_offset.worldMatrix
-                                                                   )
-        attr_translateTM = libRigging.create_utility_node('composeMatrix',
-                                                          inputTranslate=util_decomposeTM_bindPose.outputTranslate
-                                                          ).outputMatrix
-        attr_translateTM_inv = libRigging.create_utility_node('inverseMatrix',
-                                                              inputMatrix=attr_translateTM,
+        # The extraction of the delta only create utility nodes, create them in a single batch.
+        with libRigging.NodeBatch():
+            attr_localTM = libRigging.create_utility_node('multMatrix', matrixIn=[
+                influence.worldMatrix,
+                obj_offset.worldInverseMatrix
+            ]).matrixSum
+
+            # Since we are extracting the delta between the influence and the bindpose matrix, the rotation of the surface
+            # is not taken in consideration wich make things less intuitive for the rigger.
+            # So we'll add an adjustement matrix so the rotation of the surface is taken in consideration.
+            util_decomposeTM_bindPose = libRigging.create_utility_node('decomposeMatrix',
+                                                                       inputMatrix=obj_offset.worldMatrix
+                                                                       )
+            attr_translateTM = libRigging.create_utility_node('composeMatrix',
+                                                              inputTranslate=util_decomposeTM_bindPose.outputTranslate
                                                               ).outputMatrix
-        attr_rotateTM = libRigging.create_utility_node('multMatrix',
-                                                       matrixIn=[obj_offset.worldMatrix, attr_translateTM_inv]
-                                                       ).matrixSum
-        attr_rotateTM_inv = libRigging.create_utility_node('inverseMatrix',
-                                                           inputMatrix=attr_rotateTM
-                                                           ).outputMatrix
-        attr_finalTM = libRigging.create_utility_node('multMatrix',
-                                                      matrixIn=[attr_rotateTM_inv,
-                                                                attr_localTM,
-                                                                attr_rotateTM]
-                                                      ).matrixSum
-
-        util_decomposeTM = libRigging.create_utility_node('decomposeMatrix',
-                                                          inputMatrix=attr_finalTM
-                                                          )
+            attr_translateTM_inv = libRigging.create_utility_node('inverseMatrix',
+                                                                  inputMatrix=attr_translateTM,
+                                                                  ).outputMatrix
+            attr_rotateTM = libRigging.create_utility_node('multMatrix',
+                                                           matrixIn=[obj_offset.worldMatrix, attr_translateTM_inv]
+                                                           ).matrixSum
+            attr_rotateTM_inv = libRigging.create_utility_node('inverseMatrix',
+                                                               inputMatrix=attr_rotateTM
+                                                               ).outputMatrix
+            attr_finalTM = libRigging.create_utility_node('multMatrix',
+                                                          matrixIn=[attr_rotateTM_inv,
+                                                                    attr_localTM,
+                                                                    attr_rotateTM]
+                                                          ).matrixSum
+
+            util_decomposeTM = libRigging.create_utility_node('decomposeMatrix',
+                                                              inputMatrix=attr_finalTM
+                                                              )
 
         #
         # Resolve the parameterU and parameterV
@@ -810,124 +812,127 @@ class AvarFollicle(AvarSimple):
         fol_clamped_u.rename(fol_clamped_u_name)
         fol_clamped_u.setParent(self.grp_rig)
 
-        # Clamp the values so they never fully reach 0 or 1 for U and V.
-        util_clamp_uv = libRigging.create_utility_node('clamp',
-                                                       inputR=attr_u_inn,
-                                                       inputG=attr_v_inn,
-                                                       minR=oob_step_size,
-                                                       minG=oob_step_size,
-                                                       maxR=1.0 - oob_step_size,
-                                                       maxG=1.0 - oob_step_size)
-        clamped_u = util_clamp_uv.outputR
-        clamped_v = util_clamp_uv.outputG
-
-        pymel.connectAttr(clamped_v, fol_clamped_v.parameterV)
-        pymel.connectAttr(attr_u_inn, fol_clamped_v.parameterU)
-
-        pymel.connectAttr(attr_v_inn, fol_clamped_u.parameterV)
-        pymel.connectAttr(clamped_u, fol_clamped_u.parameterU)
-
-        # Compute the direction to add for U and V if we are out-of-bound.
-        dir_oob_u = libRigging.create_utility_node('plusMinusAverage',
-                                                   operation=2,
-                                                   input3D=[
-                                                       fol_influence.translate,
-                                                       fol_clamped_u.translate
-                                                   ]).output3D
-        dir_oob_v = libRigging.create_utility_node('plusMinusAverage',
-                                                   operation=2,
-                                                   input3D=[
-                                                       fol_influence.translate,
-                                                       fol_clamped_v.translate
-                                                   ]).output3D
-
-        # Compute the offset to add for U and V
-
-        condition_oob_u_neg = libRigging.create_utility_node('condition',
-                                                             operation=4,  # less than
-                                                             firstTerm=attr_u_inn,
-                                                             secondTerm=0.0,
-                                                             colorIfTrueR=1.0,
-                                                             colorIfFalseR=0.0,
-                                                             ).outColorR
-        condition_oob_u_pos = libRigging.create_utility_node('condition',  # greater than
-                                                             operation=2,
-                                                             firstTerm=attr_u_inn,
-                                                             secondTerm=1.0,
-                                                             colorIfTrueR=1.0,
-                                                             colorIfFalseR=0.0,
-                                                             ).outColorR
-        condition_oob_v_neg = libRigging.create_utility_node('condition',
-                                                             operation=4,  # less than
-                                                             firstTerm=attr_v_inn,
-                                                             secondTerm=0.0,
-                                                             colorIfTrueR=1.0,
-                                                             colorIfFalseR=0.0,
-                                                             ).outColorR
-        condition_oob_v_pos = libRigging.create_utility_node('condition',  # greater than
-                                                             operation=2,
-                                                             firstTerm=attr_v_inn,
-                                                             secondTerm=1.0,
-                                                             colorIfTrueR=1.0,
-                                                             colorIfFalseR=0.0,
-                                                             ).outColorR
-
-        # Compute the amount of oob
-        oob_val_u_pos = libRigging.create_utility_node('plusMinusAverage', operation=2,
-                                                       input1D=[attr_u_inn, 1.0]).output1D
-        oob_val_u_neg = libRigging.create_utility_node('multiplyDivide', input1X=attr_u_inn, input2X=-1.0).outputX
-        oob_val_v_pos = libRigging.create_utility_node('plusMinusAverage', operation=2,
-                                                       input1D=[attr_v_inn, 1.0]).output1D
-        oob_val_v_neg = libRigging.create_utility_node('multiplyDivide', input1X=attr_v_inn, input2X=-1.0).outputX
-        oob_val_u = libRigging.create_utility_node('condition', operation=0, firstTerm=condition_oob_u_pos,
-                                                   secondTerm=1.0, colorIfTrueR=oob_val_u_pos,
-                                                   colorIfFalseR=oob_val_u_neg).outColorR
-        oob_val_v = libRigging.create_utility_node('condition', operation=0, firstTerm=condition_oob_v_pos,
-                                                   secondTerm=1.0, colorIfTrueR=oob_val_v_pos,
-                                                   colorIfFalseR=oob_val_v_neg).outColorR
-
-        oob_amount_u = libRigging.create_utility_node('multiplyDivide', operation=2, input1X=oob_val_u,
-                                                      input2X=oob_step_size).outputX
-        oob_amount_v = libRigging.create_utility_node('multiplyDivide', operation=2, input1X=oob_val_v,
-                                                      input2X=oob_step_size).outputX
-
-        oob_offset_u = libRigging.create_utility_node('multiplyDivide', input1X=oob_amount_u, input1Y=oob_amount_u,
-                                                      input1Z=oob_amount_u, input2=dir_oob_u).output
-        oob_offset_v = libRigging.create_utility_node('multiplyDivide', input1X=oob_amount_v, input1Y=oob_amount_v,
-                                                      input1Z=oob_amount_v, input2=dir_oob_v).output
-
-        # Add the U out-of-bound-offset only if the U is between 0.0 and 1.0
-        oob_u_condition_1 = condition_oob_u_neg
-        oob_u_condition_2 = condition_oob_u_pos
-        oob_u_condition_added = libRigging.create_utility_node('addDoubleLinear',
-                                                               input1=oob_u_condition_1,
-                                                               input2=oob_u_condition_2
-                                                               ).output
-        oob_u_condition_out = libRigging.create_utility_node('condition',
-                                                             operation=0,  # equal
-                                                             firstTerm=oob_u_condition_added,
-                                                             secondTerm=1.0,
-                                                             colorIfTrue=oob_offset_u,
-                                                             colorIfFalse=[0, 0, 0]
-                                                             ).outColor
-
-        # Add the V out-of-bound-offset only if the V is between 0.0 and 1.0
-        oob_v_condition_1 = condition_oob_v_neg
-        oob_v_condition_2 = condition_oob_v_pos
-        oob_v_condition_added = libRigging.create_utility_node('addDoubleLinear',
-                                                               input1=oob_v_condition_1,
-                                                               input2=oob_v_condition_2
-                                                               ).output
-        oob_v_condition_out = libRigging.create_utility_node('condition',
-                                                             operation=0,  # equal
-                                                             firstTerm=oob_v_condition_added,
-                                                             secondTerm=1.0,
-                                                             colorIfTrue=oob_offset_v,
-                                                             colorIfFalse=[0, 0, 0]
-                                                             ).outColor
-
-        oob_offset = libRigging.create_utility_node('plusMinusAverage',
-                                                    input3D=[oob_u_condition_out, oob_v_condition_out]).output3D
+        # The out-of-bound setup only create utility nodes, create them in a single batch.
+        # Note that the connections to the follicles use connect_or_set_attr so they are part of the batch.
+        with libRigging.NodeBatch():
+            # Clamp the values so they never fully reach 0 or 1 for U and V.
+            util_clamp_uv = libRigging.create_utility_node('clamp',
+                                                           inputR=attr_u_inn,
+                                                           inputG=attr_v_inn,
+                                                           minR=oob_step_size,
+                                                           minG=oob_step_size,
+                                                           maxR=1.0 - oob_step_size,
+                                                           maxG=1.0 - oob_step_size)
+            clamped_u = util_clamp_uv.outputR
+            clamped_v = util_clamp_uv.outputG
+
+            libRigging.connect_or_set_attr(fol_clamped_v.parameterV, clamped_v)
+            libRigging.connect_or_set_attr(fol_clamped_v.parameterU, attr_u_inn)
+
+            libRigging.connect_or_set_attr(fol_clamped_u.parameterV, attr_v_inn)
+            libRigging.connect_or_set_attr(fol_clamped_u.parameterU, clamped_u)
+
+            # Compute the direction to add for U and V if we are out-of-bound.
+            dir_oob_u = libRigging.create_utility_node('plusMinusAverage',
+                                                       operation=2,
+                                                       input3D=[
+                                                           fol_influence.translate,
+                                                           fol_clamped_u.translate
+                                                       ]).output3D
+            dir_oob_v = libRigging.create_utility_node('plusMinusAverage',
+                                                       operation=2,
+                                                       input3D=[
+                                                           fol_influence.translate,
+                                                           fol_clamped_v.translate
+                                                       ]).output3D
+
+            # Compute the offset to add for U and V
+
+            condition_oob_u_neg = libRigging.create_utility_node('condition',
+                                                                 operation=4,  # less than
+                                                                 firstTerm=attr_u_inn,
+                                                                 secondTerm=0.0,
+                                                                 colorIfTrueR=1.0,
+                                                                 colorIfFalseR=0.0,
+                                                                 ).outColorR
+            condition_oob_u_pos = libRigging.create_utility_node('condition',  # greater than
+                                                                 operation=2,
+                                                                 firstTerm=attr_u_inn,
+                                                                 secondTerm=1.0,
+                                                                 colorIfTrueR=1.0,
+                                                                 colorIfFalseR=0.0,
+                                                                 ).outColorR
+            condition_oob_v_neg = libRigging.create_utility_node('condition',
+                                                                 operation=4,  # less than
+                                                                 firstTerm=attr_v_inn,
+                                                                 secondTerm=0.0,
+                                                                 colorIfTrueR=1.0,
+                                                                 colorIfFalseR=0.0,
+                                                                 ).outColorR
+            condition_oob_v_pos = libRigging.create_utility_node('condition',  # greater than
+                                                                 operation=2,
+                                                                 firstTerm=attr_v_inn,
+                                                                 secondTerm=1.0,
+                                                                 colorIfTrueR=1.0,
+                                                                 colorIfFalseR=0.0,
+                                                                 ).outColorR
+
+            # Compute the amount of oob
+            oob_val_u_pos = libRigging.create_utility_node('plusMinusAverage', operation=2,
+                                                           input1D=[attr_u_inn, 1.0]).output1D
+            oob_val_u_neg = libRigging.create_utility_node('multiplyDivide', input1X=attr_u_inn, input2X=-1.0).outputX
+            oob_val_v_pos = libRigging.create_utility_node('plusMinusAverage', operation=2,
+                                                           input1D=[attr_v_inn, 1.0]).output1D
+            oob_val_v_neg = libRigging.create_utility_node('multiplyDivide', input1X=attr_v_inn, input2X=-1.0).outputX
+            oob_val_u = libRigging.create_utility_node('condition', operation=0, firstTerm=condition_oob_u_pos,
+                                                       secondTerm=1.0, colorIfTrueR=oob_val_u_pos,
+                                                       colorIfFalseR=oob_val_u_neg).outColorR
+            oob_val_v = libRigging.create_utility_node('condition', operation=0, firstTerm=condition_oob_v_pos,
+                                                       secondTerm=1.0, colorIfTrueR=oob_val_v_pos,
+                                                       colorIfFalseR=oob_val_v_neg).outColorR
+
+            oob_amount_u = libRigging.create_utility_node('multiplyDivide', operation=2, input1X=oob_val_u,
+                                                          input2X=oob_step_size).outputX
+            oob_amount_v = libRigging.create_utility_node('multiplyDivide', operation=2, input1X=oob_val_v,
+                                                          input2X=oob_step_size).outputX
+
+            oob_offset_u = libRigging.create_utility_node('multiplyDivide', input1X=oob_amount_u, input1Y=oob_amount_u,
+                                                          input1Z=oob_amount_u, input2=dir_oob_u).output
+            oob_offset_v = libRigging.create_utility_node('multiplyDivide', input1X=oob_amount_v, input1Y=oob_amount_v,
+                                                          input1Z=oob_amount_v, input2=dir_oob_v).output
+
+            # Add the U out-of-bound-offset only if the U is between 0.0 and 1.0
+            oob_u_condition_1 = condition_oob_u_neg
+            oob_u_condition_2 = condition_oob_u_pos
+            oob_u_condition_added = libRigging.create_utility_node('addDoubleLinear',
+                                                                   input1=oob_u_condition_1,
+                                                                   input2=oob_u_condition_2
+                                                                   ).output
+            oob_u_condition_out = libRigging.create_utility_node('condition',
+                                                                 operation=0,  # equal
+                                                                 firstTerm=oob_u_condition_added,
+                                                                 secondTerm=1.0,
+                                                                 colorIfTrue=oob_offset_u,
+                                                                 colorIfFalse=[0, 0, 0]
+                                                                 ).outColor
+
+            # Add the V out-of-bound-offset only if the V is between 0.0 and 1.0
+            oob_v_condition_1 = condition_oob_v_neg
+            oob_v_condition_2 = condition_oob_v_pos
+            oob_v_condition_added = libRigging.create_utility_node('addDoubleLinear',
+                                                                   input1=oob_v_condition_1,
+                                                                   input2=oob_v_condition_2
+                                                                   ).output
+            oob_v_condition_out = libRigging.create_utility_node('condition',
+                                                                 operation=0,  # equal
+                                                                 firstTerm=oob_v_condition_added,
+                                                                 secondTerm=1.0,
+                                                                 colorIfTrue=oob_offset_v,
+                                                                 colorIfFalse=[0, 0, 0]
+                                                                 ).outColor
+
+            oob_offset = libRigging.create_utility_node('plusMinusAverage',
+                                                        input3D=[oob_u_condition_out, oob_v_condition_out]).output3D
 
         layer_oob = stack.append_layer('oobLayer')
         pymel.connectAttr(oob_offset, layer_oob.t)
@@ -297,15 +297,27 @@ class AvarGrp(rigFaceAvar.AbstractAvar):  # todo: why do we inherit from Abstrac
         mult_u = self.get_multiplier_u()
         mult_v = self.get_multiplier_v()
 
+        # Resolve the ctrls closest point on the rig meshes in a single query.
+        # The InteractiveCtrl of each avar will re-use them from the rig ClosestPointEngine.
+        ctrls_tm = [None] * len(self.avars)
+        if create_ctrls and 'ctrl_tm' not in kwargs:
+            ctrls_tm = [self._get_avar_ctrl_tm(avar) for avar in self.avars]
+            positions = [ctrl_tm.translate for ctrl_tm in ctrls_tm if ctrl_tm is not None]
+            self.rig.get_closest_point_engine().get_closest_points(positions)
+
         # Build avars and connect them to global avars
         avar_influences = self._get_avars_influences()
-        for jnt, avar in zip(avar_influences, self.avars):
+        for jnt, avar, ctrl_tm in zip(avar_influences, self.avars, ctrls_tm):
             self.configure_avar(avar)
 
             # HACK: Set module name using rig nomenclature.
             # TODO: Do this in the back-end
             avar.name = self.rig.nomenclature(jnt.name()).resolve()
 
+            avar_kwargs = kwargs
+            if ctrl_tm is not None:
+                avar_kwargs = dict(kwargs, ctrl_tm=ctrl_tm)
+
             self._build_avar_micro(None, avar,
                                    create_ctrl=create_ctrls,
                                    constraint=constraint,
@@ -313,11 +325,23 @@ class AvarGrp(rigFaceAvar.AbstractAvar):  # todo: why do we inherit from Abstrac
                                    mult_u=mult_u,
                                    mult_v=mult_v,
                                    connect_global_scale=connect_global_scale,
-                                   **kwargs
+                                   **avar_kwargs
                                    )
 
         self.connect_global_avars()
 
+    def _get_avar_ctrl_tm(self, avar):
+        """
+        :return: The ctrl transformation of an avar or None if it can't be resolved before the build.
+        """
+        if not avar.jnt:
+            return None
+        try:
+            return avar.get_ctrl_tm()
+        except Exception, e:
+            log.debug("Can't resolve {0} ctrl transformation before the build: {1}".format(avar, e))
+            return None
+
     def _build_avar(self, avar, **kwargs):
         # HACK: Validate avars at runtime
         # TODO: Find a way to validate before build without using VALIDATE_MESH
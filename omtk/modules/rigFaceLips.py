@@ -94,168 +94,170 @@ class SplitterNode(Node):
         # Step 1: Get the jaw displacement in uv space (parameterV only).
         #
 
-        attr_jaw_circumference = libRigging.create_utility_node(
-            'multiplyDivide',
-            name=nomenclature_rig.resolve('getJawCircumference'),
-            input1X=self.attr_inn_jaw_radius,
-            input2X=(math.pi * 2.0)
-        ).outputX
-
-        attr_jaw_open_circle_ratio = libRigging.create_utility_node(
-            'multiplyDivide',
-            name=nomenclature_rig.resolve('getJawOpenCircleRatio'),
-            operation=2,  # divide
-            input1X=self.attr_inn_jaw_pt,
-            input2X=360.0
-        ).outputX
-
-        attr_jaw_active_circumference = libRigging.create_utility_node(
-            'multiplyDivide',
-            name=nomenclature_rig.resolve('getJawActiveCircumference'),
-            input1X=attr_jaw_circumference,
-            input2X=attr_jaw_open_circle_ratio
-        ).outputX
-
-        # We need this adjustment since we cheat the influence of the avar with the plane uvs.
-        # see AvarFollicle._get_follicle_relative_uv_attr for more information.
-        # attr_jaw_radius_demi = libRigging.create_utility_node(
-        #     'multiplyDivide',
-        #     name=nomenclature_rig.resolve('getJawRangeVRange'),
-        #     input1X=self.attr_inn_surface_range_v,
-        #     input2X=2.0
-        # ).outputX
-
-        attr_jaw_v_range = libRigging.create_utility_node(
-            'multiplyDivide',
-            name=nomenclature_rig.resolve('getActiveJawRangeInSurfaceSpace'),
-            operation=2,  # divide
-            input1X=attr_jaw_active_circumference,
-            input2X=self.attr_inn_surface_range_v
-        ).outputX
-
-        #
-        # Step 2: Resolve attr_out_jaw_ratio
-        #
-
-        # Convert attr_jaw_default_ratio in uv space.
-        attr_jaw_default_ratio_v = libRigging.create_utility_node(
-            'multiplyDivide',
-            name=nomenclature_rig.resolve('getJawDefaultRatioUvSpace'),
-            input1X=self.attr_inn_jaw_default_ratio,
-            input2X=attr_jaw_v_range
-        ).outputX
-
-        attr_jaw_uv_pos = libRigging.create_utility_node(
-            'plusMinusAverage',
-            name=nomenclature_rig.resolve('getCurrentJawUvPos'),
-            operation=2,  # substraction
-            input1D=(attr_jaw_default_ratio_v, self.attr_inn_surface_v)
-        ).output1D
-
-        attr_jaw_ratio_out = libRigging.create_utility_node(
-            'multiplyDivide',
-            name=nomenclature_rig.resolve('getJawRatioOut'),
-            operation=2,  # division
-            input1X=attr_jaw_uv_pos,
-            input2X=attr_jaw_v_range
-        ).outputX
-
-        attr_jaw_ratio_out_limited = libRigging.create_utility_node(
-            'clamp',
-            name=nomenclature_rig.resolve('getLimitedJawRatioOut'),
-            inputR=attr_jaw_ratio_out,
-            minR=0.0,
-            maxR=1.0
-        ).outputR
-
-        # Prevent division by zero
-        attr_jaw_ratio_out_limited_safe = libRigging.create_utility_node(
-            'condition',
-            name=nomenclature_rig.resolve('getSafeJawRatioOut'),
-            operation=1,  # not equal
-            firstTerm=self.attr_inn_jaw_pt,
-            secondTerm=0,
-            colorIfTrueR=attr_jaw_ratio_out_limited,
-            colorIfFalseR=self.attr_inn_jaw_default_ratio
-        ).outColorR
-
-        #
-        # Step 3: Resolve attr_out_surface_u & attr_out_surface_v
-        #
-
-        attr_inn_jaw_default_ratio_inv = libRigging.create_utility_node(
-            'reverse',
-            name=nomenclature_rig.resolve('getJawDefaultRatioInv'),
-            inputX=self.attr_inn_jaw_default_ratio
-        ).outputX
-
-        util_jaw_uv_default_ratio = libRigging.create_utility_node(
-            'multiplyDivide',
-            name=nomenclature_rig.resolve('getJawDefaultRatioUvSpace'),
-            input1X=self.attr_inn_jaw_default_ratio,
-            input1Y=attr_inn_jaw_default_ratio_inv,
-            input2X=attr_jaw_v_range,
-            input2Y=attr_jaw_v_range
-        )
-        attr_jaw_uv_default_ratio = util_jaw_uv_default_ratio.outputX
-        attr_jaw_uv_default_ratio_inv = util_jaw_uv_default_ratio.outputY
-
-        attr_jaw_uv_limit_max = libRigging.create_utility_node(
-            'plusMinusAverage',
-            name=nomenclature_rig.resolve('getJawSurfaceLimitMax'),
-            operation=2,  # substract
-            input1D=(attr_jaw_v_range, attr_jaw_uv_default_ratio_inv)
-        ).output1D
-
-        attr_jaw_uv_limit_min = libRigging.create_utility_node(
-            'plusMinusAverage',
-            name=nomenclature_rig.resolve('getJawSurfaceLimitMin'),
-            operation=2,  # substract
-            input1D=(attr_jaw_uv_default_ratio, attr_jaw_v_range)
-        ).output1D
-
-        attr_jaw_cancel_range = libRigging.create_utility_node(
-            'clamp',
-            name=nomenclature_rig.resolve('getJawCancelRange'),
-            inputR=self.attr_inn_surface_v,
-            minR=attr_jaw_uv_limit_min,
-            maxR=attr_jaw_uv_limit_max
-        ).outputR
-
-        attr_out_surface_v_cancelled = libRigging.create_utility_node(
-            'plusMinusAverage',
-            name=nomenclature_rig.resolve('getCanceledUv'),
-            operation=2,  # substraction
-            input1D=(self.attr_inn_surface_v, attr_jaw_cancel_range)
-        ).output1D
-
-        #
-        # Connect output attributes
-        #
-        attr_inn_bypass_inv = libRigging.create_utility_node(
-            'reverse',
-            name=nomenclature_rig.resolve('getBypassInv'),
-            inputX=self.attr_inn_bypass
-        ).outputX
-
-        # Connect output jaw_ratio
-        attr_output_jaw_ratio = libRigging.create_utility_node(
-            'blendWeighted',
-            input=(attr_jaw_ratio_out_limited_safe, self.attr_inn_jaw_default_ratio),
-            weight=(attr_inn_bypass_inv, self.attr_inn_bypass)
-        ).output
-        pymel.connectAttr(attr_output_jaw_ratio, self.attr_out_jaw_ratio)
-
-        # Connect output surface u
-        pymel.connectAttr(self.attr_inn_surface_u, self.attr_out_surface_u)
-
-        # Connect output surface_v
-        attr_output_surface_v = libRigging.create_utility_node(
-            'blendWeighted',
-            input=(attr_out_surface_v_cancelled, self.attr_inn_surface_v),
-            weight=(attr_inn_bypass_inv, self.attr_inn_bypass)
-        ).output
-        pymel.connectAttr(attr_output_surface_v, self.attr_out_surface_v)
+        # The splitter only create utility nodes, create them in a single batch.
+        with libRigging.NodeBatch():
+            attr_jaw_circumference = libRigging.create_utility_node(
+                'multiplyDivide',
+                name=nomenclature_rig.resolve('getJawCircumference'),
+                input1X=self.attr_inn_jaw_radius,
+                input2X=(math.pi * 2.0)
+            ).outputX
+
+            attr_jaw_open_circle_ratio = libRigging.create_utility_node(
+                'multiplyDivide',
+                name=nomenclature_rig.resolve('getJawOpenCircleRatio'),
+                operation=2,  # divide
+                input1X=self.attr_inn_jaw_pt,
+                input2X=360.0
+            ).outputX
+
+            attr_jaw_active_circumference = libRigging.create_utility_node(
+                'multiplyDivide',
+                name=nomenclature_rig.resolve('getJawActiveCircumference'),
+                input1X=attr_jaw_circumference,
+                input2X=attr_jaw_open_circle_ratio
+            ).outputX
+
+            # We need this adjustment since we cheat the influence of the avar with the plane uvs.
+            # see AvarFollicle._get_follicle_relative_uv_attr for more information.
+            # attr_jaw_radius_demi = libRigging.create_utility_node(
+            #     'multiplyDivide',
+            #     name=nomenclature_rig.resolve('getJawRangeVRange'),
+            #     input1X=self.attr_inn_surface_range_v,
+            #     input2X=2.0
+            # ).outputX
+
+            attr_jaw_v_range = libRigging.create_utility_node(
+                'multiplyDivide',
+                name=nomenclature_rig.resolve('getActiveJawRangeInSurfaceSpace'),
+                operation=2,  # divide
+                input1X=attr_jaw_active_circumference,
+                input2X=self.attr_inn_surface_range_v
+            ).outputX
+
+            #
+            # Step 2: Resolve attr_out_jaw_ratio
+            #
+
+            # Convert attr_jaw_default_ratio in uv space.
+            attr_jaw_default_ratio_v = libRigging.create_utility_node(
+                'multiplyDivide',
+                name=nomenclature_rig.resolve('getJawDefaultRatioUvSpace'),
+                input1X=self.attr_inn_jaw_default_ratio,
+                input2X=attr_jaw_v_range
+            ).outputX
+
+            attr_jaw_uv_pos = libRigging.create_utility_node(
+                'plusMinusAverage',
+                name=nomenclature_rig.resolve('getCurrentJawUvPos'),
+                operation=2,  # substraction
+                input1D=(attr_jaw_default_ratio_v, self.attr_inn_surface_v)
+            ).output1D
+
+            attr_jaw_ratio_out = libRigging.create_utility_node(
+                'multiplyDivide',
+                name=nomenclature_rig.resolve('getJawRatioOut'),
+                operation=2,  # division
+                input1X=attr_jaw_uv_pos,
+                input2X=attr_jaw_v_range
+            ).outputX
+
+            attr_jaw_ratio_out_limited = libRigging.create_utility_node(
+                'clamp',
+                name=nomenclature_rig.resolve('getLimitedJawRatioOut'),
+                inputR=attr_jaw_ratio_out,
+                minR=0.0,
+                maxR=1.0
+            ).outputR
+
+            # Prevent division by zero
+            attr_jaw_ratio_out_limited_safe = libRigging.create_utility_node(
+                'condition',
+                name=nomenclature_rig.resolve('getSafeJawRatioOut'),
+                operation=1,  # not equal
+                firstTerm=self.attr_inn_jaw_pt,
+                secondTerm=0,
+                colorIfTrueR=attr_jaw_ratio_out_limited,
+                colorIfFalseR=self.attr_inn_jaw_default_ratio
+            ).outColorR
+
+            #
+            # Step 3: Resolve attr_out_surface_u & attr_out_surface_v
+            #
+
+            attr_inn_jaw_default_ratio_inv = libRigging.create_utility_node(
+                'reverse',
+                name=nomenclature_rig.resolve('getJawDefaultRatioInv'),
+                inputX=self.attr_inn_jaw_default_ratio
+            ).outputX
+
+            util_jaw_uv_default_ratio = libRigging.create_utility_node(
+                'multiplyDivide',
+                name=nomenclature_rig.resolve('getJawDefaultRatioUvSpace'),
+                input1X=self.attr_inn_jaw_default_ratio,
+                input1Y=attr_inn_jaw_default_ratio_inv,
+                input2X=attr_jaw_v_range,
+                input2Y=attr_jaw_v_range
+            )
+            attr_jaw_uv_default_ratio = util_jaw_uv_default_ratio.outputX
+            attr_jaw_uv_default_ratio_inv = util_jaw_uv_default_ratio.outputY
+
+            attr_jaw_uv_limit_max = libRigging.create_utility_node(
+                'plusMinusAverage',
+                name=nomenclature_rig.resolve('getJawSurfaceLimitMax'),
+                operation=2,  # substract
+                input1D=(attr_jaw_v_range, attr_jaw_uv_default_ratio_inv)
+            ).output1D
+
+            attr_jaw_uv_limit_min = libRigging.create_utility_node(
+                'plusMinusAverage',
+                name=nomenclature_rig.resolve('getJawSurfaceLimitMin'),
+                operation=2,  # substract
+                input1D=(attr_jaw_uv_default_ratio, attr_jaw_v_range)
+            ).output1D
+
+            attr_jaw_cancel_range = libRigging.create_utility_node(
+                'clamp',
+                name=nomenclature_rig.resolve('getJawCancelRange'),
+                inputR=self.attr_inn_surface_v,
+                minR=attr_jaw_uv_limit_min,
+                maxR=attr_jaw_uv_limit_max
+            ).outputR
+
+            attr_out_surface_v_cancelled = libRigging.create_utility_node(
+                'plusMinusAverage',
+                name=nomenclature_rig.resolve('getCanceledUv'),
+                operation=2,  # substraction
+                input1D=(self.attr_inn_surface_v, attr_jaw_cancel_range)
+            ).output1D
+
+            #
+            # Connect output attributes
+            #
+            attr_inn_bypass_inv = libRigging.create_utility_node(
+                'reverse',
+                name=nomenclature_rig.resolve('getBypassInv'),
+                inputX=self.attr_inn_bypass
+            ).outputX
+
+            # Connect output jaw_ratio
+            attr_output_jaw_ratio = libRigging.create_utility_node(
+                'blendWeighted',
+                input=(attr_jaw_ratio_out_limited_safe, self.attr_inn_jaw_default_ratio),
+                weight=(attr_inn_bypass_inv, self.attr_inn_bypass)
+            ).output
+            libRigging.connect_or_set_attr(self.attr_out_jaw_ratio, attr_output_jaw_ratio)
+
+            # Connect output surface u
+            libRigging.connect_or_set_attr(self.attr_out_surface_u, self.attr_inn_surface_u)
+
+            # Connect output surface_v
+            attr_output_surface_v = libRigging.create_utility_node(
+                'blendWeighted',
+                input=(attr_out_surface_v_cancelled, self.attr_inn_surface_v),
+                weight=(attr_inn_bypass_inv, self.attr_inn_bypass)
+            ).output
+            libRigging.connect_or_set_attr(self.attr_out_surface_v, attr_output_surface_v)
 
 
 class FaceLipsAvar(rigFaceAvar.AvarFollicle):
@@ -123,7 +123,7 @@ class LegIk(rigIK.IK):
         return: The recommended position as a world pymel.datatypes.Vector
         """
         dir = pymel.datatypes.Point(0, 0, 1) * tm_ref_dir
-        pos = libRigging.ray_cast_farthest(pos_toes, dir, geometries)
+        pos = self.rig.raycast_farthest(pos_toes, dir)
         if not pos:
             cmds.warning("Can't automatically solve FootRoll front pivot, using last joint as reference.")
             pos = pos_tip
@@ -148,7 +148,7 @@ class LegIk(rigIK.IK):
         return: The recommended position as a world pymel.datatypes.Vector
         """
         dir = pymel.datatypes.Point(0,0,-1) * tm_ref_dir
-        pos = libRigging.ray_cast_farthest(pos_toes, dir, geometries)
+        pos = self.rig.raycast_farthest(pos_toes, dir)
         if not pos:
             cmds.warning("Can't automatically solve FootRoll back pivot.")
             pos = pos_toes
@@ -281,10 +281,13 @@ class Limb(Module):
         yield self.ctrl_elbow
 
     @decorator_uiexpose()
-    def assign_twist_weights(self):
+    def assign_twist_weights(self, executor=None):
+        """
+        :param executor: An optional process pool shared by the twistbones. See libSkinning.compute_weights_from_knots_parallel.
+        """
         for module in self.sys_twist:
             if isinstance(module, rigTwistbone.Twistbone) and module.is_built():
-                module.assign_twist_weights()
+                module.assign_twist_weights(executor=executor)
 
     @decorator_uiexpose()
     def unassign_twist_weights(self):
@@ -291,7 +291,10 @@ class Twistbone(Module):
             self.assign_twist_weights()
 
     @decorator_uiexpose()
-    def assign_twist_weights(self):
+    def assign_twist_weights(self, executor=None):
+        """
+        :param executor: An optional process pool used to compute the weights. See libSkinning.compute_weights_from_knots_parallel.
+        """
         skin_deformers = self.get_skinClusters_from_inputs()
 
         for skin_deformer in skin_deformers:
@@ -306,12 +309,21 @@ class Twistbone(Module):
                     continue
                 skin_deformer.addInfluence(subjnt, lockWeights=True, weight=0.0)
                 subjnt.lockInfluenceWeights.set(False)
-
-        for mesh in self.get_farest_affected_meshes():
-            self.info("{1} --> Assign skin weights on {0}.".format(mesh.name(), self.name))
-            # Transfer weight, note that since we use force_straight line, the influence
-            # don't necessaryy need to be in their bind pose.
-            libSkinning.transfer_weights_from_segments(mesh, self.chain_jnt.start, self.subjnts, force_straight_line=True)
+            libSkinning.invalidate_deformer_index()
+
+        # Transfer weight, note that since we use force_straight line, the influence
+        # don't necessaryy need to be in their bind pose.
+        meshes = self.get_farest_affected_meshes()
+        results = libSkinning.transfer_weights_from_segments_batch(meshes, self.chain_jnt.start, self.subjnts,
+                                                                   force_straight_line=True, executor=executor)
+        for mesh in meshes:
+            result = results[mesh]
+            if result is None:
+                continue
+            num_vertices, duration = result
+            self.info("{1} --> Assign skin weights on {0} ({2} vertices in {3:.3f} seconds).".format(
+                mesh.name(), self.name, num_vertices, duration
+            ))
 
     @decorator_uiexpose()
     def unassign_twist_weights(self):
@@ -326,6 +338,7 @@ class Twistbone(Module):
             if self.chain_jnt.start not in influenceObjects:
                 skin_deformer.addInfluence(self.chain_jnt.start, lockWeights=True, weight=0.0)
                 self.chain_jnt.start.lockInfluenceWeights.set(False)
+                libSkinning.invalidate_deformer_index()
 
             # Ensure subjnts are transfert correctly
             to_transfer = []
@@ -336,10 +349,9 @@ class Twistbone(Module):
 
     def get_skinClusters_from_inputs(self):
         skinClusters = set()
+        deformer_index = libSkinning.get_deformer_index()
         for jnt in self.chain_jnt:
-            for hist in jnt.listHistory(future=True):
-                if isinstance(hist, pymel.nodetypes.SkinCluster):
-                    skinClusters.add(hist)
+            skinClusters.update(deformer_index.get_skin_clusters(jnt))
         return skinClusters
 
     def get_skinClusters_from_subjnts(self):
@@ -352,11 +364,11 @@ class Twistbone(Module):
         return skinClusters
 
     def get_farest_affected_meshes(self):
-        results = set()
+        results = []
         for jnt in self.jnts:
             mesh = self.rig.get_farest_affected_mesh(jnt)
-            if mesh:
-                results.add(mesh)
+            if mesh and mesh not in results:
+                results.append(mesh)
         return results
 
     def unbuild(self, delete=True):
@@ -9,6 +9,8 @@ from omtk.libs import libPymel
 
 
 class SqueezeNomenclature(className.BaseName):
+    __slots__ = ()
+
     type_anm = 'Ctrl'
     type_jnt = 'Jnt'
     type_rig = None
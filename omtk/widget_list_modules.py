@@ -301,7 +301,10 @@ class WidgetListModules(QtGui.QWidget):
         # Check if the name have changed
         if (item._name != new_text):
             item._name = new_text
-            module.name = new_text
+            if isinstance(module, classModule.Module) and module.rig:
+                module.rig.rename_module(module, new_text)
+            else:
+                module.name = new_text
 
             # Update directly the network value instead of re-exporting it
             if hasattr(item, "net"):
@@ -0,0 +1,125 @@
+"""
+Benchmark the nomenclature resolution outside of Maya.
+
+Each nomenclature class resolve the same set of names in three modes:
+- uncached: the memoized names are discarded before each resolve (the previous behavior).
+- cached: the names are resolved one at the time using BaseName.resolve.
+- bulk: the names sharing the same tokens are resolved using BaseName.resolve_many.
+
+Usage:
+python tests/benchmark_className.py --iterations 100 --output bench.json
+
+Note that this need to run with a python interpreter compatible with omtk (the one used by Maya),
+a stand-in is installed in place of the maya and pymel modules.
+"""
+import argparse
+import imp
+import json
+import os
+import platform
+import sys
+import time
+import types
+
+# Typical names created by a limb module.
+BASENAMES = ('arm', 'leg', 'eye', 'eyebrow', 'lip', 'cheek', 'finger', 'toe')
+SIDES = ('l', 'r', None)
+EXTRA_TOKENS = (
+    ('ik',), ('fk',), ('swivel',), ('ik', 'offset'), ('fk', 'offset'), ('upp',), ('low',), ('inn',), ('out',),
+    ('stretch',), ('squash',), ('twist', '01'), ('twist', '02'), ('twist', '03'), ('ikHandle',), ('effector',),
+)
+
+#
+# Stand-in
+#
+
+def _create_module(name, **kwargs):
+    module = types.ModuleType(name)
+    module.__dict__.update(kwargs)
+    sys.modules[name] = module
+    return module
+
+
+def install_standin():
+    """
+    Register the stand-in modules and import the nomenclatures without importing the whole omtk package.
+    :return: The className and rigSqueeze modules.
+    """
+    cmds = _create_module('maya.cmds')
+    OpenMaya = _create_module('maya.OpenMaya')
+    _create_module('maya', cmds=cmds, OpenMaya=OpenMaya)
+    pymel_core = _create_module('pymel.core')
+    _create_module('pymel', core=pymel_core)
+
+    # Import the modules directly, importing the omtk package require a complete Maya session.
+    dir_omtk = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'omtk')
+    omtk = _create_module('omtk')
+    omtk.core = _create_module('omtk.core')
+    omtk.core.className = imp.load_source('omtk.core.className', os.path.join(dir_omtk, 'core', 'className.py'))
+    omtk.core.classRig = _create_module('omtk.core.classRig', Rig=object)
+    omtk.libs = _create_module('omtk.libs')
+    omtk.libs.libAttr = _create_module('omtk.libs.libAttr')
+    omtk.libs.libPymel = _create_module('omtk.libs.libPymel')
+    omtk.rigs = _create_module('omtk.rigs')
+    omtk.rigs.rigSqueeze = imp.load_source('omtk.rigs.rigSqueeze', os.path.join(dir_omtk, 'rigs', 'rigSqueeze.py'))
+    return omtk.core.className, omtk.rigs.rigSqueeze
+
+
+def run_nomenclature(className, cls, iterations, mode):
+    nomenclatures = []
+    for basename in BASENAMES:
+        for side in SIDES:
+            side = {'l': cls.SIDE_L, 'r': cls.SIDE_R}.get(side)
+            nomenclatures.append(cls(tokens=[basename], side=side, suffix=cls.type_anm))
+
+    num_names = 0
+    st = time.time()
+    for i in range(iterations):
+        for nomenclature in nomenclatures:
+            if mode == 'bulk':
+                num_names += len(nomenclature.resolve_many(*EXTRA_TOKENS))
+                continue
+            for tokens in EXTRA_TOKENS:
+                if mode == 'uncached':
+                    className.clear_cache()
+                nomenclature.resolve(*tokens)
+                num_names += 1
+    seconds = time.time() - st
+
+    return {
+        'nomenclature': cls.__name__,
+        'mode': mode,
+        'iterations': iterations,
+        'names': num_names,
+        'seconds': seconds,
+        'names_per_second': num_names / seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--output', help='Path of the json file to write the results to.')
+    args = parser.parse_args()
+
+    className, rigSqueeze = install_standin()
+
+    results = []
+    for cls in (className.BaseName, rigSqueeze.SqueezeNomenclature):
+        for mode in ('uncached', 'cached', 'bulk'):
+            result = run_nomenclature(className, cls, args.iterations, mode)
+            print('{nomenclature:<24} {mode:<8}: {names_per_second:>12.0f} names/s'.format(**result))
+            results.append(result)
+
+    data = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(data, fp, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
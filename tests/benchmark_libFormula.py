@@ -0,0 +1,157 @@
+"""
+Benchmark the libFormula parsing cost outside of Maya.
+
+The node creation is replaced by a small in-process stand-in of libRigging.create_utility_node so only the
+cost of parsing the formulas is measured. Each formula is parsed in two modes:
+- uncached: the grammar is rebuilt and the formula tokenized on every call (the previous behavior).
+- cached: the grammar is built once and the tokenized formula is re-used.
+
+Usage:
+python tests/benchmark_libFormula.py --iterations 1000 --output bench.json
+
+Note that this need to run with a python interpreter compatible with omtk (the one used by Maya),
+the stand-in is installed in place of the maya and pymel modules.
+"""
+import argparse
+import imp
+import json
+import os
+import platform
+import sys
+import time
+import types
+
+# Formulas used by the SoftIk and the squash setups.
+FORMULAS = (
+    ('inChainLength*inRatio', ('inChainLength', 'inRatio')),
+    ('inChainLength-distanceSoft', ('inChainLength', 'distanceSoft')),
+    ('(inDistance-distanceSafe)/distanceSoftClamped', ('inDistance', 'distanceSafe', 'distanceSoftClamped')),
+    ('(distanceSoft*(1-(e^(deltaSafeSoft*-1))))+distanceSafe', ('distanceSoft', 'deltaSafeSoft', 'distanceSafe')),
+    ('1 / (e^(x^2))', ('x',)),
+    ('amount^(1/(shape^((x+offset)^2)))', ('amount', 'shape', 'x', 'offset')),
+)
+
+#
+# Stand-in
+#
+
+class Plug(object):
+    """
+    Stand-in for a pymel.Attribute, any attribute of a Plug is another Plug.
+    """
+    def __getattr__(self, item):
+        return Plug()
+
+    def type(self):
+        return 'double'
+
+    def set(self, *args, **kwargs):
+        pass
+
+
+class NodeBatch(object):
+    """
+    Stand-in for libRigging.NodeBatch, the nodes are created immediately.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def _create_module(name, **kwargs):
+    module = types.ModuleType(name)
+    module.__dict__.update(kwargs)
+    sys.modules[name] = module
+    return module
+
+
+def install_standin():
+    """
+    Register the stand-in modules and import omtk.libs.libFormula without importing the whole omtk package.
+    :return: The libFormula module.
+    """
+    cmds = _create_module('maya.cmds')
+    OpenMaya = _create_module('maya.OpenMaya')
+    _create_module('maya', cmds=cmds, OpenMaya=OpenMaya)
+
+    pymel_core = _create_module(
+        'pymel.core',
+        Attribute=Plug,
+        datatypes=types.ModuleType('pymel.core.datatypes'),
+        nodetypes=types.ModuleType('pymel.core.nodetypes'),
+    )
+    pymel_core.datatypes.Matrix = type('Matrix', (object,), {})
+    pymel_core.datatypes.Vector = type('Vector', (object,), {})
+    pymel_core.nodetypes.Transform = type('Transform', (object,), {})
+    _create_module('pymel', core=pymel_core)
+
+    # Import the libs directly, importing the omtk package require a complete Maya session.
+    dir_omtk = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'omtk')
+    omtk = _create_module('omtk')
+    omtk.deps = _create_module('omtk.deps')
+    omtk.deps.pyparsing = imp.load_source('omtk.deps.pyparsing', os.path.join(dir_omtk, 'deps', 'pyparsing.py'))
+    omtk.libs = _create_module('omtk.libs')
+    omtk.libs.libPython = imp.load_source('omtk.libs.libPython', os.path.join(dir_omtk, 'libs', 'libPython.py'))
+    omtk.libs.libProfiler = imp.load_source('omtk.libs.libProfiler', os.path.join(dir_omtk, 'libs', 'libProfiler.py'))
+    omtk.libs.libRigging = _create_module(
+        'omtk.libs.libRigging',
+        create_utility_node=lambda *args, **kwargs: Plug(),
+        connect_or_set_attr=lambda attr, value: None,
+        NodeBatch=NodeBatch,
+        get_node_batch=lambda: None,
+    )
+    omtk.libs.libFormula = imp.load_source('omtk.libs.libFormula', os.path.join(dir_omtk, 'libs', 'libFormula.py'))
+    return omtk.libs.libFormula
+
+
+def run_formula(libFormula, formula, variables, iterations, cached):
+    kwargs = dict((name, Plug()) for name in variables)
+
+    st = time.time()
+    for i in range(iterations):
+        if not cached:
+            libFormula._grammar = libFormula._build_grammar()
+            libFormula._ast_cache.clear()
+        libFormula.parse(formula, **kwargs)
+    seconds = time.time() - st
+
+    return {
+        'formula': formula,
+        'cached': cached,
+        'iterations': iterations,
+        'seconds': seconds,
+        'microseconds_per_parse': seconds / iterations * 1000000.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--output', help='Path of the json file to write the results to.')
+    args = parser.parse_args()
+
+    libFormula = install_standin()
+
+    results = []
+    for formula, variables in FORMULAS:
+        for cached in (False, True):
+            result = run_formula(libFormula, formula, variables, args.iterations, cached)
+            print('{formula:<56} {mode:<8}: {microseconds_per_parse:>10.1f} us/parse'.format(
+                mode='cached' if cached else 'uncached', **result
+            ))
+            results.append(result)
+
+    data = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(data, fp, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
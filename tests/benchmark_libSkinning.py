@@ -0,0 +1,464 @@
+"""
+Benchmark the libSkinning weights functions outside of Maya.
+
+Each function is run against synthetic meshes using a small in-process stand-in of the
+OpenMaya/pymel API used by libSkinning (mainly the MFnSkinCluster getWeights/setWeights buffers).
+Each case run in it's own process so the peak memory can be measured independently.
+
+Usage:
+python tests/benchmark_libSkinning.py --output bench.json
+python tests/benchmark_libSkinning.py --vertices 10000 100000 --influences 4 200
+
+Note that this need to run with a python interpreter compatible with omtk (the one used by Maya),
+the stand-in is installed in place of the maya and pymel modules.
+"""
+import argparse
+import imp
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import types
+
+# resource is only available on unix, psutil is used on windows if it is installed.
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+FUNCTIONS = (
+    'transfer_weights',
+    'transfer_weights_from_segments',
+    'assign_weights_from_segments',
+)
+DEFAULT_VERTICES = (10000, 100000, 1000000)
+DEFAULT_INFLUENCES = (4, 50, 200)
+NUM_INFLUENCES_PER_VERTEX = 4
+MESH_LENGTH = 100.0
+
+#
+# OpenMaya stand-in
+#
+
+class MIntArray(list):
+    def length(self):
+        return len(self)
+
+
+class MDoubleArray(list):
+    def __init__(self, *args):
+        super(MDoubleArray, self).__init__()
+        if len(args) == 2 and isinstance(args[0], list):  # (const double[], count)
+            self.extend(args[0][:args[1]])
+        elif len(args) == 2:  # (count, value)
+            self.extend([float(args[1])] * args[0])
+
+    def length(self):
+        return len(self)
+
+    def copy(self, other):
+        self[:] = other
+
+
+class MScriptUtil(object):
+    def __init__(self):
+        self._values = None
+
+    def createFromList(self, values, count):
+        self._values = list(values[:count])
+
+    def asDoublePtr(self):
+        return self._values
+
+
+class MVector(object):
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        if isinstance(x, MVector):
+            x, y, z = x.x, x.y, x.z
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
+
+    def __add__(self, other):
+        return MVector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return MVector(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __mul__(self, other):
+        if isinstance(other, MVector):  # dot product
+            return self.x * other.x + self.y * other.y + self.z * other.z
+        return MVector(self.x * other, self.y * other, self.z * other)
+
+    def length(self):
+        return math.sqrt(self.x * self.x + self.y * self.y + self.z * self.z)
+
+    def normal(self):
+        length = self.length()
+        if not length:
+            return MVector()
+        return MVector(self.x / length, self.y / length, self.z / length)
+
+
+class MSpace(object):
+    kWorld = 4
+
+
+class MFn(object):
+    kMesh = 296
+    kMeshVertComponent = 550
+
+
+class Component(object):
+    """
+    A component is only a list of vertex indices. None mean the complete geometry.
+    """
+    def __init__(self, indices=None):
+        self.indices = indices
+
+
+class MFnSingleIndexedComponent(object):
+    def __init__(self):
+        self._component = None
+
+    def create(self, component_type):
+        self._component = Component([])
+        return self._component
+
+    def addElements(self, indices):
+        self._component.indices.extend(indices)
+
+
+class MDagPath(object):
+    def __init__(self, mesh):
+        self.mesh = mesh
+
+    def hasFn(self, fn):
+        return fn == MFn.kMesh
+
+
+class MItGeometry(object):
+    def __init__(self, dagpath, component=None):
+        self._positions = dagpath.mesh.positions
+        indices = component.indices if component is not None else None
+        self._indices = indices if indices is not None else range(len(self._positions))
+        self._i = 0
+
+    def isDone(self):
+        return self._i >= len(self._indices)
+
+    def position(self, space):
+        return self._positions[self._indices[self._i]]
+
+    def next(self):
+        self._i += 1
+
+#
+# pymel stand-in
+#
+
+class Attribute(object):
+    def __init__(self, value):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+
+class Joint(object):
+    def __init__(self, name, pos):
+        self._name = name
+        self._pos = pos
+        self.lockInfluenceWeights = Attribute(False)
+
+    def name(self):
+        return self._name
+
+    __melobject__ = name
+
+    def getTranslation(self, space='world'):
+        return self._pos
+
+    def __apimfn__(self):
+        return self
+
+    def __repr__(self):
+        return self._name
+
+
+class SkinCluster(object):
+    """
+    Stand-in for the MFnSkinCluster weights buffer API.
+    The weights are stored as a flat, vertex-major, list.
+    """
+    def __init__(self, influences, weights):
+        self._influences = influences
+        self._weights = weights
+        self._geometry = None
+
+    def name(self):
+        return 'skinCluster1'
+
+    def influenceObjects(self):
+        return list(self._influences)
+
+    def addInfluence(self, influence, weight=0.0, **kwargs):
+        # Append a column to the weights table. Like Maya with lockWeights, the other weights are not normalized.
+        num_influences = len(self._influences)
+        weights = []
+        for memory_location in range(0, len(self._weights), num_influences):
+            weights.extend(self._weights[memory_location:memory_location + num_influences])
+            weights.append(weight)
+        self._weights = weights
+        self._influences.append(influence)
+
+    def getOutputGeometry(self):
+        return [self._geometry]
+
+    def __apimfn__(self):
+        return self
+
+    def _iter_locations(self, component, influences):
+        num_influences = len(self._influences)
+        indices = component.indices
+        if indices is None:
+            indices = range(len(self._weights) // num_influences)
+        for vert_index in indices:
+            memory_location = vert_index * num_influences
+            for influence in influences:
+                yield memory_location + influence
+
+    def getWeights(self, dagpath, component, influences, weights):
+        weights[:] = [self._weights[i] for i in self._iter_locations(component, influences)]
+
+    def setWeights(self, dagpath, component, influences, weights, old_weights=None):
+        for i, weight in zip(self._iter_locations(component, influences), weights):
+            self._weights[i] = weight
+
+
+class Mesh(object):
+    def __init__(self, positions, skin_cluster):
+        self.positions = positions
+        self.skin_cluster = skin_cluster
+        skin_cluster._geometry = self
+        self.vtx = positions
+
+    def name(self):
+        return 'mesh1'
+
+    __melobject__ = name
+
+    def __apimdagpath__(self):
+        return MDagPath(self)
+
+
+class MSceneMessage(object):
+    kAfterNew = 2
+    kAfterOpen = 5
+
+    @staticmethod
+    def addCallback(*args, **kwargs):
+        return None
+
+
+class MDGMessage(object):
+    @staticmethod
+    def addNodeAddedCallback(*args, **kwargs):
+        return None
+
+    @staticmethod
+    def addNodeRemovedCallback(*args, **kwargs):
+        return None
+
+    @staticmethod
+    def addConnectionCallback(*args, **kwargs):
+        return None
+
+
+def _create_module(name, **kwargs):
+    module = types.ModuleType(name)
+    module.__dict__.update(kwargs)
+    sys.modules[name] = module
+    return module
+
+
+def install_standin():
+    """
+    Register the stand-in modules and import omtk.libs.libSkinning without importing the whole omtk package.
+    :return: The libSkinning module.
+    """
+    openmaya = _create_module(
+        'maya.OpenMaya',
+        MIntArray=MIntArray,
+        MDoubleArray=MDoubleArray,
+        MScriptUtil=MScriptUtil,
+        MVector=MVector,
+        MPoint=MVector,
+        MSpace=MSpace,
+        MFn=MFn,
+        MFnSingleIndexedComponent=MFnSingleIndexedComponent,
+        MItGeometry=MItGeometry,
+        MSceneMessage=MSceneMessage,
+        MDGMessage=MDGMessage,
+    )
+    _create_module('maya', OpenMaya=openmaya)
+
+    nodetypes = types.ModuleType('pymel.core.nodetypes')
+    nodetypes.Mesh = Mesh
+    nodetypes.SkinCluster = SkinCluster
+    nodetypes.Joint = Joint
+    nodetypes.Transform = Joint
+    nodetypes.Shape = Mesh
+    pymel_core = _create_module(
+        'pymel.core',
+        nodetypes=nodetypes,
+        nt=nodetypes,
+        datatypes=types.ModuleType('pymel.core.datatypes'),
+        api=types.ModuleType('pymel.core.api'),
+        ls=lambda *args, **kwargs: [],
+        listHistory=lambda obj, **kwargs: [obj.skin_cluster],
+        warning=lambda msg: sys.stderr.write('Warning: {0}\n'.format(msg)),
+    )
+    pymel_core.datatypes.Vector = MVector
+    pymel_core.datatypes.Point = MVector
+    pymel_core.api.toComponentMObject = lambda dagpath: Component()
+    _create_module('pymel', core=pymel_core)
+
+    # Import the libs directly, importing the omtk package require a complete Maya session.
+    dir_libs = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'omtk', 'libs')
+    omtk = _create_module('omtk')
+    omtk.libs = _create_module('omtk.libs')
+    for name in ('libPython', 'libProfiler', 'libSkinningMath', 'libPymel', 'libSkinning'):
+        module = imp.load_source('omtk.libs.' + name, os.path.join(dir_libs, name + '.py'))
+        setattr(omtk.libs, name, module)
+    return omtk.libs.libSkinning
+
+#
+# Synthetic data
+#
+
+def create_synthetic_mesh(num_vertices, num_influences, seed=0):
+    """
+    Create a mesh lying on the X axis skinned to a chain of influences.
+    Each vertex is influenced by the nearest NUM_INFLUENCES_PER_VERTEX influences.
+    """
+    rng = random.Random(seed)
+    influences = [
+        Joint('jnt{0:03d}'.format(i), MVector(MESH_LENGTH * i / (num_influences - 1), 0.0, 0.0))
+        for i in range(num_influences)
+    ]
+    num_influences_per_vertex = min(NUM_INFLUENCES_PER_VERTEX, num_influences)
+
+    positions = []
+    weights = [0.0] * (num_vertices * num_influences)
+    for vert_index in range(num_vertices):
+        x = rng.uniform(0.0, MESH_LENGTH)
+        positions.append(MVector(x, rng.uniform(-1.0, 1.0), rng.uniform(-1.0, 1.0)))
+
+        nearest = int(round(x / MESH_LENGTH * (num_influences - 1)))
+        first = max(0, min(nearest - num_influences_per_vertex // 2, num_influences - num_influences_per_vertex))
+        row = [rng.random() for _ in range(num_influences_per_vertex)]
+        total = sum(row)
+        memory_location = vert_index * num_influences
+        for i, weight in enumerate(row):
+            weights[memory_location + first + i] = weight / total
+
+    return Mesh(positions, SkinCluster(influences, weights)), influences
+
+
+def get_peak_memory_kb():
+    """
+    :return: The peak memory used by the current process in KB or None if it can't be measured on this platform.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak  # In bytes on macOS
+    if psutil is not None:
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, 'peak_wset', memory_info.rss) // 1024
+    return None
+
+
+def run_case(function, num_vertices, num_influences):
+    libSkinning = install_standin()
+    mesh, influences = create_synthetic_mesh(num_vertices, num_influences)
+    peak_memory_before = get_peak_memory_kb()
+
+    st = time.time()
+    if function == 'transfer_weights':
+        libSkinning.transfer_weights(mesh, influences[:num_influences // 2], influences[-1])
+    elif function == 'transfer_weights_from_segments':
+        libSkinning.transfer_weights_from_segments(mesh, influences[0], influences[1:], force_straight_line=True)
+    elif function == 'assign_weights_from_segments':
+        libSkinning.assign_weights_from_segments(mesh, influences)
+    else:
+        raise Exception("Unknown function {0}".format(function))
+    seconds = time.time() - st
+    peak_memory = get_peak_memory_kb()
+
+    return {
+        'function': function,
+        'vertices': num_vertices,
+        'influences': num_influences,
+        'seconds': seconds,
+        'vertices_per_second': num_vertices / seconds if seconds else None,
+        'peak_memory_kb': peak_memory,
+        'peak_memory_delta_kb': peak_memory - peak_memory_before if peak_memory is not None else None,
+        'numpy': libSkinning.use_numpy,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--functions', nargs='+', default=FUNCTIONS, choices=FUNCTIONS)
+    parser.add_argument('--vertices', nargs='+', type=int, default=DEFAULT_VERTICES)
+    parser.add_argument('--influences', nargs='+', type=int, default=DEFAULT_INFLUENCES)
+    parser.add_argument('--output', help='Path of the json file to write the results to.')
+    parser.add_argument('--case', nargs=3, help=argparse.SUPPRESS)  # Internal, run a single case.
+    args = parser.parse_args()
+
+    if args.case:
+        function, num_vertices, num_influences = args.case
+        sys.stdout.write(json.dumps(run_case(function, int(num_vertices), int(num_influences))))
+        return
+
+    results = []
+    for function in args.functions:
+        for num_vertices in args.vertices:
+            for num_influences in args.influences:
+                output = subprocess.check_output([
+                    sys.executable, os.path.abspath(__file__),
+                    '--case', function, str(num_vertices), str(num_influences)
+                ])
+                result = json.loads(output)
+                print('{function:<32} {vertices:>8} vertices {influences:>4} influences: '
+                      '{vertices_per_second:>12.0f} vertices/s {peak_memory:>10} KB'.format(
+                    peak_memory='?' if result['peak_memory_kb'] is None else result['peak_memory_kb'], **result
+                ))
+                results.append(result)
+
+    data = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(data, fp, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark the face modules build with and without libRigging.NodeBatch.
+
+Each case is built with libRigging.use_node_batch enabled and disabled:
+- splitter: Build the lips SplitterNode network, the node network of each FaceLipsAvar.
+- scene: Build every rig of a face scene. Only run if a scene is provided.
+
+Usage:
+mayapy tests/benchmark_rigFace.py --iterations 50 --scene face_template.ma --output bench.json
+
+Note that this need to run in mayapy, the nodes are created in a standalone Maya session.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+
+def _initialize():
+    import maya.standalone
+    maya.standalone.initialize()
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def run_splitter(iterations, batch):
+    import pymel.core as pymel
+    from omtk.core import className
+    from omtk.libs import libRigging
+    from omtk.modules import rigFaceLips
+
+    pymel.newFile(force=True)
+    nomenclature = className.BaseName('lip', side='l')
+
+    libRigging.use_node_batch = batch
+    try:
+        st = time.time()
+        for i in range(iterations):
+            splitter = rigFaceLips.SplitterNode()
+            splitter.build(nomenclature, name=nomenclature.resolve('splitter'))
+        seconds = time.time() - st
+    finally:
+        libRigging.use_node_batch = True
+
+    return {
+        'case': 'splitter',
+        'batch': batch,
+        'iterations': iterations,
+        'seconds': seconds,
+        'milliseconds_per_build': seconds / iterations * 1000.0,
+    }
+
+
+def run_scene(path, batch):
+    import pymel.core as pymel
+    import omtk
+    from omtk.libs import libRigging
+
+    pymel.openFile(path, force=True)
+
+    libRigging.use_node_batch = batch
+    try:
+        st = time.time()
+        omtk.build_all(strict=True)
+        seconds = time.time() - st
+    finally:
+        libRigging.use_node_batch = True
+
+    return {
+        'case': 'scene',
+        'scene': path,
+        'batch': batch,
+        'iterations': 1,
+        'seconds': seconds,
+        'milliseconds_per_build': seconds * 1000.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--scene', help='Path of a scene containing a face rig to build.')
+    parser.add_argument('--output', help='Path of the json file to write the results to.')
+    args = parser.parse_args()
+
+    _initialize()
+
+    results = []
+    for batch in (False, True):
+        results.append(run_splitter(args.iterations, batch))
+        if args.scene:
+            results.append(run_scene(args.scene, batch))
+
+    for result in results:
+        print('{case:<10} {mode:<8}: {milliseconds_per_build:>10.1f} ms/build'.format(
+            mode='batch' if result['batch'] else 'direct', **result
+        ))
+
+    data = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(data, fp, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -45,6 +45,272 @@ class SampleTests(mayaunittest.TestCase):
         self.assertTrue(isinstance(rig, omtk.core.classRig.Rig))
         self.assertTrue(rig.name == rig_name)
 
+    def test_build_plan(self):
+        from omtk.modules import rigFK
+        from omtk.core.classBuildPlan import BuildPlanNode
+
+        inf_a = pymel.createNode('joint')
+        inf_b = pymel.createNode('joint', parent=inf_a)
+        inf_c = pymel.createNode('joint', parent=inf_b)
+        inf_d = pymel.createNode('joint', parent=inf_c)
+
+        rig = omtk.create()
+        mod_cd = rig.add_module(rigFK.FK([inf_c, inf_d]))
+        mod_b = rig.add_module(rigFK.FK([inf_b]))
+        mod_a = rig.add_module(rigFK.FK([inf_a]))
+
+        # The dependencies are built first.
+        plan = rig.get_build_plan()
+        self.assertEqual([node.module for node in plan.nodes], [mod_a, mod_b, mod_cd])
+        self.assertEqual([node.module for node in plan.get_node(mod_cd).dependencies], [mod_b, mod_a])
+        self.assertEqual([node.module for node in plan.get_subtree(mod_b)], [mod_b, mod_cd])
+
+        # A skipped module is skipped with everything that depend on it.
+        plan.skip(mod_b)
+        rig.build(strict=True, plan=plan)
+        self.assertEqual([node.status for node in plan.nodes],
+                         [BuildPlanNode.STATUS_BUILT, BuildPlanNode.STATUS_SKIPPED, BuildPlanNode.STATUS_SKIPPED])
+        self.assertFalse(mod_b.is_built())
+
+        # Retry the skipped modules.
+        plan.reset(mod_b)
+        rig.build(strict=True, plan=plan)
+        self.assertEqual([data['status'] for data in plan.to_dict()], [BuildPlanNode.STATUS_BUILT] * 3)
+        self.assertTrue(all(data['duration'] is not None for data in plan.to_dict()))
+
+    def test_build_plan_spaceswitch_dependencies(self):
+        from omtk.modules import rigFK
+
+        inf_a = pymel.createNode('joint')
+        inf_b = pymel.createNode('joint')
+
+        rig = omtk.create()
+        mod_b = rig.add_module(rigFK.FK([inf_b]))
+        mod_a = rig.add_module(rigFK.FK([inf_a]))
+        self.assertEqual([node.module for node in rig.get_build_plan().nodes], [mod_b, mod_a])
+
+        # A space-switch target kept from a previous build is built first, even outside the parent hierarchy.
+        rig.build(strict=True)
+        mod_b.ctrls[0].targets.append(inf_a)
+        plan = rig.get_build_plan()
+        self.assertEqual([node.module for node in plan.nodes], [mod_a, mod_b])
+        self.assertEqual([node.module for node in plan.get_node(mod_b).dependencies], [mod_a])
+        self.assertEqual([node.module for node in plan.get_subtree(mod_a)], [mod_a, mod_b])
+
+    def test_build_plan_failure(self):
+        from omtk.modules import rigFK
+        from omtk.core.classBuildPlan import BuildPlanNode
+
+        class FailingFK(rigFK.FK):
+            def build(self, *args, **kwargs):
+                raise Exception("Failing on purpose.")
+
+        inf_a = pymel.createNode('joint')
+        inf_b = pymel.createNode('joint')
+        rig = omtk.create()
+        mod_a = rig.add_module(FailingFK([inf_a]))
+        mod_b = rig.add_module(rigFK.FK([inf_b]))
+
+        # The failure is recorded and the other modules are still built.
+        plan = rig.get_build_plan()
+        rig.build(plan=plan)
+        self.assertEqual(plan.get_node(mod_a).status, BuildPlanNode.STATUS_FAILED)
+        self.assertEqual(plan.get_node(mod_a).error, 'Exception: Failing on purpose.')
+        self.assertIsNotNone(plan.get_node(mod_a).duration)
+        self.assertEqual(plan.get_node(mod_b).status, BuildPlanNode.STATUS_BUILT)
+        self.assertTrue(mod_b.is_built())
+
+        # A strict build raise the failure.
+        plan.reset(mod_a)
+        self.assertRaises(Exception, rig.build, strict=True, plan=plan)
+        self.assertEqual(plan.get_node(mod_a).status, BuildPlanNode.STATUS_FAILED)
+
+    def test_rebuild_changed_modules(self):
+        from omtk.modules import rigFK
+
+        inf_a = pymel.createNode('joint')
+        inf_b = pymel.createNode('joint', parent=inf_a)
+        inf_c = pymel.createNode('joint', parent=inf_b)
+
+        rig = omtk.create()
+        mod_a = rig.add_module(rigFK.FK([inf_a]))
+        mod_b = rig.add_module(rigFK.FK([inf_b]))
+        mod_c = rig.add_module(rigFK.FK([inf_c]))
+        rig.build(strict=True)
+
+        # Nothing changed since the build.
+        self.assertEqual(rig.rebuild(strict=True, dry_run=True), [])
+
+        # A changed module is rebuilt with it's dependents.
+        rig.rename_module(mod_b, 'ChangedFK')
+        self.assertEqual(rig.rebuild(strict=True, dry_run=True), [mod_b, mod_c])
+        self.assertTrue(mod_b.is_built())
+        self.assertEqual(rig.rebuild(strict=True), [mod_b, mod_c])
+        self.assertTrue(all(module.is_built() for module in (mod_a, mod_b, mod_c)))
+        self.assertEqual(rig.rebuild(strict=True, dry_run=True), [])
+
+    def test_node_ledger(self):
+        from omtk.modules import rigFK
+        from omtk.libs import libRigging
+
+        inf = pymel.createNode('joint')
+        rig = omtk.create()
+        module = rig.add_module(rigFK.FK([inf]))
+        rig.build(strict=True)
+
+        # The nodes created by the module are recorded, except the nodes deleted with the module groups.
+        self.assertNotIn(module.grp_anm, module.ledger)
+        self.assertNotIn(module.ctrls[0].node, module.ledger)
+        constraints = inf.getChildren(type='parentConstraint')
+        self.assertTrue(constraints)
+        self.assertTrue(all(constraint in module.ledger for constraint in constraints))
+
+        # Any node left behind by the module is deleted when un-building, except the nodes it reference.
+        with libRigging.NodeLedger() as ledger:
+            node_junk = pymel.createNode('multiplyDivide')
+            node_kept = pymel.createNode('transform')
+            node_kept_dict = pymel.createNode('transform')
+            node_kept_tuple = pymel.createNode('transform')
+            node_kept_ctrl = pymel.createNode('transform')
+        nodes = [node_junk, node_kept, node_kept_dict, node_kept_tuple, node_kept_ctrl]
+        self.assertEqual(ledger.get_nodes(), nodes)
+        module.ledger.extend(nodes)
+        module.node_kept = node_kept
+        module.nodes_kept_by_name = {'kept': node_kept_dict}
+        module.nodes_kept_tuple = (node_kept_tuple.tx, 1.0)
+        module.ctrls[0].node_kept = node_kept_ctrl
+        self.assertEqual(module.get_ledger_leftovers(), [node_junk])
+
+        module.unbuild()
+        self.assertFalse(node_junk.exists())
+        self.assertTrue(all(node.exists() for node in nodes[1:]))
+        self.assertEqual(module.ledger, [])
+
+    def test_transactional_build(self):
+        from omtk.libs import libRigging
+        from omtk.modules import rigFK
+
+        class FailingFK(rigFK.FK):
+            def build(self, *args, **kwargs):
+                super(FailingFK, self).build(*args, **kwargs)
+                self.values['key'] = 2.0
+                with libRigging.NodeLedger():
+                    pymel.createNode('multiplyDivide')
+                raise Exception("Failing on purpose.")
+
+        inf = pymel.createNode('joint')
+        inf.tx.set(2.0)
+        rig = omtk.create()
+        module = rig.add_module(FailingFK([inf]))
+        module.values = {'key': 1.0}
+        rig.pre_build()
+        nodes_before = set(pymel.ls())
+
+        self.assertRaises(Exception, rig.build, strict=True, transactional=True)
+
+        # The module is back to it's previous state, including the nodes created in a nested ledger.
+        self.assertIn(module, rig.modules)
+        self.assertIs(module.rig, rig)
+        self.assertEqual(module.values, {'key': 1.0})
+        self.assertFalse(module.is_built())
+        self.assertEqual(module.ctrls, [])
+        self.assertEqual(inf.tx.get(), 2.0)
+        self.assertFalse(inf.tx.isDestination())
+        self.assertEqual(set(pymel.ls()) - nodes_before, set())
+        self.assertTrue(cmds.undoInfo(query=True, stateWithoutFlush=True))
+
+    def test_network_index(self):
+        from omtk.core import network_index
+        index = network_index.get_network_index()
+        num_rigs = len(index.get_networks('Rig'))
+
+        # The index is kept up to date when networks are created and deleted.
+        rig = omtk.create()
+        network = libSerialization.export_network(rig)
+        self.assertIn(network, index.get_networks('Rig'))
+        self.assertEqual(len(omtk.find()), num_rigs + 1)
+
+        pymel.delete(network)
+        self.assertNotIn(network, index.get_networks('Rig'))
+        self.assertEqual(len(index.get_networks('Rig')), num_rigs)
+
+        # The callbacks are removed with the index and registered again with the next index.
+        network_index.invalidate_network_index()
+        self.assertEqual(network_index._network_index_callbacks, [])
+        self.assertEqual(index._callbacks, [])
+        index = network_index.get_network_index()
+        self.assertEqual(len(network_index._network_index_callbacks), 2)
+
+        # Opening a new scene discard the index.
+        cmds.file(new=True, force=True)
+        self.assertIsNot(network_index.get_network_index(), index)
+
+    def test_lazy_import(self):
+        from omtk.core import classModuleProxy
+        from omtk.modules import rigFK
+
+        inf_a = pymel.createNode('joint')
+        inf_b = pymel.createNode('joint')
+        rig = omtk.create()
+        mod_a = rig.add_module(rigFK.FK([inf_a]))
+        mod_b = rig.add_module(rigFK.FK([inf_b]))
+        network = libSerialization.export_network(rig)
+        network_a = mod_a._network
+        network_b = mod_b._network
+
+        # The modules are only deserialized when accessed.
+        rig = classModuleProxy.import_rig_network(network, lazy=True)
+        proxy_a, proxy_b = rig.modules
+        self.assertTrue(classModuleProxy.is_module_proxy(proxy_a))
+        self.assertEqual(proxy_a._network, network_a)
+        self.assertEqual(proxy_b._network, network_b)
+        self.assertFalse(proxy_a.is_resolved())
+
+        self.assertEqual(proxy_a.name, mod_a.name)
+        self.assertIsInstance(proxy_a, rigFK.FK)
+        self.assertIs(proxy_a.rig, rig)
+        self.assertTrue(proxy_a.is_resolved())
+        self.assertFalse(proxy_b.is_resolved())
+
+        # The class and the input of a proxy are read from it's network.
+        self.assertIsInstance(proxy_b, rigFK.FK)
+        self.assertIs(rig.get_module_by_input(inf_b), proxy_b)
+        self.assertFalse(proxy_b.is_resolved())
+
+        # The rig can be exported once the proxies are resolved.
+        classModuleProxy.resolve_module_proxies(rig)
+        self.assertFalse(any(classModuleProxy.is_module_proxy(module) for module in rig.modules))
+        pymel.delete(network)
+        network = libSerialization.export_network(rig)
+        rig = classModuleProxy.import_rig_network(network, lazy=False)
+        self.assertEqual([module.name for module in rig.modules], [mod_a.name, mod_b.name])
+
+    def test_build_selected(self):
+        from omtk.modules import rigFK
+
+        inf_a = pymel.createNode('joint')
+        inf_b = pymel.createNode('joint')
+        rig = omtk.create()
+        rig.add_module(rigFK.FK([inf_a]))
+        mod_b = rig.add_module(rigFK.FK([inf_b]))
+        libSerialization.export_network(rig)
+        network_b = mod_b._network
+
+        # The modules that are not selected are not deserialized, their network is kept.
+        omtk.build_selected(sel=[inf_a])
+        rig = omtk.find(lazy=True)[0]
+        proxy_a, proxy_b = rig.modules
+        self.assertEqual(proxy_b._network, network_b)
+        self.assertTrue(proxy_a.is_built())
+        self.assertFalse(proxy_b.is_resolved())
+
+        omtk.unbuild_selected(sel=[inf_a])
+        rig = omtk.find(lazy=True)[0]
+        proxy_a, proxy_b = rig.modules
+        self.assertEqual(proxy_b._network, network_b)
+        self.assertFalse(proxy_a.is_built())
+        self.assertFalse(proxy_b.is_resolved())
+
     # @open_scene("../examples/rig_squeeze_template01.ma")
     # def test_rig_squeeze(self):
     #     self._build_unbuild_build()
@@ -1,6 +1,9 @@
+import unittest
 import mayaunittest
 from omtk.libs import libFormula
+from omtk.libs import libRigging
 import pymel.core as pymel
+from maya import cmds
 
 class SampleTests(mayaunittest.TestCase):
 
@@ -21,49 +24,188 @@ class SampleTests(mayaunittest.TestCase):
         t = self._create_pymel_node(*args, **kwargs)
         return t.tx, t.ty, t.tz, t.rx, t.ry, t.rz, t.sx, t.sy, t.sz
 
+    def _parse(self, formula, **kwargs):
+        """
+        Parse a formula the same way libFormula.parse does. Overridden to run the tests using another emission mode.
+        """
+        return libFormula.ParserContext(kwargs).parse(formula)
+
     def test_add(self):
-        v = libFormula.parse('2+3')
+        v = self._parse('2+3')
         self.assertEqual(v, 5)
 
     def test_sub(self):
-        v = libFormula.parse('5-3')
+        v = self._parse('5-3')
         self.assertEqual(v, 2)
 
     def test_mul(self):
-        v = libFormula.parse('2*3')
+        v = self._parse('2*3')
         self.assertEqual(v, 6)
 
     def test_div(self):
-        v = libFormula.parse('6/2')
+        v = self._parse('6/2')
         self.assertEqual(v, 3)
 
     def test_operation_priority(self):
-        v = libFormula.parse("a+3*(6+(3*b))", a=4, b=7)
+        v = self._parse("a+3*(6+(3*b))", a=4, b=7)
         self.assertEqual(v, 85)
 
         # usage of '-'
-        v = libFormula.parse("-2^1.0*-1.0+3.3")
+        v = self._parse("-2^1.0*-1.0+3.3")
         self.assertEqual(v, 5.3)
 
         # usage of '-'
-        v = libFormula.parse("-2*(1.0-(3^(3*-1.0)))")
+        v = self._parse("-2*(1.0-(3^(3*-1.0)))")
         self.assertAlmostEqual(v, -1.925925925925926)
 
+    def test_parse_cache(self):
+        # The same formula can be parsed multiple times with different values.
+        v = libFormula.parse("a+3*(6+(3*b))", a=4, b=7)
+        self.assertEqual(v, 85)
+        v = libFormula.parse("a+3*(6+(3*b))", a=1, b=2)
+        self.assertEqual(v, 37)
+
+        # Undefined variables are still detected when the formula is cached.
+        self.assertRaises(KeyError, libFormula.parse, "a+3*(6+(3*b))", a=1)
+
     def test_add_pymel(self):
         a, b, c, _, _, _, _, _, _ = self._create_pymel_attrs(1, 2, 3)
-        result = libFormula.parse('a+b+c', a=a, b=b, c=c)
+        result = self._parse('a+b+c', a=a, b=b, c=c)
         self.assertEqual(result.get(), 6)
 
     def test_sub_pymel(self):
         a, b, c, _, _, _, _, _, _ = self._create_pymel_attrs(8, 2, 1)
-        result = libFormula.parse('a-b-c', a=a, b=b, c=c)
+        result = self._parse('a-b-c', a=a, b=b, c=c)
         self.assertEqual(result.get(), 5)
 
     def test_mul_pymel(self):
         a, b, c, _, _, _, _, _, _ = self._create_pymel_attrs(2, 3, 4)
-        result = libFormula.parse('a*b*c', a=a, b=b, c=c)
+        result = self._parse('a*b*c', a=a, b=b, c=c)
         self.assertEqual(result.get(), 24)
 
+    @unittest.skipIf(not libFormula.use_numpy, "numpy is not available")
+    def test_evaluate_match_nodes(self):
+        t = self._create_pymel_node()
+        a = t.tx
+        b = t.ty
+        samples_a = [-1.0, 0.5, 2.0]
+        samples_b = [2.0, 3.0, 0.5]
+
+        for formula in (
+            "a+3*(6+(3*b))",
+            "1/(e^(a^2))",
+            "(a*2)+(b*3)+(a*b)",
+            "b^(a+2)",
+        ):
+            result = self._parse(formula, a=a, b=b)
+            expected = libFormula.evaluate(formula, a=samples_a, b=samples_b)
+            for val_a, val_b, val_expected in zip(samples_a, samples_b, expected):
+                a.set(val_a)
+                b.set(val_b)
+                self.assertAlmostEqual(result.get(), val_expected, places=4)
+
+    @unittest.skipIf(not libFormula.use_numpy, "numpy is not available")
+    def test_evaluate_match_comparison_nodes(self):
+        t = self._create_pymel_node()
+        a = t.tx
+        b = t.ty
+        samples_a = [1.0, 2.0, 3.0]
+        samples_b = [2.0, 2.0, 2.0]
+
+        for formula in ("a=b", "a!=b", "a>b", "a>=b", "a<b", "a<=b", "(a>b)*3"):
+            result = self._parse(formula, a=a, b=b)
+            expected = libFormula.evaluate(formula, a=samples_a, b=samples_b)
+            for val_a, val_b, val_expected in zip(samples_a, samples_b, expected):
+                a.set(val_a)
+                b.set(val_b)
+                self.assertAlmostEqual(result.get(), val_expected, places=4)
+
+    def test_parser_context(self):
+        a, b, _, _, _, _, _, _, _ = self._create_pymel_attrs(2, 3)
+        context = libFormula.ParserContext({'a': a, 'b': b})
+
+        # The optimisation stage don't create any node, the attributes are bound when the nodes are created.
+        args = context.optimise("a*(2+3)+b")
+        self.assertFalse(pymel.ls(type='multiplyDivide'))
+
+        result = context.emit(args)
+        self.assertEqual(result.get(), 13)
+
+    def test_parse_undo(self):
+        a, b, _, _, _, _, _, _, _ = self._create_pymel_attrs(2, 3)
+        cmds.undoInfo(openChunk=True)
+        try:
+            result = libFormula.parse("a*b+1", a=a, b=b)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+        self.assertEqual(result.get(), 7)
+
+        # The nodes are created using pymel by default and can be undone.
+        cmds.undo()
+        self.assertFalse(pymel.ls(type='multiplyDivide'))
+        self.assertFalse(pymel.ls(type='plusMinusAverage'))
+
+    def test_parse_batch(self):
+        a, b, _, _, _, _, _, _, _ = self._create_pymel_attrs(2, 3)
+        results = libFormula.parse_many(["a*b+1", "a/b"], batch=True, a=a, b=b)
+        self.assertEqual(results[0].get(), 7)
+        self.assertAlmostEqual(results[1].get(), 2.0 / 3.0)
+
+    def test_parse_many(self):
+        a, b, _, _, _, _, _, _, _ = self._create_pymel_attrs(2, 3)
+        results = libFormula.parse_many(["a+b", "a*b", "2*3"], a=a, b=b)
+        self.assertEqual(results[0].get(), 5)
+        self.assertEqual(results[1].get(), 6)
+        self.assertEqual(results[2], 6)
+
+    @unittest.skipIf(not libFormula.use_concurrent_futures, "concurrent.futures is not available")
+    def test_parse_many_executor(self):
+        import concurrent.futures
+        a, b, _, _, _, _, _, _, _ = self._create_pymel_attrs(2, 3)
+        formulas = ["a+b", "a*(b+1)", "2*3"]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+            results = libFormula.parse_many(formulas, executor=executor, a=a, b=b)
+        self.assertEqual(results[0].get(), 5)
+        self.assertEqual(results[1].get(), 8)
+        self.assertEqual(results[2], 6)
+
+        # The worker processes can't import libFormula.
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            self.assertRaises(IOError, libFormula.parse_many, formulas, executor=executor, a=a, b=b)
+
+    def test_formula_reuse_subexpressions(self):
+        a, b, _, _, _, _, _, _, _ = self._create_pymel_attrs(2, 3)
+        formula = libFormula.Formula(a=a, b=b)
+        formula.x = "a*b+1"
+        formula.y = "2*(b*a)"  # a*b is commutative
+        formula.z = "a/b"
+        self.assertEqual(formula.x.get(), 7)
+        self.assertEqual(formula.y.get(), 12)
+        self.assertAlmostEqual(formula.z.get(), 2.0 / 3.0)
+        self.assertEqual(formula.get_num_nodes_saved(), 1)
+
+    def test_node_cache_operands(self):
+        a, b, _, _, _, _, _, _, _ = self._create_pymel_attrs(2, 3)
+        node_cache = libFormula.NodeCache()
+        x = libFormula.ParserContext({'a': a, 'b': b}, node_cache=node_cache).parse('a*b')
+
+        # The operands are identified by their MObject, renaming them don't prevent the re-use.
+        a.node().rename('renamed')
+        y = libFormula.ParserContext({'a': a, 'b': b}, node_cache=node_cache).parse('a*b')
+        self.assertEqual(y, x)
+        self.assertEqual(node_cache.num_nodes_saved, 1)
+
+        # A node re-created with the name of a deleted operand is another operand.
+        name = b.node().name()
+        pymel.delete(b.node())
+        b = pymel.createNode('transform', name=name).ty
+        b.set(4)
+        z = libFormula.ParserContext({'a': a, 'b': b}, node_cache=node_cache).parse('a*b')
+        self.assertNotEqual(z, x)
+        self.assertEqual(z.get(), 8)
+        self.assertEqual(node_cache.num_nodes_saved, 1)
+
     # def test_add3D_pymel(self):
     #     t = self._create_pymel_node(1, 2, 3, 4, 5, 6, 7, 8, 9)
     #     a = t.t
@@ -72,3 +214,67 @@ class SampleTests(mayaunittest.TestCase):
     #     result = libFormula.parse('a+b+c', a=a, b=b, c=c)
     #     print(result.get())
 
+
+class ChannelPackingTests(SampleTests):
+    """
+    Run the formula tests a second time using the channel packing emission mode.
+    Each formula is also parsed without channel packing to compare the outputs and the number of nodes.
+    """
+    def _parse(self, formula, **kwargs):
+        with libRigging.NodeLedger() as ledger:
+            expected = libFormula.ParserContext(kwargs).parse(formula)
+        num_nodes = len(ledger.get_nodes())
+
+        with libRigging.NodeLedger() as ledger:
+            result = libFormula.ParserContext(kwargs, packer=libFormula.ChannelPacker()).parse(formula)
+        num_nodes_packed = len(ledger.get_nodes())
+
+        if isinstance(expected, pymel.Attribute):
+            self.assertAlmostEqual(result.get(), expected.get())
+        else:
+            self.assertEqual(result, expected)
+        self.assertLessEqual(num_nodes_packed, num_nodes)
+        return result
+
+    def test_pack_independent_operations(self):
+        a, b, c = self._create_pymel_attrs(2, 3, 4)[:3]
+        packer = libFormula.ChannelPacker()
+        result = libFormula.parse_many(['(a*2)+(b*3)+(c*4)'], packer=packer, a=a, b=b, c=c)[0]
+        self.assertEqual(result.get(), 29)
+        self.assertEqual(len(pymel.ls(type='multiplyDivide')), 1)
+        self.assertEqual(packer.num_nodes_saved, 2)
+
+    def test_pack_dependent_operations(self):
+        a, b = self._create_pymel_attrs(2, 3)[:2]
+        # The second multiplication depend on the first one and cannot be packed in the same node.
+        packer = libFormula.ChannelPacker()
+        result = libFormula.parse_many(['(a*b)*3'], packer=packer, a=a, b=b)[0]
+        self.assertEqual(result.get(), 18)
+        self.assertEqual(len(pymel.ls(type='multiplyDivide')), 2)
+        self.assertEqual(packer.num_nodes_saved, 0)
+
+    def test_pack_across_formulas(self):
+        a, b = self._create_pymel_attrs(2, 3)[:2]
+        packer = libFormula.ChannelPacker()
+        x = libFormula.ParserContext({'a': a}, packer=packer).parse('a*2')
+        # x depend on the first node, the multiplication need another node.
+        y = libFormula.ParserContext({'x': x}, packer=packer).parse('x*3')
+        # b*4 can be packed in the first node but y*5 depend on both previous nodes.
+        z = libFormula.ParserContext({'b': b, 'y': y}, packer=packer).parse('(b*4)+(y*5)')
+        self.assertEqual(x.get(), 4)
+        self.assertEqual(y.get(), 12)
+        self.assertEqual(z.get(), 72)
+        self.assertEqual(len(pymel.ls(type='multiplyDivide')), 3)
+        self.assertEqual(packer.num_nodes_saved, 1)
+
+    def test_pack_reduce_nodes(self):
+        a, b, c = self._create_pymel_attrs(2, 3, 4)[:3]
+        formula = "a+3*(6+(3*b))-(c*a)/(b+1)"
+        with libRigging.NodeLedger() as ledger:
+            expected = libFormula.parse(formula, a=a, b=b, c=c)
+        with libRigging.NodeLedger() as ledger_packed:
+            packer = libFormula.ChannelPacker()
+            result = libFormula.parse_many([formula], packer=packer, a=a, b=b, c=c)[0]
+        self.assertAlmostEqual(result.get(), expected.get())
+        self.assertGreater(packer.num_nodes_saved, 0)
+        self.assertLess(len(ledger_packed.get_nodes()), len(ledger.get_nodes()))
@@ -0,0 +1,50 @@
+import json
+import mayaunittest
+import pymel.core as pymel
+from omtk.libs import libProfiler
+from omtk.libs import libFormula
+
+
+class ProfilerTests(mayaunittest.TestCase):
+
+    def test_profiler(self):
+        t = pymel.createNode('transform')
+
+        with libProfiler.Profiler() as profiler:
+            for name in ('module_a', 'module_b'):
+                with libProfiler.span(name, category='module'):
+                    pymel.createNode('transform')
+                    libFormula.parse('a*b', a=t.tx, b=t.ty)
+
+        # The formula span is nested in the module span and the nodes are counted.
+        rows = dict((row['name'], row) for row in profiler.get_summary())
+        self.assertEqual(rows['module_a']['calls'], 1)
+        self.assertEqual(rows['module_a']['nodes'], 2)
+        self.assertEqual(rows['module_a']['children'], {'formula': 1})
+
+        trace = json.loads(json.dumps(profiler.to_chrome_trace()))
+        self.assertEqual([event['name'] for event in trace['traceEvents']],
+                         ['module_a', 'formula', 'module_b', 'formula'])
+
+        # Once the profiler is exited, nothing is recorded.
+        self.assertIsNone(libProfiler.get_profiler())
+
+    def test_nested_profilers(self):
+        with libProfiler.Profiler(track_objects=True) as profiler_outer:
+            with libProfiler.span('outer', category='module'):
+                with libProfiler.Profiler() as profiler_inner:
+                    with libProfiler.span('inner', category='module'):
+                        pymel.createNode('transform')
+                objects = [[] for _ in range(10)]  # Lists are tracked by the garbage collector.
+
+        # Each span is closed by the profiler that opened it.
+        self.assertEqual([span.name for span in profiler_outer.iter_spans()], ['outer'])
+        self.assertEqual([span.name for span in profiler_inner.iter_spans()], ['inner'])
+        self.assertIsNotNone(profiler_outer.root.children[0].end)
+        self.assertIs(profiler_outer.root.children[0].parent, profiler_outer.root)
+
+        # Only the outer profiler track the python objects.
+        rows = dict((row['name'], row) for row in profiler_outer.get_summary())
+        self.assertEqual(rows['outer']['nodes'], 1)
+        self.assertGreaterEqual(rows['outer']['objects'], len(objects))
+        self.assertIsNone(profiler_inner.get_summary()[0]['objects'])
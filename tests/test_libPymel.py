@@ -0,0 +1,34 @@
+import unittest
+import mayaunittest
+import pymel.core as pymel
+from omtk.libs import libPymel
+
+
+class SegmentCollectionTests(mayaunittest.TestCase):
+
+    def _create_segments(self):
+        return libPymel.SegmentCollection.from_positions([
+            pymel.datatypes.Vector(0, 0, 0),
+            pymel.datatypes.Vector(10, 0, 0),
+            pymel.datatypes.Vector(20, 5, 0),
+            pymel.datatypes.Vector(30, 5, 0),
+        ])
+
+    @unittest.skipIf(not libPymel.use_numpy, "numpy is not available")
+    def test_closest_segments_match_closest_segment_index(self):
+        segments = self._create_segments()
+        points = [
+            (-5.0, 1.0, 0.0),  # out-of-bound before the first segment
+            (0.0, 0.0, 0.0),
+            (5.0, 3.0, 1.0),
+            (15.0, 0.0, 0.0),
+            (25.0, 8.0, -2.0),
+            (40.0, 5.0, 0.0),  # out-of-bound after the last segment
+        ]
+
+        indices, ratios = segments.closest_segments(points)
+
+        for point, index, ratio in zip(points, indices, ratios):
+            expected_index, expected_ratio = segments.closest_segment_index(pymel.datatypes.Vector(*point))
+            self.assertEqual(expected_index, index)
+            self.assertAlmostEqual(expected_ratio, ratio)
@@ -0,0 +1,217 @@
+import mayaunittest
+import pymel.core as pymel
+from maya import cmds
+from omtk.libs import libRigging
+
+
+class RayCasterTests(mayaunittest.TestCase):
+
+    def test_ray_caster_match_ray_cast(self):
+        cube_a = pymel.polyCube(width=2, height=2, depth=2)[0]
+        cube_b = pymel.polyCube(width=2, height=2, depth=2)[0]
+        cube_b.setTranslation((5, 0, 0))
+        geometries = [cube_a.getShape(), cube_b.getShape()]
+
+        origins = [pymel.datatypes.Point(-5, 0, 0), pymel.datatypes.Point(0, 10, 0)]
+        directions = [pymel.datatypes.Vector(1, 0, 0), pymel.datatypes.Vector(0, 1, 0)]
+
+        ray_caster = libRigging.RayCaster(geometries)
+        nearests = ray_caster.cast_nearest(origins, directions)
+        farthests = ray_caster.cast_farthest(origins, directions)
+
+        # The first ray go through both cubes.
+        self.assertTrue(nearests[0].isEquivalent(pymel.datatypes.Point(-1, 0, 0)))
+        self.assertTrue(farthests[0].isEquivalent(pymel.datatypes.Point(6, 0, 0)))
+        self.assertTrue(nearests[0].isEquivalent(libRigging.ray_cast_nearest(origins[0], directions[0], geometries)))
+        self.assertTrue(farthests[0].isEquivalent(libRigging.ray_cast_farthest(origins[0], directions[0], geometries)))
+
+        # The second ray miss everything.
+        self.assertIsNone(nearests[1])
+        self.assertIsNone(farthests[1])
+
+    def test_ray_caster_intersect(self):
+        cube_a = pymel.polyCube(width=2, height=2, depth=2)[0]
+        cube_b = pymel.polyCube(width=2, height=2, depth=2)[0]
+        cube_b.setTranslation((5, 0, 0))
+        geometries = [cube_a.getShape(), cube_b.getShape()]
+
+        origins = [pymel.datatypes.Point(-5, 0, 0), pymel.datatypes.Point(0, 10, 0)]
+        directions = [pymel.datatypes.Vector(1, 0, 0), pymel.datatypes.Vector(0, 1, 0)]
+
+        # The hits are returned as flat arrays, one entry per hit.
+        with libRigging.RayCaster(geometries) as ray_caster:
+            num_rays, hit_rays, hit_distances, hit_positions, hit_geometries = ray_caster.intersect(
+                origins, directions, all_hits=True
+            )
+        self.assertEqual(num_rays, 2)
+        self.assertEqual(len(hit_rays), 4)
+        self.assertEqual(list(hit_rays), [0, 0, 0, 0])
+        self.assertEqual(sorted(list(hit_geometries)), [0, 0, 1, 1])
+        self.assertEqual(len(hit_positions), 4)
+        self.assertAlmostEqual(float(min(hit_distances)), 4.0, places=4)
+        self.assertAlmostEqual(float(max(hit_distances)), 11.0, places=4)
+
+
+class ClosestPointEngineTests(mayaunittest.TestCase):
+
+    def _get_closest_point_using_node(self, mesh, pos):
+        util_transformGeometry = libRigging.create_utility_node('transformGeometry',
+            inputGeometry=mesh.outMesh,
+            transform=mesh.worldMatrix
+        )
+        util_cpom = libRigging.create_utility_node('closestPointOnMesh',
+            inPosition=pos,
+            inMesh=util_transformGeometry.outputGeometry
+        )
+        return util_cpom.position.get(), util_cpom.parameterU.get(), util_cpom.parameterV.get()
+
+    def test_closest_point_engine_match_closestPointOnMesh(self):
+        plane = pymel.polyPlane(width=10, height=10, subdivisionsX=4, subdivisionsY=4)[0]
+        plane.setTranslation((0, 2, 0))
+        plane.setRotation((0, 0, 30))
+        sphere = pymel.polySphere(radius=2)[0]
+        sphere.setTranslation((10, 0, 0))
+        meshes = [plane.getShape(), sphere.getShape()]
+
+        positions = [
+            pymel.datatypes.Vector(1.3, 5.0, -2.1),
+            pymel.datatypes.Vector(-20.0, 0.0, 0.0),
+            pymel.datatypes.Vector(10.5, 3.0, 0.5),
+        ]
+
+        engine = libRigging.ClosestPointEngine(meshes)
+        for pos, (mesh_index, closest_pos, u, v) in zip(positions, engine.get_closest_points(positions)):
+            expected = min(
+                (self._get_closest_point_using_node(mesh, pos) + (mesh,) for mesh in meshes),
+                key=lambda result: (result[0] - pos).length()
+            )
+            self.assertEqual(meshes[mesh_index], expected[3])
+            self.assertTrue(closest_pos.isEquivalent(expected[0], 1.0e-4))
+            self.assertAlmostEqual(u, expected[1], places=4)
+            self.assertAlmostEqual(v, expected[2], places=4)
+
+    def test_closest_point_engine_reuse(self):
+        import omtk
+
+        plane = pymel.polyPlane(width=10, height=10)[0]
+        sphere = pymel.polySphere(radius=2)[0]
+        sphere.setTranslation((0, 3, 0))
+        pos = pymel.datatypes.Vector(0.5, 6.0, 0.5)
+
+        rig = omtk.create()
+        engine = rig.get_closest_point_engine()
+        self.assertIs(rig.get_closest_point_engine(), engine)
+        mesh_indices = engine.get_mesh_indices([plane])
+
+        # A query on a subset of the engine meshes match a query on a new engine.
+        self.assertEqual(
+            libRigging.get_closest_point_on_shapes([plane], pos, engine=engine),
+            libRigging.get_closest_point_on_shapes([plane], pos)
+        )
+        self.assertEqual(engine.get_closest_points([pos], mesh_indices=mesh_indices)[0][0], mesh_indices[0])
+        closest_pos, _, _ = libRigging.get_closest_point_on_mesh(sphere.getShape(), pos, engine=engine)
+        self.assertTrue(closest_pos.isEquivalent(pymel.datatypes.Vector(0.5, 3.0, 0.5).normal() * 2.0 + pymel.datatypes.Vector(0, 3, 0), 0.1))
+
+        # The engine is rebuilt with the rig.
+        rig.pre_build()
+        self.assertIsNot(rig.get_closest_point_engine(), engine)
+
+    def test_rig_ray_caster_free(self):
+        import omtk
+
+        pymel.polySphere(radius=2)
+        rig = omtk.create()
+        ray_caster = rig.get_ray_caster()
+        self.assertIs(rig.get_ray_caster(), ray_caster)
+        freed = []
+        ray_caster.free = lambda: freed.append(ray_caster)
+
+        # The accelerators are released before the ray caster is discarded.
+        rig.pre_build()
+        self.assertEqual(freed, [ray_caster])
+        self.assertIsNot(rig.get_ray_caster(), ray_caster)
+
+
+class NodeBatchTests(mayaunittest.TestCase):
+
+    def test_node_batch(self):
+        t = pymel.createNode('transform')
+        t.tx.set(3.0)
+
+        with libRigging.NodeBatch() as batch:
+            u1 = libRigging.create_utility_node('multiplyDivide', input1X=t.tx, input2X=2.0)
+            u2 = libRigging.create_utility_node('plusMinusAverage', operation=2, input1D=[u1.outputX, 1.0])
+            libRigging.connect_or_set_attr(t.ty, u2.output1D)
+        self.assertEqual(batch.num_operations, 8)
+
+        self.assertEqual(u1.outputX.get(), 6.0)
+        self.assertEqual(u2.output1D.get(), 5.0)
+        self.assertEqual(t.ty.get(), 5.0)
+
+        batch.undo()
+        self.assertFalse(pymel.ls(type='multiplyDivide'))
+        self.assertFalse(t.ty.isDestination())
+
+    def test_node_batch_reconnect(self):
+        t = pymel.createNode('transform')
+        t.tx.set(2.0)
+        t.ty.set(3.0)
+        u = pymel.createNode('multiplyDivide')
+        pymel.connectAttr(t.tz, u.input1X)
+
+        # The destination is connected multiple times before the batch is executed, the last connection win.
+        with libRigging.NodeBatch():
+            libRigging.connect_or_set_attr(u.input1X, t.tx)
+            libRigging.connect_or_set_attr(u.input1X, t.ty)
+        self.assertEqual(u.input1X.inputs(plugs=True), [t.ty])
+        self.assertEqual(u.outputX.get(), 3.0)
+
+    def test_node_batch_revert_on_exception(self):
+        def _create():
+            with libRigging.NodeBatch():
+                libRigging.create_utility_node('multiplyDivide', input1X=2.0)
+                raise ValueError()
+
+        self.assertRaises(ValueError, _create)
+        self.assertFalse(pymel.ls(type='multiplyDivide'))
+
+    def test_node_batch_maya_undo(self):
+        t = pymel.createNode('transform')
+
+        cmds.undoInfo(openChunk=True)
+        try:
+            with libRigging.NodeBatch():
+                u = libRigging.create_utility_node('multiplyDivide', input1X=2.0, input2X=3.0)
+                libRigging.connect_or_set_attr(t.tx, u.outputX)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+        self.assertEqual(t.tx.get(), 6.0)
+
+        # The batch is part of the Maya undo queue.
+        cmds.undo()
+        self.assertFalse(pymel.ls(type='multiplyDivide'))
+        self.assertFalse(t.tx.isDestination())
+
+        cmds.redo()
+        self.assertEqual(len(pymel.ls(type='multiplyDivide')), 1)
+        self.assertEqual(t.tx.get(), 6.0)
+
+    def test_node_batch_array_source(self):
+        t = pymel.createNode('transform')
+        t.tx.set(2.0)
+
+        with libRigging.NodeBatch():
+            u = libRigging.create_utility_node('decomposeMatrix', inputMatrix=t.worldMatrix)
+        self.assertEqual(u.inputMatrix.inputs(plugs=True), [t.worldMatrix[0]])
+        self.assertEqual(u.outputTranslateX.get(), 2.0)
+
+    def test_node_batch_disabled(self):
+        libRigging.use_node_batch = False
+        try:
+            with libRigging.NodeBatch() as batch:
+                u = libRigging.create_utility_node('multiplyDivide', input1X=2.0)
+                # The node is created immediately.
+                self.assertEqual(u.input1X.get(), 2.0)
+        finally:
+            libRigging.use_node_batch = True
+        self.assertEqual(batch.num_operations, 0)
@@ -0,0 +1,259 @@
+import random
+import unittest
+import mayaunittest
+import pymel.core as pymel
+from maya import OpenMaya
+from omtk.libs import libPymel
+from omtk.libs import libPython
+from omtk.libs import libRigging
+from omtk.libs import libSkinning
+from omtk.libs import libSkinningMath
+
+
+class SkinningTests(mayaunittest.TestCase):
+
+    def _get_random_weights(self, num_vertices, num_jnts, seed=0):
+        """
+        :return: A flat, vertex-major, normalized weights table.
+        """
+        rng = random.Random(seed)
+        weights = []
+        for i in range(num_vertices):
+            row = [rng.random() if rng.random() > 0.5 else 0.0 for j in range(num_jnts)]
+            total = sum(row) or 1.0
+            weights.extend(w / total for w in row)
+        return weights
+
+    def _create_skinned_mesh(self):
+        """
+        :return: A mesh skinned on a chain of 3 joints aligned on the X axis, the skinCluster and the joints.
+        """
+        transform, _ = pymel.polyPlane(width=20, height=4, subdivisionsX=20, subdivisionsY=2)
+        pymel.select(clear=True)
+        jnts = [pymel.joint(position=(x, 0, 0)) for x in (-10, 0, 10)]
+        skin_cluster = pymel.skinCluster(jnts, transform, toSelectedBones=True)
+        return transform.getShape(), skin_cluster, jnts
+
+    def _get_weights(self, skin_cluster, mesh):
+        return [list(weights) for weights in skin_cluster.getWeights(mesh)]
+
+    def test_deformer_index(self):
+        mesh, skin_cluster, jnts = self._create_skinned_mesh()
+        index = libSkinning.get_deformer_index()
+        self.assertIs(index, libSkinning.get_deformer_index())
+        self.assertEqual(index.get_skin_clusters(jnts[0]), [skin_cluster])
+        self.assertEqual(index.get_output_geometries(skin_cluster), [mesh])
+        self.assertEqual(index.get_skin_cluster(mesh), skin_cluster)
+
+        # Any deformer invalidate the index.
+        cluster, _ = pymel.cluster(mesh)
+        index = libSkinning.get_deformer_index()
+        self.assertIn(cluster, index.get_deformers(mesh))
+        pymel.delete(cluster)
+        index = libSkinning.get_deformer_index()
+        self.assertNotIn(cluster, index.get_deformers(mesh))
+
+        # A new influence invalidate the index.
+        pymel.select(clear=True)
+        jnt_new = pymel.joint()
+        skin_cluster.addInfluence(jnt_new, weight=0.0)
+        self.assertEqual(libSkinning.get_deformer_index().get_skin_clusters(jnt_new), [skin_cluster])
+
+        # The affected meshes follow the whole future history, like listHistory, not only the skinClusters.
+        pymel.select(clear=True)
+        jnt_driver = pymel.joint()
+        self.assertIsNone(libRigging.get_nearest_affected_mesh(jnt_driver))
+        pymel.parentConstraint(jnt_driver, jnts[0])
+        self.assertEqual(libRigging.get_nearest_affected_mesh(jnt_driver), mesh)
+        self.assertEqual(libRigging.get_farest_affected_mesh(jnt_driver), mesh)
+
+    def test_transfer_weights(self):
+        for use_numpy in sorted(set([False, libSkinning.use_numpy])):
+            libSkinning.use_numpy, use_numpy_old = use_numpy, libSkinning.use_numpy
+            try:
+                mesh, skin_cluster, jnts = self._create_skinned_mesh()
+                weights_old = self._get_weights(skin_cluster, mesh)
+                libSkinning.transfer_weights(mesh, jnts[:2], jnts[2])
+                weights_new = self._get_weights(skin_cluster, mesh)
+            finally:
+                libSkinning.use_numpy = use_numpy_old
+
+            self.assertEqual(len(weights_old), len(weights_new))
+            for old, new in zip(weights_old, weights_new):
+                self.assertAlmostEqual(new[0], 0.0)
+                self.assertAlmostEqual(new[1], 0.0)
+                self.assertAlmostEqual(new[2], sum(old))
+
+    @unittest.skipIf(not libSkinning.use_numpy, "numpy is not available")
+    def test_transfer_weights_numpy_match_python(self):
+        num_vertices = 500
+        num_jnts = 6
+        src_indices = [0, 2, 3]
+        dst_index = 5
+
+        weights = self._get_random_weights(num_vertices, num_jnts)
+
+        weights_python = list(weights)
+        libSkinning._transfer_weights_python(weights_python, num_vertices, num_jnts, src_indices, dst_index)
+
+        weights_numpy = libSkinning.numpy.array(weights).reshape(-1, num_jnts)
+        libSkinning._transfer_weights_numpy(weights_numpy, src_indices, dst_index)
+
+        for expected, result in zip(weights_python, weights_numpy.ravel()):
+            self.assertAlmostEqual(expected, result)
+
+    @unittest.skipIf(not libSkinning.use_numpy, "numpy is not available")
+    def test_transfer_weights_from_segments_numpy_match_python(self):
+        num_vertices = 500
+        chunk_size = 4  # The source and 3 targets
+        segments = libPymel.SegmentCollection.from_positions([
+            OpenMaya.MVector(0, 0, 0),
+            OpenMaya.MVector(10, 0, 0),
+            OpenMaya.MVector(20, 0, 0),
+        ])
+        knot_weights = segments.get_knot_weights(dropoff=1.5)
+        knot_positions = segments.get_knot_positions()
+
+        rng = random.Random(0)
+        positions = [(rng.uniform(-5, 25), rng.uniform(-5, 10), rng.uniform(-5, 5)) for i in range(num_vertices)]
+        weights = self._get_random_weights(num_vertices, chunk_size)
+
+        weights_python = list(weights)
+        libSkinning._transfer_weights_from_segments_python(weights_python, positions, knot_positions, knot_weights,
+                                                           chunk_size)
+
+        weights_numpy = libSkinning.numpy.array(weights).reshape(-1, chunk_size)
+        libSkinning._transfer_weights_from_segments_numpy(weights_numpy, positions, knot_positions, knot_weights)
+
+        for expected, result in zip(weights_python, weights_numpy.ravel()):
+            self.assertAlmostEqual(expected, result)
+
+    def test_transfer_weights_from_segments_sparse(self):
+        # The sparse component only contain the vertices influenced by the source.
+        mesh, skin_cluster, jnts = self._create_skinned_mesh()
+        weights = self._get_weights(skin_cluster, mesh)
+        geometryDagPath = mesh.__apimdagpath__()
+        component = pymel.api.toComponentMObject(geometryDagPath)
+        sparse_component = libSkinning._get_sparse_component(
+            skin_cluster.__apimfn__(), geometryDagPath, component, [1]
+        )
+        indices = OpenMaya.MIntArray()
+        OpenMaya.MFnSingleIndexedComponent(sparse_component).getElements(indices)
+        self.assertEqual(list(indices), [i for i, vertex_weights in enumerate(weights) if vertex_weights[1]])
+
+        # The sparse and dense transfers give the same weights.
+        libSkinning.transfer_weights_from_segments(mesh, jnts[1], [jnts[0], jnts[2]], sparse=True)
+        mesh_dense, skin_cluster_dense, jnts_dense = self._create_skinned_mesh()
+        libSkinning.transfer_weights_from_segments(mesh_dense, jnts_dense[1], [jnts_dense[0], jnts_dense[2]], sparse=False)
+        for weights, weights_dense in zip(self._get_weights(skin_cluster, mesh),
+                                          self._get_weights(skin_cluster_dense, mesh_dense)):
+            for weight, weight_dense in zip(weights, weights_dense):
+                self.assertAlmostEqual(weight, weight_dense)
+            self.assertAlmostEqual(weights[1], 0.0)
+
+    def test_transfer_weights_from_segments_batch(self):
+        mesh_a, skin_cluster_a, jnts = self._create_skinned_mesh()
+        transform_b, _ = pymel.polyPlane(width=20, height=4, subdivisionsX=10, subdivisionsY=2)
+        mesh_b = transform_b.getShape()
+        skin_cluster_b = pymel.skinCluster(jnts, transform_b, toSelectedBones=True)
+        transform_c, _ = pymel.polyPlane()
+        mesh_c = transform_c.getShape()
+        pymel.skinCluster(jnts[0], transform_c, toSelectedBones=True)  # The source is not an influence.
+
+        # Each geometry give the same result as if it was processed alone.
+        mesh_expected, skin_cluster_expected, jnts_expected = self._create_skinned_mesh()
+        libSkinning.transfer_weights_from_segments(mesh_expected, jnts_expected[1], [jnts_expected[0], jnts_expected[2]])
+
+        results = libSkinning.transfer_weights_from_segments_batch([mesh_a, mesh_b, mesh_c], jnts[1], [jnts[0], jnts[2]])
+        self.assertEqual(set(results.keys()), set([mesh_a, mesh_b, mesh_c]))
+        self.assertIsNone(results[mesh_c])
+        for mesh, skin_cluster in ((mesh_a, skin_cluster_a), (mesh_b, skin_cluster_b)):
+            num_vertices, duration = results[mesh]
+            self.assertGreater(num_vertices, 0)
+            for weights in self._get_weights(skin_cluster, mesh):
+                self.assertAlmostEqual(weights[1], 0.0)
+        for weights, weights_expected in zip(self._get_weights(skin_cluster_a, mesh_a),
+                                             self._get_weights(skin_cluster_expected, mesh_expected)):
+            for weight, weight_expected in zip(weights, weights_expected):
+                self.assertAlmostEqual(weight, weight_expected)
+
+    @unittest.skipIf(not libPython.does_module_exist('concurrent'), "concurrent.futures is not available")
+    def test_compute_weights_from_knots_parallel(self):
+        import concurrent.futures
+
+        knot_positions = [(0.0, 0.0, 0.0), (10.0, 0.0, 0.0), (20.0, 0.0, 0.0), (30.0, 0.0, 0.0)]
+        knot_weights = libPymel.SegmentCollection.from_positions(
+            [OpenMaya.MVector(*pos) for pos in knot_positions]
+        ).get_knot_weights(dropoff=1.5)
+        rng = random.Random(0)
+        positions = [(rng.uniform(-5, 35), rng.uniform(-5, 5), rng.uniform(-5, 5)) for i in range(1000)]
+
+        expected = [libSkinningMath.get_point_weights_from_knots(knot_positions, knot_weights, pos) for pos in positions]
+        # The workers of a process pool can't be forked from the Maya session, a thread pool run the same code.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            results = libSkinning.compute_weights_from_knots_parallel(positions, knot_positions, knot_weights, executor,
+                                                                      chunk_size=100)
+
+            # The executor is used for the whole mesh.
+            mesh, skin_cluster, jnts = self._create_skinned_mesh()
+            mesh_expected, skin_cluster_expected, jnts_expected = self._create_skinned_mesh()
+            libSkinning.assign_weights_from_segments(mesh, jnts, executor=executor)
+            libSkinning.assign_weights_from_segments(mesh_expected, jnts_expected)
+
+        self.assertEqual(len(results), len(expected))
+        for expected_weights, weights in zip(expected, results):
+            for expected_weight, weight in zip(expected_weights, weights):
+                self.assertAlmostEqual(expected_weight, weight)
+        for weights, weights_expected in zip(self._get_weights(skin_cluster, mesh),
+                                             self._get_weights(skin_cluster_expected, mesh_expected)):
+            for weight, weight_expected in zip(weights, weights_expected):
+                self.assertAlmostEqual(weight, weight_expected)
+
+    @unittest.skipIf(not libSkinning.use_numpy, "numpy is not available")
+    def test_snapshot_dense_roundtrip(self):
+        num_vertices = 200
+        num_jnts = 8
+        influences = ['jnt{0}'.format(i) for i in range(num_jnts)]
+        weights = libSkinning.numpy.array(self._get_random_weights(num_vertices, num_jnts)).reshape(-1, num_jnts)
+
+        snapshot = libSkinning.SkinWeightsSnapshot.from_dense(influences, weights)
+        self.assertEqual(snapshot.num_vertices, num_vertices)
+        self.assertEqual(len(snapshot.weights), libSkinning.numpy.count_nonzero(weights))
+
+        # The .npz extension is optional.
+        path = self.get_temp_filename('snapshot')
+        snapshot.save(path)
+        snapshot = libSkinning.SkinWeightsSnapshot.load(path)
+        self.assertTrue((snapshot.to_dense() == weights).all())
+
+        # Influences are resolved by name.
+        reordered = list(reversed(influences)) + ['jnt_missing']
+        result = snapshot.to_dense(reordered)
+        self.assertTrue((result[:, :num_jnts] == weights[:, ::-1]).all())
+        self.assertFalse(result[:, num_jnts].any())
+
+    @unittest.skipIf(not libSkinning.use_numpy, "numpy is not available")
+    def test_snapshot_apply(self):
+        mesh, skin_cluster, jnts = self._create_skinned_mesh()
+        weights = self._get_weights(skin_cluster, mesh)
+        snapshot = libSkinning.SkinWeightsSnapshot.from_geometry(mesh)
+
+        # The weights captured one influence at the time match the dense weights.
+        expected = libSkinning.SkinWeightsSnapshot.from_dense(snapshot.influences, weights)
+        self.assertTrue((snapshot.indptr == expected.indptr).all())
+        self.assertTrue((snapshot.indices == expected.indices).all())
+        self.assertTrue(libSkinning.numpy.allclose(snapshot.weights, expected.weights))
+
+        # The weights of the influences that are not in the snapshot are zeroed.
+        libSkinning.transfer_weights(mesh, jnts[:2], jnts[2])
+        snapshot.apply(mesh)
+        for expected, result in zip(weights, self._get_weights(skin_cluster, mesh)):
+            for expected_weight, weight in zip(expected, result):
+                self.assertAlmostEqual(expected_weight, weight)
+
+        # A snapshot can't be applied on a different topology or without it's influences.
+        transform_other, _ = pymel.polySphere()
+        pymel.skinCluster(jnts, transform_other, toSelectedBones=True)
+        self.assertRaises(Exception, snapshot.apply, transform_other.getShape())
+        jnts[0].rename('jnt_renamed')
+        self.assertRaises(Exception, snapshot.apply, mesh)
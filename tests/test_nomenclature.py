@@ -23,3 +23,52 @@ class NomenclatureTestCase(mayaunittest.TestCase):
         self.assertEqual(n.resolve(), 'l_eye_jnt')
         n.tokens.append('micro')
         self.assertEqual(n.resolve(), 'l_eye_micro_jnt')
+
+    def test_name_registry(self):
+        from omtk.core.className import BaseName, NameRegistry
+        cmds.file(new=True, force=True)
+        cmds.createNode('transform', name='eye')
+        cmds.createNode('transform', name='eye1')
+
+        n = BaseName('eye')
+        self.assertEqual(n.get_unique_name('eye'), 'eye2')
+
+        with NameRegistry.from_scene() as registry:
+            self.assertEqual(n.get_unique_name('eye'), 'eye2')
+
+            # The registry is kept in sync with the scene.
+            cmds.createNode('transform', name='eye2')
+            self.assertEqual(n.get_unique_name('eye'), 'eye3')
+            cmds.rename('eye1', 'mouth')
+            self.assertIn('mouth', registry)
+            self.assertEqual(n.get_unique_name('eye'), 'eye1')
+            cmds.delete('eye')
+            self.assertEqual(n.get_unique_name('eye'), 'eye')
+
+        # Once the registry is exited, the scene is used.
+        self.assertEqual(n.get_unique_name('eye'), 'eye')
+        self.assertEqual(n.get_unique_name('mouth'), 'mouth1')
+
+    def test_name_registry_dag_nodes(self):
+        from omtk.core.className import BaseName, NameRegistry
+        cmds.file(new=True, force=True)
+        parent_a = cmds.createNode('transform', name='parent_a')
+        parent_b = cmds.createNode('transform', name='parent_b')
+        cmds.createNode('transform', name='eye', parent=parent_a)
+        cmds.createNode('transform', name='eye', parent=parent_b)
+
+        n = BaseName('eye')
+        with NameRegistry.from_scene() as registry:
+            # The registry use the leaf names, not the partial paths returned by ls.
+            self.assertIn('eye', registry)
+            self.assertNotIn('parent_a|eye', registry)
+            self.assertEqual(n.get_unique_name('eye'), 'eye1')
+
+            # The name is still taken as long as one node use it.
+            cmds.delete('parent_a|eye')
+            self.assertIn('eye', registry)
+            self.assertEqual(n.get_unique_name('eye'), 'eye1')
+
+            cmds.delete('parent_b|eye')
+            self.assertNotIn('eye', registry)
+            self.assertEqual(n.get_unique_name('eye'), 'eye')
@@ -19,3 +19,8 @@ class NomenclatureTestCase(mayaunittest.TestCase):
         self.assertEqual(n.resolve(), 'L_Eye_Jnt')
         n.tokens.append('Micro')
         self.assertEqual(n.resolve(), 'L_Eye_Micro_Jnt')
+
+        # The resolved names are memoized, ensure changing the tokens still affect the result.
+        n.side = n.SIDE_R
+        self.assertEqual(n.resolve(), 'R_Eye_Micro_Jnt')
+        self.assertEqual(n.resolve_many('upp', ('low', 'inn')), ['R_Eye_Micro_Upp_Jnt', 'R_Eye_Micro_Low_Inn_Jnt'])